@@ -0,0 +1,89 @@
+# hrms_biometric/benchmarks/attendance_write_benchmark.py
+#
+# Compare kiosk punch throughput of the lean attendance writer with the
+# document lifecycle path under concurrent kiosks:
+#
+#   bench --site <site> execute hrms_biometric.benchmarks.attendance_write_benchmark.run \
+#       --kwargs "{'kiosks': 8, 'punches_per_kiosk': 200}"
+#
+# Punches are written on BENCHMARK_DATE and removed afterwards.
+
+import frappe
+import threading
+import time
+from datetime import datetime, timedelta
+
+from hrms_biometric.bio_facerecognition.api.attendance_writer import (
+    write_punch,
+    write_punch_with_document
+)
+
+BENCHMARK_DATE = datetime(2099, 1, 1, 8, 0, 0)
+
+def run(kiosks=8, punches_per_kiosk=200, employees=50):
+    """Run both write paths and print writes per second"""
+    site = frappe.local.site
+    employee_rows = frappe.get_all(
+        "Employee Face Recognition",
+        fields=["employee_id", "employee_name", "department"],
+        limit=employees
+    )
+    
+    if not employee_rows:
+        print("❌ No Employee Face Recognition records to punch against")
+        return
+    
+    results = {}
+    for label, writer in (("document", document_writer), ("lean", write_punch)):
+        cleanup()
+        elapsed, errors = run_kiosks(site, writer, employee_rows, kiosks, punches_per_kiosk)
+        total = kiosks * punches_per_kiosk
+        results[label] = round(total / elapsed, 1)
+        print(f"{label:>8}: {total} punches in {elapsed:.2f}s -> {results[label]} writes/s ({errors} errors)")
+    
+    cleanup()
+    print(f"⚡ Speedup: {results['lean'] / results['document']:.1f}x")
+    return results
+
+def document_writer(employee, punch_time, kiosk_name, confidence, capture_url=None):
+    return write_punch_with_document(employee, punch_time, kiosk_name, confidence, capture_url)
+
+def run_kiosks(site, writer, employee_rows, kiosks, punches_per_kiosk):
+    """Start one thread per kiosk; every kiosk cycles over the same employees"""
+    errors = []
+    start_barrier = threading.Barrier(kiosks + 1)
+    
+    def kiosk(kiosk_index):
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            start_barrier.wait()
+            for i in range(punches_per_kiosk):
+                employee = employee_rows[(kiosk_index + i) % len(employee_rows)]
+                punch_time = BENCHMARK_DATE + timedelta(seconds=i * kiosks + kiosk_index)
+                try:
+                    writer(frappe._dict(employee), punch_time, f"Benchmark Kiosk {kiosk_index}", 90.0)
+                    frappe.db.commit()
+                except Exception:
+                    frappe.db.rollback()
+                    errors.append(kiosk_index)
+        finally:
+            frappe.destroy()
+    
+    threads = [threading.Thread(target=kiosk, args=(i,)) for i in range(kiosks)]
+    for thread in threads:
+        thread.start()
+    
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    
+    return time.perf_counter() - started, len(errors)
+
+def cleanup():
+    frappe.db.sql("""
+        DELETE FROM `tabEmployee Attendance`
+        WHERE attendance_date = %s
+    """, (BENCHMARK_DATE.date(),))
+    frappe.db.commit()
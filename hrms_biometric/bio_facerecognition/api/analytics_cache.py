@@ -0,0 +1,73 @@
+# hrms_biometric/bio_facerecognition/api/analytics_cache.py
+
+import frappe
+import json
+import hashlib
+from functools import partial
+from datetime import timedelta
+from frappe.utils import getdate, now_datetime
+
+# Per attendance_date watermark: the time of the last committed change to that date
+WATERMARK_KEY = "attendance_partition_watermarks"
+RESULT_KEY_PREFIX = "attendance_result"
+# Results are valid for as long as their watermark holds; the expiry only
+# lets entries for ranges nobody asks for any more fall out of Redis
+RESULT_CACHE_SECONDS = 30 * 24 * 3600
+
+def touch_attendance_partition(attendance_date):
+    """Advance the watermark of a date once the current transaction commits"""
+    if attendance_date:
+        frappe.db.after_commit.add(partial(set_watermark, str(getdate(attendance_date))))
+
+def set_watermark(date):
+    frappe.cache().hset(WATERMARK_KEY, date, str(now_datetime()))
+
+def on_attendance_change(doc, method=None):
+    """doc_event: any change to Employee Attendance moves its date's watermark"""
+    touch_attendance_partition(doc.attendance_date)
+    
+    before = doc.get_doc_before_save() if method in ("on_update", "on_update_after_submit") else None
+    if before and getdate(before.attendance_date) != getdate(doc.attendance_date):
+        touch_attendance_partition(before.attendance_date)
+
+def get_watermark(start_date, end_date):
+    """Digest of the watermarks of every date in the range"""
+    # hgetall unpickles the values but leaves the field names as bytes
+    watermarks = {
+        frappe.safe_decode(date): stamp for date, stamp in (frappe.cache().hgetall(WATERMARK_KEY) or {}).items()
+    }
+    start_date, end_date = getdate(start_date), getdate(end_date)
+    
+    stamps = []
+    day = start_date
+    while day <= end_date:
+        stamps.append(watermarks.get(str(day)) or "")
+        day += timedelta(days=1)
+    
+    return hashlib.sha1("|".join(stamps).encode("utf-8")).hexdigest()
+
+def get_result_key(function_name, start_date, end_date, filters=None):
+    normalized = json.dumps({
+        "start": str(getdate(start_date)),
+        "end": str(getdate(end_date)),
+        "filters": filters or {}
+    }, sort_keys=True, default=str)
+    return "{0}:{1}:{2}".format(RESULT_KEY_PREFIX, function_name, hashlib.sha1(normalized.encode("utf-8")).hexdigest())
+
+def get_cached_result(function_name, start_date, end_date, compute, filters=None, watermark_from=None):
+    """Result of compute() for the range, reused until an attendance date it reads changes.
+    
+    watermark_from widens the dates the result depends on, e.g. for a
+    comparison against the previous period. Exceptions from compute() are
+    not cached.
+    """
+    key = get_result_key(function_name, start_date, end_date, filters)
+    watermark = get_watermark(watermark_from or start_date, end_date)
+    
+    cached = frappe.cache().get_value(key)
+    if cached is not None and cached.get("watermark") == watermark:
+        return cached["result"]
+    
+    result = compute()
+    frappe.cache().set_value(key, {"watermark": watermark, "result": result}, expires_in_sec=RESULT_CACHE_SECONDS)
+    return result
@@ -1,6 +1,6 @@
 import frappe
 from frappe import _
-from frappe.utils import get_dates_between, getdate, add_days
+from frappe.utils import getdate, add_days, cint, flt
 from datetime import datetime, timedelta
 import json
 import calendar
@@ -8,6 +8,13 @@ import io
 import csv
 import base64
 
+from .attendance_rollup import get_rollup_totals, get_distinct_employees, average
+from .analytics_cache import get_cached_result
+from .streaming_export import get_export_path, open_text, register_export_file
+from .working_calendar import get_employee_working_days, count_calendar_days
+from .attendance_sketch import get_percentiles
+from .utilities import get_unique_filename
+
 # Add these imports for Excel export
 try:
     import xlsxwriter
@@ -27,103 +34,119 @@ def get_attendance_analytics(period="monthly", start_date=None, end_date=None):
             start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
             end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
         
-        analytics = {}
-        
-        # 1. Daily Attendance Trends
-        analytics["daily_trends"] = get_daily_attendance_trends(start_date, end_date)
-        
-        # 2. Peak Hours Analysis
-        analytics["peak_hours"] = get_peak_hours_analysis(start_date, end_date)
-        
-        # 3. Department-wise Attendance
-        analytics["department_stats"] = get_department_attendance_stats(start_date, end_date)
-        
-        # 4. Recognition Accuracy Metrics
-        analytics["accuracy_metrics"] = get_recognition_accuracy_metrics(start_date, end_date)
-        
-        # 5. Employee Attendance Patterns
-        analytics["employee_patterns"] = get_employee_attendance_patterns(start_date, end_date)
-        
-        # 6. Location-wise Statistics
-        analytics["location_stats"] = get_location_attendance_stats(start_date, end_date)
-        
-        # 7. Late Arrivals and Early Departures
-        analytics["punctuality_stats"] = get_punctuality_statistics(start_date, end_date)
+        return dict(get_analytics_result(start_date, end_date), success=True)
         
-        # 8. Overtime Analysis
-        analytics["overtime_stats"] = get_overtime_analysis(start_date, end_date)
+    except Exception as e:
+        frappe.log_error(f"Analytics generation error: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+def get_analytics_result(start_date, end_date):
+    """Cached analytics of the range with its percentiles; errors propagate"""
+    analytics = get_cached_result(
+        "attendance_analytics", start_date, end_date,
+        lambda: build_attendance_analytics(start_date, end_date)
+    )
+    return {
+        "period": {"start": start_date, "end": end_date},
+        "analytics": analytics,
+        "percentiles": get_distribution_percentiles(start_date, end_date)
+    }
+
+def build_attendance_analytics(start_date, end_date):
+    """The eight dashboard sections: additive ones from the hourly rollups, the
+    rest from a single pass of the analytics engine over the range"""
+    from .analytics_engine import compute_attendance_analytics, ROW_SECTIONS
+    
+    row_sections = compute_attendance_analytics(start_date, end_date, sections=ROW_SECTIONS)
+    return {
+        "daily_trends": get_daily_attendance_trends(start_date, end_date),
+        "peak_hours": get_peak_hours_analysis(start_date, end_date),
+        "department_stats": get_department_attendance_stats(start_date, end_date),
+        "accuracy_metrics": row_sections["accuracy_metrics"],
+        "employee_patterns": row_sections["employee_patterns"],
+        "location_stats": get_location_attendance_stats(start_date, end_date),
+        "punctuality_stats": get_punctuality_statistics(start_date, end_date),
+        "overtime_stats": row_sections["overtime_stats"]
+    }
+
+@frappe.whitelist()
+def get_attendance_percentiles(start_date=None, end_date=None, group_by=None):
+    """p50/p90/p99 of check-in and check-out times, hours worked and recognition confidence"""
+    try:
+        if not start_date or not end_date:
+            today = datetime.now()
+            start_date = today.replace(day=1).date()
+            end_date = today.date()
+        else:
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
         
         return {
             "success": True,
             "period": {"start": start_date, "end": end_date},
-            "analytics": analytics
+            "group_by": group_by,
+            "percentiles": get_distribution_percentiles(start_date, end_date, group_by)
         }
         
     except Exception as e:
-        frappe.log_error(f"Analytics generation error: {str(e)}")
+        frappe.log_error(f"Attendance percentiles error: {str(e)}")
         return {"success": False, "message": str(e)}
 
+def get_distribution_percentiles(start_date, end_date, group_by=None):
+    """Percentiles merged from the stored quantile sketches, never from attendance rows"""
+    return get_cached_result(
+        "attendance_percentiles", start_date, end_date,
+        lambda: format_percentiles(get_percentiles(start_date, end_date, group_by=group_by)),
+        {"group_by": group_by} if group_by else None
+    )
+
+def format_percentiles(percentiles):
+    # Minute-of-day percentiles are also given as HH:MM
+    for metrics in percentiles.values():
+        for metric in ("check_in_minute", "check_out_minute"):
+            summary = metrics.get(metric) or {}
+            summary["times"] = {
+                key: f"{int(value) // 60:02d}:{int(value) % 60:02d}"
+                for key, value in summary.items() if key.startswith("p")
+            }
+    return percentiles
+
 def get_daily_attendance_trends(start_date, end_date):
     """Get daily attendance trends"""
     try:
-        trends = frappe.db.sql("""
-            SELECT 
-                DATE(attendance_date) as date,
-                COUNT(DISTINCT employee_id) as unique_employees,
-                COUNT(*) as total_records,
-                SUM(CASE WHEN attendance_type = 'Check In' THEN 1 ELSE 0 END) as check_ins,
-                SUM(CASE WHEN attendance_type = 'Check Out' THEN 1 ELSE 0 END) as check_outs,
-                AVG(confidence_score) as avg_confidence,
-                DAYNAME(attendance_date) as day_name
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND docstatus = 1
-            GROUP BY DATE(attendance_date)
-            ORDER BY date
-        """, (start_date, end_date), as_dict=True)
-        
-        # Calculate attendance percentage for each day
-        total_employees = frappe.db.count("Employee Face Recognition", {"status": "Active"})
-        
-        for trend in trends:
-            trend["attendance_percentage"] = round(
-                (trend["unique_employees"] / total_employees) * 100, 2
-            ) if total_employees > 0 else 0
+        trends = []
+        for day in get_rollup_totals(start_date, end_date, ["attendance_date"]):
+            trends.append({
+                "date": day.attendance_date,
+                "unique_employees": cint(day.employee_days),
+                "total_records": cint(day.record_count),
+                "check_ins": cint(day.check_in_type_count),
+                "check_outs": cint(day.check_out_type_count),
+                "avg_confidence": average(day.confidence_sum, day.confidence_count),
+                "day_name": getdate(day.attendance_date).strftime("%A")
+            })
         
-        return trends
+        return add_attendance_percentage(trends)
         
     except Exception as e:
         frappe.log_error(f"Daily trends error: {str(e)}")
         return []
 
+def add_attendance_percentage(trends):
+    # Calculate attendance percentage for each day
+    total_employees = frappe.db.count("Employee Face Recognition", {"status": "Active"})
+    
+    for trend in trends:
+        trend["attendance_percentage"] = round(
+            (trend["unique_employees"] / total_employees) * 100, 2
+        ) if total_employees > 0 else 0
+    
+    return trends
+
 def get_peak_hours_analysis(start_date, end_date):
     """Analyze peak check-in and check-out hours"""
     try:
-        peak_hours = frappe.db.sql("""
-            SELECT 
-                HOUR(check_in_time) as hour,
-                COUNT(*) as check_in_count,
-                'Check In' as type
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND check_in_time IS NOT NULL
-            AND docstatus = 1
-            GROUP BY HOUR(check_in_time)
-            
-            UNION ALL
-            
-            SELECT 
-                HOUR(check_out_time) as hour,
-                COUNT(*) as count,
-                'Check Out' as type
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND check_out_time IS NOT NULL
-            AND docstatus = 1
-            GROUP BY HOUR(check_out_time)
-            
-            ORDER BY hour
-        """, (start_date, end_date, start_date, end_date), as_dict=True)
+        peak_hours = get_rollup_totals(start_date, end_date, ["hour"], having=None)
         
         # Process data for better visualization
         hourly_data = {}
@@ -131,60 +154,68 @@ def get_peak_hours_analysis(start_date, end_date):
             hourly_data[hour] = {"check_in": 0, "check_out": 0}
         
         for record in peak_hours:
-            hour = record["hour"]
-            if record["type"] == "Check In":
-                hourly_data[hour]["check_in"] = record.get("check_in_count", record.get("count", 0))
-            else:
-                hourly_data[hour]["check_out"] = record.get("count", 0)
+            hourly_data[record.hour]["check_in"] = cint(record.check_in_events)
+            hourly_data[record.hour]["check_out"] = cint(record.check_out_events)
         
-        return [
-            {
-                "hour": f"{hour:02d}:00",
-                "check_in_count": data["check_in"],
-                "check_out_count": data["check_out"],
-                "total_activity": data["check_in"] + data["check_out"]
-            }
-            for hour, data in hourly_data.items()
-        ]
+        return format_peak_hours(hourly_data)
         
     except Exception as e:
         frappe.log_error(f"Peak hours analysis error: {str(e)}")
         return []
 
+def format_peak_hours(hourly_data):
+    return [
+        {
+            "hour": f"{hour:02d}:00",
+            "check_in_count": data["check_in"],
+            "check_out_count": data["check_out"],
+            "total_activity": data["check_in"] + data["check_out"]
+        }
+        for hour, data in hourly_data.items()
+    ]
+
 def get_department_attendance_stats(start_date, end_date):
     """Get department-wise attendance statistics"""
     try:
-        dept_stats = frappe.db.sql("""
-            SELECT 
-                COALESCE(department, 'Unknown') as department,
-                COUNT(DISTINCT employee_id) as unique_employees,
-                COUNT(*) as total_records,
-                AVG(confidence_score) as avg_confidence,
-                SUM(CASE WHEN TIME(check_in_time) > '09:30:00' THEN 1 ELSE 0 END) as late_arrivals,
-                SUM(CASE WHEN TIME(check_out_time) < '17:30:00' THEN 1 ELSE 0 END) as early_departures,
-                AVG(total_hours) as avg_working_hours
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND docstatus = 1
-            GROUP BY department
-            ORDER BY unique_employees DESC
-        """, (start_date, end_date), as_dict=True)
-        
-        # Calculate additional metrics
-        for dept in dept_stats:
-            dept["punctuality_rate"] = round(
-                ((dept["total_records"] - dept["late_arrivals"]) / dept["total_records"]) * 100, 2
-            ) if dept["total_records"] > 0 else 0
-            
-            dept["avg_confidence"] = round(dept["avg_confidence"] or 0, 2)
-            dept["avg_working_hours"] = round(dept["avg_working_hours"] or 0, 2)
-        
-        return dept_stats
+        totals = {}
+        employees = get_distinct_employees(start_date, end_date, "department")
+        for day in get_rollup_totals(start_date, end_date, ["department"]):
+            department = day.department or "Unknown"
+            dept = totals.setdefault(department, frappe._dict(
+                department=department, unique_employees=0, total_records=0, late_arrivals=0,
+                early_departures=0, confidence_sum=0, confidence_count=0, hours_sum=0, hours_count=0
+            ))
+            dept.unique_employees = cint(employees.get(day.department or ""))
+            for measure in ("confidence_sum", "confidence_count", "hours_sum", "hours_count"):
+                dept[measure] += flt(day[measure])
+            dept.total_records += cint(day.record_count)
+            dept.late_arrivals += cint(day.late_arrivals)
+            dept.early_departures += cint(day.early_departures)
+        
+        dept_stats = []
+        for dept in sorted(totals.values(), key=lambda dept: dept.unique_employees, reverse=True):
+            dept.avg_confidence = average(dept.pop("confidence_sum"), dept.pop("confidence_count"))
+            dept.avg_working_hours = average(dept.pop("hours_sum"), dept.pop("hours_count"))
+            dept_stats.append(dept)
+        
+        return finish_department_stats(dept_stats)
         
     except Exception as e:
         frappe.log_error(f"Department stats error: {str(e)}")
         return []
 
+def finish_department_stats(dept_stats):
+    # Calculate additional metrics
+    for dept in dept_stats:
+        dept["punctuality_rate"] = round(
+            ((dept["total_records"] - dept["late_arrivals"]) / dept["total_records"]) * 100, 2
+        ) if dept["total_records"] > 0 else 0
+        
+        dept["avg_confidence"] = round(dept["avg_confidence"] or 0, 2)
+        dept["avg_working_hours"] = round(dept["avg_working_hours"] or 0, 2)
+    
+    return dept_stats
+
 def get_recognition_accuracy_metrics(start_date, end_date):
     """Get face recognition accuracy metrics"""
     try:
@@ -204,32 +235,33 @@ def get_recognition_accuracy_metrics(start_date, end_date):
             ORDER BY date
         """, (start_date, end_date), as_dict=True)
         
-        # Calculate success rates
-        for metric in accuracy_metrics:
-            metric["success_rate"] = round(
-                (metric["successful_recognitions"] / metric["total_attempts"]) * 100, 2
-            ) if metric["total_attempts"] > 0 else 0
-            
-            metric["avg_confidence"] = round(metric["avg_confidence"] or 0, 2)
-            metric["confidence_stddev"] = round(metric["confidence_stddev"] or 0, 2)
-        
-        # Overall accuracy summary
-        total_attempts = sum([m["total_attempts"] for m in accuracy_metrics])
-        total_successful = sum([m["successful_recognitions"] for m in accuracy_metrics])
-        
-        overall_accuracy = {
-            "total_attempts": total_attempts,
-            "successful_recognitions": total_successful,
-            "overall_success_rate": round((total_successful / total_attempts) * 100, 2) if total_attempts > 0 else 0,
-            "daily_metrics": accuracy_metrics
-        }
-        
-        return overall_accuracy
+        return finish_accuracy_metrics(accuracy_metrics)
         
     except Exception as e:
         frappe.log_error(f"Accuracy metrics error: {str(e)}")
         return {}
 
+def finish_accuracy_metrics(accuracy_metrics):
+    # Calculate success rates
+    for metric in accuracy_metrics:
+        metric["success_rate"] = round(
+            (metric["successful_recognitions"] / metric["total_attempts"]) * 100, 2
+        ) if metric["total_attempts"] > 0 else 0
+        
+        metric["avg_confidence"] = round(metric["avg_confidence"] or 0, 2)
+        metric["confidence_stddev"] = round(metric["confidence_stddev"] or 0, 2)
+    
+    # Overall accuracy summary
+    total_attempts = sum([m["total_attempts"] for m in accuracy_metrics])
+    total_successful = sum([m["successful_recognitions"] for m in accuracy_metrics])
+    
+    return {
+        "total_attempts": total_attempts,
+        "successful_recognitions": total_successful,
+        "overall_success_rate": round((total_successful / total_attempts) * 100, 2) if total_attempts > 0 else 0,
+        "daily_metrics": accuracy_metrics
+    }
+
 def get_employee_attendance_patterns(start_date, end_date):
     """Analyze individual employee attendance patterns"""
     try:
@@ -239,11 +271,11 @@ def get_employee_attendance_patterns(start_date, end_date):
                 employee_name,
                 department,
                 COUNT(DISTINCT attendance_date) as days_present,
-                AVG(TIME_TO_SEC(TIME(check_in_time)) / 3600) as avg_check_in_hour,
-                AVG(TIME_TO_SEC(TIME(check_out_time)) / 3600) as avg_check_out_hour,
+                AVG(check_in_minute / 60) as avg_check_in_hour,
+                AVG(check_out_minute / 60) as avg_check_out_hour,
                 AVG(total_hours) as avg_daily_hours,
                 STDDEV(total_hours) as hours_consistency,
-                SUM(CASE WHEN TIME(check_in_time) > '09:30:00' THEN 1 ELSE 0 END) as late_days,
+                SUM(is_late) as late_days,
                 MIN(attendance_date) as first_attendance,
                 MAX(attendance_date) as last_attendance
             FROM `tabEmployee Attendance`
@@ -256,101 +288,111 @@ def get_employee_attendance_patterns(start_date, end_date):
             ORDER BY days_present DESC
         """, (start_date, end_date), as_dict=True)
         
-        # Calculate additional pattern metrics
-        total_working_days = len([d for d in get_dates_between(start_date, end_date) 
-                                 if getdate(d).weekday() < 5])  # Weekdays only
-        
-        for pattern in patterns:
-            pattern["attendance_rate"] = round(
-                (pattern["days_present"] / total_working_days) * 100, 2
-            ) if total_working_days > 0 else 0
-            
-            pattern["punctuality_rate"] = round(
-                ((pattern["days_present"] - pattern["late_days"]) / pattern["days_present"]) * 100, 2
-            ) if pattern["days_present"] > 0 else 0
-            
-            pattern["avg_check_in_time"] = f"{int(pattern['avg_check_in_hour'] or 9):02d}:{int(((pattern['avg_check_in_hour'] or 9) % 1) * 60):02d}"
-            pattern["avg_check_out_time"] = f"{int(pattern['avg_check_out_hour'] or 18):02d}:{int(((pattern['avg_check_out_hour'] or 18) % 1) * 60):02d}"
-            pattern["avg_daily_hours"] = round(pattern["avg_daily_hours"] or 0, 2)
-            pattern["hours_consistency"] = round(pattern["hours_consistency"] or 0, 2)
-        
-        return patterns
+        return finish_employee_patterns(patterns, start_date, end_date)
         
     except Exception as e:
         frappe.log_error(f"Employee patterns error: {str(e)}")
         return []
 
+def finish_employee_patterns(patterns, start_date, end_date):
+    # Working days per employee from their company's Holiday List, computed once per company
+    working_days = get_employee_working_days([pattern["employee_id"] for pattern in patterns], start_date, end_date)
+    
+    for pattern in patterns:
+        total_working_days = working_days[pattern["employee_id"]]
+        pattern["attendance_rate"] = round(
+            (pattern["days_present"] / total_working_days) * 100, 2
+        ) if total_working_days > 0 else 0
+        
+        pattern["punctuality_rate"] = round(
+            ((pattern["days_present"] - pattern["late_days"]) / pattern["days_present"]) * 100, 2
+        ) if pattern["days_present"] > 0 else 0
+        
+        pattern["avg_check_in_time"] = f"{int(pattern['avg_check_in_hour'] or 9):02d}:{int(((pattern['avg_check_in_hour'] or 9) % 1) * 60):02d}"
+        pattern["avg_check_out_time"] = f"{int(pattern['avg_check_out_hour'] or 18):02d}:{int(((pattern['avg_check_out_hour'] or 18) % 1) * 60):02d}"
+        pattern["avg_daily_hours"] = round(pattern["avg_daily_hours"] or 0, 2)
+        pattern["hours_consistency"] = round(pattern["hours_consistency"] or 0, 2)
+    
+    return patterns
+
 def get_location_attendance_stats(start_date, end_date):
     """Get location-wise attendance statistics"""
     try:
-        location_stats = frappe.db.sql("""
-            SELECT 
-                kiosk_location,
-                COUNT(DISTINCT employee_id) as unique_employees,
-                COUNT(*) as total_records,
-                COUNT(DISTINCT attendance_date) as active_days,
-                AVG(confidence_score) as avg_confidence,
-                MIN(creation) as first_usage,
-                MAX(creation) as last_usage
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND kiosk_location IS NOT NULL
-            AND docstatus = 1
-            GROUP BY kiosk_location
-            ORDER BY total_records DESC
-        """, (start_date, end_date), as_dict=True)
-        
-        # Calculate utilization metrics
-        for location in location_stats:
-            location["avg_records_per_day"] = round(
-                location["total_records"] / location["active_days"], 2
-            ) if location["active_days"] > 0 else 0
+        totals = {}
+        employees = get_distinct_employees(start_date, end_date, "kiosk_location")
+        for day in get_rollup_totals(start_date, end_date, ["kiosk_location", "attendance_date"]):
+            if not day.kiosk_location:
+                continue
             
-            location["avg_confidence"] = round(location["avg_confidence"] or 0, 2)
-        
-        return location_stats
+            location = totals.setdefault(day.kiosk_location, frappe._dict(
+                kiosk_location=day.kiosk_location, unique_employees=cint(employees.get(day.kiosk_location)),
+                total_records=0, active_days=0, confidence_sum=0, confidence_count=0,
+                first_usage=day.attendance_date
+            ))
+            location.total_records += cint(day.record_count)
+            location.active_days += 1
+            location.confidence_sum += flt(day.confidence_sum)
+            location.confidence_count += flt(day.confidence_count)
+            location.last_usage = day.attendance_date
+        
+        location_stats = []
+        for location in sorted(totals.values(), key=lambda location: location.total_records, reverse=True):
+            location.avg_confidence = average(location.pop("confidence_sum"), location.pop("confidence_count"))
+            location_stats.append(location)
+        
+        return finish_location_stats(location_stats)
         
     except Exception as e:
         frappe.log_error(f"Location stats error: {str(e)}")
         return []
 
+def finish_location_stats(location_stats):
+    # Calculate utilization metrics
+    for location in location_stats:
+        location["avg_records_per_day"] = round(
+            location["total_records"] / location["active_days"], 2
+        ) if location["active_days"] > 0 else 0
+        
+        location["avg_confidence"] = round(location["avg_confidence"] or 0, 2)
+    
+    return location_stats
+
 def get_punctuality_statistics(start_date, end_date):
     """Analyze punctuality patterns"""
     try:
-        punctuality_stats = frappe.db.sql("""
-            SELECT 
-                DATE(attendance_date) as date,
-                COUNT(*) as total_check_ins,
-                SUM(CASE WHEN TIME(check_in_time) <= '09:00:00' THEN 1 ELSE 0 END) as early_arrivals,
-                SUM(CASE WHEN TIME(check_in_time) BETWEEN '09:01:00' AND '09:30:00' THEN 1 ELSE 0 END) as on_time_arrivals,
-                SUM(CASE WHEN TIME(check_in_time) > '09:30:00' THEN 1 ELSE 0 END) as late_arrivals,
-                AVG(TIME_TO_SEC(TIMEDIFF(check_in_time, CONCAT(DATE(check_in_time), ' 09:00:00'))) / 60) as avg_lateness_minutes
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND check_in_time IS NOT NULL
-            AND docstatus = 1
-            GROUP BY DATE(attendance_date)
-            ORDER BY date
-        """, (start_date, end_date), as_dict=True)
-        
-        # Calculate percentages
-        for stat in punctuality_stats:
-            total = stat["total_check_ins"]
-            if total > 0:
-                stat["early_percentage"] = round((stat["early_arrivals"] / total) * 100, 2)
-                stat["on_time_percentage"] = round((stat["on_time_arrivals"] / total) * 100, 2)
-                stat["late_percentage"] = round((stat["late_arrivals"] / total) * 100, 2)
-            else:
-                stat["early_percentage"] = stat["on_time_percentage"] = stat["late_percentage"] = 0
-            
-            stat["avg_lateness_minutes"] = round(stat["avg_lateness_minutes"] or 0, 2)
+        punctuality_stats = [
+            {
+                "date": day.attendance_date,
+                "total_check_ins": cint(day.check_in_events),
+                "early_arrivals": cint(day.early_arrivals),
+                "on_time_arrivals": cint(day.on_time_arrivals),
+                "late_arrivals": cint(day.late_arrivals),
+                "avg_lateness_minutes": average(day.lateness_minutes_sum, day.check_in_events)
+            }
+            for day in get_rollup_totals(start_date, end_date, ["attendance_date"], having="SUM(check_in_events) > 0")
+        ]
         
-        return punctuality_stats
+        return finish_punctuality_stats(punctuality_stats)
         
     except Exception as e:
         frappe.log_error(f"Punctuality stats error: {str(e)}")
         return []
 
+def finish_punctuality_stats(punctuality_stats):
+    # Calculate percentages
+    for stat in punctuality_stats:
+        total = stat["total_check_ins"]
+        if total > 0:
+            stat["early_percentage"] = round((stat["early_arrivals"] / total) * 100, 2)
+            stat["on_time_percentage"] = round((stat["on_time_arrivals"] / total) * 100, 2)
+            stat["late_percentage"] = round((stat["late_arrivals"] / total) * 100, 2)
+        else:
+            stat["early_percentage"] = stat["on_time_percentage"] = stat["late_percentage"] = 0
+        
+        stat["avg_lateness_minutes"] = round(stat["avg_lateness_minutes"] or 0, 2)
+    
+    return punctuality_stats
+
 def get_overtime_analysis(start_date, end_date):
     """Analyze overtime patterns"""
     try:
@@ -360,10 +402,10 @@ def get_overtime_analysis(start_date, end_date):
                 employee_name,
                 department,
                 COUNT(*) as working_days,
-                SUM(CASE WHEN total_hours > 9 THEN (total_hours - 9) ELSE 0 END) as total_overtime_hours,
-                AVG(CASE WHEN total_hours > 9 THEN (total_hours - 9) ELSE 0 END) as avg_overtime_per_day,
+                SUM(COALESCE(overtime_hours, 0)) as total_overtime_hours,
+                AVG(COALESCE(overtime_hours, 0)) as avg_overtime_per_day,
                 MAX(total_hours) as max_hours_single_day,
-                SUM(CASE WHEN total_hours > 9 THEN 1 ELSE 0 END) as overtime_days
+                SUM(CASE WHEN overtime_hours > 0 THEN 1 ELSE 0 END) as overtime_days
             FROM `tabEmployee Attendance`
             WHERE attendance_date BETWEEN %s AND %s
             AND total_hours IS NOT NULL
@@ -374,25 +416,28 @@ def get_overtime_analysis(start_date, end_date):
             ORDER BY total_overtime_hours DESC
         """, (start_date, end_date), as_dict=True)
         
-        # Calculate overtime metrics
-        for stat in overtime_stats:
-            stat["overtime_frequency"] = round(
-                (stat["overtime_days"] / stat["working_days"]) * 100, 2
-            ) if stat["working_days"] > 0 else 0
-            
-            stat["total_overtime_hours"] = round(stat["total_overtime_hours"], 2)
-            stat["avg_overtime_per_day"] = round(stat["avg_overtime_per_day"], 2)
-            stat["max_hours_single_day"] = round(stat["max_hours_single_day"], 2)
-        
-        return overtime_stats
+        return finish_overtime_stats(overtime_stats)
         
     except Exception as e:
         frappe.log_error(f"Overtime analysis error: {str(e)}")
         return []
 
+def finish_overtime_stats(overtime_stats):
+    # Calculate overtime metrics
+    for stat in overtime_stats:
+        stat["overtime_frequency"] = round(
+            (stat["overtime_days"] / stat["working_days"]) * 100, 2
+        ) if stat["working_days"] > 0 else 0
+        
+        stat["total_overtime_hours"] = round(stat["total_overtime_hours"], 2)
+        stat["avg_overtime_per_day"] = round(stat["avg_overtime_per_day"], 2)
+        stat["max_hours_single_day"] = round(stat["max_hours_single_day"], 2)
+    
+    return overtime_stats
+
 @frappe.whitelist()
-def generate_attendance_report(report_type="comprehensive", start_date=None, end_date=None, filters=None):
-    """Generate comprehensive attendance reports"""
+def generate_attendance_report(report_type="comprehensive", start_date=None, end_date=None, filters=None, period="Custom", auto_refresh=0):
+    """Queue an attendance report; progress and the result file are kept on its Attendance Report"""
     try:
         if not start_date or not end_date:
             today = datetime.now()
@@ -402,40 +447,18 @@ def generate_attendance_report(report_type="comprehensive", start_date=None, end
             start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
             end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
         
-        filters = filters or {}
-        
-        report_data = {}
-        
-        if report_type in ["comprehensive", "summary"]:
-            # Executive Summary
-            report_data["executive_summary"] = generate_executive_summary(start_date, end_date, filters)
+        filters = frappe.parse_json(filters) if filters else {}
         
-        if report_type in ["comprehensive", "detailed"]:
-            # Detailed Analytics
-            report_data["detailed_analytics"] = get_attendance_analytics("custom", start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
-        
-        if report_type in ["comprehensive", "employee"]:
-            # Employee Performance Report
-            report_data["employee_performance"] = generate_employee_performance_report(start_date, end_date, filters)
-        
-        if report_type in ["comprehensive", "operational"]:
-            # Operational Insights
-            report_data["operational_insights"] = generate_operational_insights(start_date, end_date, filters)
-        
-        # Save report
-        report_doc = frappe.new_doc("Attendance Report")
-        report_doc.report_type = report_type
-        report_doc.start_date = start_date
-        report_doc.end_date = end_date
-        report_doc.filters_applied = json.dumps(filters)
-        report_doc.report_data = json.dumps(report_data)
-        report_doc.generated_by = frappe.session.user
-        report_doc.insert()
+        # Identical requests share the in-flight or still up-to-date report
+        from .report_jobs import queue_attendance_report
+        report_doc = queue_attendance_report(report_type, start_date, end_date, filters, period, auto_refresh)
         
         return {
             "success": True,
             "report_id": report_doc.name,
-            "report_data": report_data
+            "status": report_doc.status,
+            "progress": report_doc.progress,
+            "file_url": report_doc.report_file
         }
         
     except Exception as e:
@@ -445,218 +468,224 @@ def generate_attendance_report(report_type="comprehensive", start_date=None, end
 def generate_employee_performance_report(start_date, end_date, filters):
     """Generate detailed employee performance report"""
     try:
-        department_filter = ""
-        filter_values = [start_date, end_date]
-        
-        if filters.get("department"):
-            department_filter = "AND department = %s"
-            filter_values.append(filters["department"])
-        
-        employee_performance = frappe.db.sql(f"""
-            SELECT 
-                employee_id,
-                employee_name,
-                department,
-                COUNT(DISTINCT attendance_date) as total_days,
-                AVG(total_hours) as avg_hours_per_day,
-                SUM(total_hours) as total_hours_worked,
-                MIN(TIME(check_in_time)) as earliest_check_in,
-                MAX(TIME(check_out_time)) as latest_check_out,
-                SUM(CASE WHEN TIME(check_in_time) > '09:30:00' THEN 1 ELSE 0 END) as late_days,
-                SUM(CASE WHEN total_hours > 9 THEN 1 ELSE 0 END) as overtime_days,
-                AVG(confidence_score) as avg_recognition_score,
-                COUNT(CASE WHEN verification_status = 'Failed' THEN 1 END) as failed_recognitions
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND docstatus = 1
-            {department_filter}
-            GROUP BY employee_id
-            ORDER BY total_hours_worked DESC
-        """, filter_values, as_dict=True)
-        
-        # Calculate performance metrics
-        for emp in employee_performance:
-            working_days = len([d for d in get_dates_between(start_date, end_date) 
-                               if getdate(d).weekday() < 5])
-            
-            emp["attendance_percentage"] = round((emp["total_days"] / working_days) * 100, 2) if working_days > 0 else 0
-            emp["punctuality_rate"] = round(((emp["total_days"] - emp["late_days"]) / emp["total_days"]) * 100, 2) if emp["total_days"] > 0 else 0
-            emp["overtime_frequency"] = round((emp["overtime_days"] / emp["total_days"]) * 100, 2) if emp["total_days"] > 0 else 0
-            emp["avg_hours_per_day"] = round(emp["avg_hours_per_day"] or 0, 2)
-            emp["total_hours_worked"] = round(emp["total_hours_worked"] or 0, 2)
-            emp["avg_recognition_score"] = round(emp["avg_recognition_score"] or 0, 2)
-        
-        return {
-            "employee_details": employee_performance,
-            "summary": {
-                "total_employees": len(employee_performance),
-                "avg_attendance_rate": round(sum([e["attendance_percentage"] for e in employee_performance]) / len(employee_performance), 2) if employee_performance else 0,
-                "avg_punctuality_rate": round(sum([e["punctuality_rate"] for e in employee_performance]) / len(employee_performance), 2) if employee_performance else 0,
-                "total_hours_all_employees": sum([e["total_hours_worked"] for e in employee_performance])
-            }
-        }
+        return get_employee_performance_report(start_date, end_date, filters)
         
     except Exception as e:
         frappe.log_error(f"Employee performance report error: {str(e)}")
         return {}
 
+def get_employee_performance_report(start_date, end_date, filters):
+    """Cached employee performance report; errors propagate"""
+    return get_cached_result(
+        "employee_performance", start_date, end_date,
+        lambda: build_employee_performance_report(start_date, end_date, filters), filters
+    )
+
+def build_employee_performance_report(start_date, end_date, filters):
+    """Compute the employee performance report (uncached)"""
+    department_filter = ""
+    filter_values = [start_date, end_date]
+    
+    if filters.get("department"):
+        department_filter = "AND department = %s"
+        filter_values.append(filters["department"])
+    
+    employee_performance = frappe.db.sql(f"""
+        SELECT 
+            employee_id,
+            employee_name,
+            department,
+            COUNT(DISTINCT attendance_date) as total_days,
+            AVG(total_hours) as avg_hours_per_day,
+            SUM(total_hours) as total_hours_worked,
+            MIN(TIME(check_in_time)) as earliest_check_in,
+            MAX(TIME(check_out_time)) as latest_check_out,
+            SUM(is_late) as late_days,
+            SUM(CASE WHEN overtime_hours > 0 THEN 1 ELSE 0 END) as overtime_days,
+            AVG(confidence_score) as avg_recognition_score,
+            COUNT(CASE WHEN verification_status = 'Failed' THEN 1 END) as failed_recognitions
+        FROM `tabEmployee Attendance`
+        WHERE attendance_date BETWEEN %s AND %s
+        AND docstatus = 1
+        {department_filter}
+        GROUP BY employee_id
+        ORDER BY total_hours_worked DESC
+    """, filter_values, as_dict=True)
+    
+    # Calculate performance metrics
+    employee_working_days = get_employee_working_days([emp["employee_id"] for emp in employee_performance], start_date, end_date)
+    for emp in employee_performance:
+        working_days = employee_working_days[emp["employee_id"]]
+        
+        emp["attendance_percentage"] = round((emp["total_days"] / working_days) * 100, 2) if working_days > 0 else 0
+        emp["punctuality_rate"] = round(((emp["total_days"] - emp["late_days"]) / emp["total_days"]) * 100, 2) if emp["total_days"] > 0 else 0
+        emp["overtime_frequency"] = round((emp["overtime_days"] / emp["total_days"]) * 100, 2) if emp["total_days"] > 0 else 0
+        emp["avg_hours_per_day"] = round(emp["avg_hours_per_day"] or 0, 2)
+        emp["total_hours_worked"] = round(emp["total_hours_worked"] or 0, 2)
+        emp["avg_recognition_score"] = round(emp["avg_recognition_score"] or 0, 2)
+    
+    return {
+        "employee_details": employee_performance,
+        "summary": {
+            "total_employees": len(employee_performance),
+            "avg_attendance_rate": round(sum([e["attendance_percentage"] for e in employee_performance]) / len(employee_performance), 2) if employee_performance else 0,
+            "avg_punctuality_rate": round(sum([e["punctuality_rate"] for e in employee_performance]) / len(employee_performance), 2) if employee_performance else 0,
+            "total_hours_all_employees": sum([e["total_hours_worked"] for e in employee_performance])
+        }
+    }
+
 def generate_operational_insights(start_date, end_date, filters):
     """Generate operational insights and recommendations"""
     try:
-        # System utilization metrics
-        system_stats = frappe.db.sql("""
-            SELECT 
-                COUNT(DISTINCT kiosk_location) as active_locations,
-                COUNT(*) as total_transactions,
-                AVG(confidence_score) as avg_system_confidence,
-                COUNT(CASE WHEN verification_status = 'Failed' THEN 1 END) as system_failures,
-                COUNT(DISTINCT DATE(attendance_date)) as active_days
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND docstatus = 1
-        """, (start_date, end_date), as_dict=True)[0]
-        
-        # Peak usage analysis
-        peak_usage = frappe.db.sql("""
-            SELECT 
-                HOUR(creation) as hour,
-                COUNT(*) as transaction_count
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND docstatus = 1
-            GROUP BY HOUR(creation)
-            ORDER BY transaction_count DESC
-            LIMIT 5
-        """, (start_date, end_date), as_dict=True)
-        
-        # Error analysis
-        error_patterns = frappe.db.sql("""
-            SELECT 
-                kiosk_location,
-                COUNT(CASE WHEN verification_status = 'Failed' THEN 1 END) as failure_count,
-                COUNT(*) as total_attempts,
-                ROUND((COUNT(CASE WHEN verification_status = 'Failed' THEN 1 END) / COUNT(*)) * 100, 2) as failure_rate
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            GROUP BY kiosk_location
-            HAVING failure_count > 0
-            ORDER BY failure_rate DESC
-        """, (start_date, end_date), as_dict=True)
-        
-        # Generate recommendations
-        recommendations = []
-        
-        if system_stats["avg_system_confidence"] < 85:
-            recommendations.append({
-                "category": "Technical",
-                "priority": "High",
-                "issue": "Low recognition confidence",
-                "recommendation": "Update employee face images and recalibrate recognition system"
-            })
+        return get_operational_insights(start_date, end_date, filters)
         
-        failure_rate = (system_stats["system_failures"] / system_stats["total_transactions"]) * 100 if system_stats["total_transactions"] > 0 else 0
-        if failure_rate > 5:
+    except Exception as e:
+        frappe.log_error(f"Operational insights error: {str(e)}")
+        return {}
+
+def get_operational_insights(start_date, end_date, filters):
+    """Cached operational insights; errors propagate"""
+    return get_cached_result(
+        "operational_insights", start_date, end_date,
+        lambda: build_operational_insights(start_date, end_date, filters), filters
+    )
+
+def build_operational_insights(start_date, end_date, filters):
+    """Compute the operational insights (uncached)"""
+    # System utilization metrics
+    system_stats = frappe.db.sql("""
+        SELECT 
+            COUNT(DISTINCT kiosk_location) as active_locations,
+            COUNT(*) as total_transactions,
+            AVG(confidence_score) as avg_system_confidence,
+            COUNT(CASE WHEN verification_status = 'Failed' THEN 1 END) as system_failures,
+            COUNT(DISTINCT DATE(attendance_date)) as active_days
+        FROM `tabEmployee Attendance`
+        WHERE attendance_date BETWEEN %s AND %s
+        AND docstatus = 1
+    """, (start_date, end_date), as_dict=True)[0]
+    
+    # Peak usage analysis
+    peak_usage = frappe.db.sql("""
+        SELECT 
+            HOUR(creation) as hour,
+            COUNT(*) as transaction_count
+        FROM `tabEmployee Attendance`
+        WHERE attendance_date BETWEEN %s AND %s
+        AND docstatus = 1
+        GROUP BY HOUR(creation)
+        ORDER BY transaction_count DESC
+        LIMIT 5
+    """, (start_date, end_date), as_dict=True)
+    
+    # Error analysis
+    error_patterns = frappe.db.sql("""
+        SELECT 
+            kiosk_location,
+            COUNT(CASE WHEN verification_status = 'Failed' THEN 1 END) as failure_count,
+            COUNT(*) as total_attempts,
+            ROUND((COUNT(CASE WHEN verification_status = 'Failed' THEN 1 END) / COUNT(*)) * 100, 2) as failure_rate
+        FROM `tabEmployee Attendance`
+        WHERE attendance_date BETWEEN %s AND %s
+        GROUP BY kiosk_location
+        HAVING failure_count > 0
+        ORDER BY failure_rate DESC
+    """, (start_date, end_date), as_dict=True)
+    
+    # Generate recommendations
+    recommendations = []
+    
+    if system_stats["avg_system_confidence"] < 85:
+        recommendations.append({
+            "category": "Technical",
+            "priority": "High",
+            "issue": "Low recognition confidence",
+            "recommendation": "Update employee face images and recalibrate recognition system"
+        })
+    
+    failure_rate = (system_stats["system_failures"] / system_stats["total_transactions"]) * 100 if system_stats["total_transactions"] > 0 else 0
+    if failure_rate > 5:
+        recommendations.append({
+            "category": "System Performance",
+            "priority": "Medium",
+            "issue": f"High failure rate: {failure_rate:.2f}%",
+            "recommendation": "Investigate hardware issues and improve lighting conditions"
+        })
+    
+    # Check for locations with high failure rates
+    for location in error_patterns:
+        if location["failure_rate"] > 10:
             recommendations.append({
-                "category": "System Performance",
+                "category": "Location Specific",
                 "priority": "Medium",
-                "issue": f"High failure rate: {failure_rate:.2f}%",
-                "recommendation": "Investigate hardware issues and improve lighting conditions"
+                "issue": f"High failure rate at {location['kiosk_location']}: {location['failure_rate']}%",
+                "recommendation": f"Inspect hardware and environmental conditions at {location['kiosk_location']}"
             })
-        
-        # Check for locations with high failure rates
-        for location in error_patterns:
-            if location["failure_rate"] > 10:
-                recommendations.append({
-                    "category": "Location Specific",
-                    "priority": "Medium",
-                    "issue": f"High failure rate at {location['kiosk_location']}: {location['failure_rate']}%",
-                    "recommendation": f"Inspect hardware and environmental conditions at {location['kiosk_location']}"
-                })
-        
-        return {
-            "system_performance": {
-                "utilization_stats": system_stats,
-                "peak_hours": peak_usage,
-                "error_analysis": error_patterns,
-                "overall_success_rate": round(100 - failure_rate, 2)
-            },
-            "recommendations": recommendations,
-            "operational_metrics": {
-                "avg_transactions_per_day": round(system_stats["total_transactions"] / system_stats["active_days"], 2) if system_stats["active_days"] > 0 else 0,
-                "system_uptime": round((system_stats["active_days"] / len(get_dates_between(start_date, end_date))) * 100, 2),
-                "location_coverage": system_stats["active_locations"]
-            }
+    
+    return {
+        "system_performance": {
+            "utilization_stats": system_stats,
+            "peak_hours": peak_usage,
+            "error_analysis": error_patterns,
+            "overall_success_rate": round(100 - failure_rate, 2)
+        },
+        "recommendations": recommendations,
+        "operational_metrics": {
+            "avg_transactions_per_day": round(system_stats["total_transactions"] / system_stats["active_days"], 2) if system_stats["active_days"] > 0 else 0,
+            "system_uptime": round((system_stats["active_days"] / count_calendar_days(start_date, end_date)) * 100, 2),
+            "location_coverage": system_stats["active_locations"]
         }
-        
-    except Exception as e:
-        frappe.log_error(f"Operational insights error: {str(e)}")
-        return {}
+    }
 
 def generate_executive_summary(start_date, end_date, filters):
     """Generate executive summary for attendance"""
     try:
-        # Key Metrics
-        total_employees = frappe.db.count("Employee Face Recognition", {"status": "Active"})
-        
-        summary_stats = frappe.db.sql("""
-            SELECT 
-                COUNT(DISTINCT employee_id) as active_employees,
-                COUNT(*) as total_attendance_records,
-                AVG(total_hours) as avg_working_hours,
-                SUM(CASE WHEN TIME(check_in_time) > '09:30:00' THEN 1 ELSE 0 END) as total_late_arrivals,
-                AVG(confidence_score) as avg_recognition_confidence
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND docstatus = 1
-        """, (start_date, end_date), as_dict=True)[0]
-        
-        # Calculate key performance indicators
-        attendance_rate = round((summary_stats["active_employees"] / total_employees) * 100, 2) if total_employees > 0 else 0
-        punctuality_rate = round(((summary_stats["total_attendance_records"] - summary_stats["total_late_arrivals"]) / summary_stats["total_attendance_records"]) * 100, 2) if summary_stats["total_attendance_records"] > 0 else 0
-        
-        # Productivity insights
-        productivity_score = calculate_productivity_score(summary_stats, attendance_rate, punctuality_rate)
-        
-        # Trend analysis
-        previous_period_start = start_date - timedelta(days=(end_date - start_date).days + 1)
-        previous_period_end = start_date - timedelta(days=1)
-        
-        previous_stats = frappe.db.sql("""
-            SELECT 
-                COUNT(DISTINCT employee_id) as active_employees,
-                COUNT(*) as total_attendance_records,
-                AVG(total_hours) as avg_working_hours
-            FROM `tabEmployee Attendance`
-            WHERE attendance_date BETWEEN %s AND %s
-            AND docstatus = 1
-        """, (previous_period_start, previous_period_end), as_dict=True)[0]
-        
-        # Calculate trends
-        attendance_trend = calculate_trend(summary_stats["active_employees"], previous_stats["active_employees"])
-        hours_trend = calculate_trend(summary_stats["avg_working_hours"], previous_stats["avg_working_hours"])
-        
-        return {
-            "period": {"start": start_date, "end": end_date},
-            "key_metrics": {
-                "total_employees": total_employees,
-                "active_employees": summary_stats["active_employees"],
-                "attendance_rate": attendance_rate,
-                "punctuality_rate": punctuality_rate,
-                "avg_working_hours": round(summary_stats["avg_working_hours"] or 0, 2),
-                "recognition_confidence": round(summary_stats["avg_recognition_confidence"] or 0, 2),
-                "productivity_score": productivity_score
-            },
-            "trends": {
-                "attendance_change": attendance_trend,
-                "hours_change": hours_trend
-            },
-            "insights": generate_insights(summary_stats, attendance_rate, punctuality_rate)
-        }
+        return get_executive_summary(start_date, end_date, filters)
         
     except Exception as e:
         frappe.log_error(f"Executive summary error: {str(e)}")
         return {}
 
+def get_executive_summary(start_date, end_date, filters):
+    """Cached executive summary; errors propagate"""
+    # The summary compares against the previous period of the same length
+    previous_period_start = start_date - timedelta(days=(end_date - start_date).days + 1)
+    return get_cached_result(
+        "executive_summary", start_date, end_date,
+        lambda: build_executive_summary(start_date, end_date, filters), filters,
+        watermark_from=previous_period_start
+    )
+
+def build_executive_summary(start_date, end_date, filters):
+    """Compute the executive summary (uncached)"""
+    # Current and previous period of the same length from one grouped query
+    from .analytics_trends import get_period_kpis
+    previous_stats, summary_stats = get_period_kpis(
+        "day", 2, end_date, period_days=(end_date - start_date).days + 1
+    )
+    
+    # Calculate trends
+    attendance_trend = calculate_trend(summary_stats["active_employees"], previous_stats["active_employees"])
+    hours_trend = calculate_trend(summary_stats["avg_working_hours"], previous_stats["avg_working_hours"])
+    
+    return {
+        "period": {"start": start_date, "end": end_date},
+        "key_metrics": {
+            "total_employees": summary_stats["total_employees"],
+            "active_employees": summary_stats["active_employees"],
+            "attendance_rate": summary_stats["attendance_rate"],
+            "punctuality_rate": summary_stats["punctuality_rate"],
+            "avg_working_hours": summary_stats["avg_working_hours"],
+            "recognition_confidence": summary_stats["recognition_confidence"],
+            "productivity_score": summary_stats["productivity_score"]
+        },
+        "trends": {
+            "attendance_change": attendance_trend,
+            "hours_change": hours_trend
+        },
+        "insights": generate_insights(summary_stats, summary_stats["attendance_rate"], summary_stats["punctuality_rate"])
+    }
+
 def calculate_productivity_score(stats, attendance_rate, punctuality_rate):
     """Calculate overall productivity score"""
     try:
@@ -751,14 +780,24 @@ def create_analytics_doctypes():
         "fields": [
             {"fieldname": "report_type", "fieldtype": "Select", "label": "Report Type",
              "options": "Comprehensive\nSummary\nDetailed\nEmployee\nOperational", "reqd": 1},
+            {"fieldname": "period", "fieldtype": "Select", "label": "Period",
+             "options": "Custom\nMonth to Date\nLast 7 Days\nLast 30 Days\nPrevious Month", "default": "Custom"},
             {"fieldname": "start_date", "fieldtype": "Date", "label": "Start Date", "reqd": 1},
             {"fieldname": "end_date", "fieldtype": "Date", "label": "End Date", "reqd": 1},
-            {"fieldname": "filters_applied", "fieldtype": "Long Text", "label": "Filters Applied"},
-            {"fieldname": "report_data", "fieldtype": "Long Text", "label": "Report Data"},
-            {"fieldname": "generated_by", "fieldtype": "Link", "options": "User", "label": "Generated By"},
-            {"fieldname": "generation_time", "fieldtype": "Datetime", "label": "Generation Time", "default": "now"},
             {"fieldname": "status", "fieldtype": "Select", "label": "Status",
-             "options": "Generated\nScheduled\nFailed", "default": "Generated"}
+             "options": "Queued\nRunning\nGenerated\nFailed", "default": "Queued"},
+            {"fieldname": "progress", "fieldtype": "Percent", "label": "Progress"},
+            {"fieldname": "auto_refresh", "fieldtype": "Check", "label": "Refresh Daily"},
+            {"fieldname": "request_count", "fieldtype": "Int", "label": "Request Count", "default": 1},
+            {"fieldname": "filters_applied", "fieldtype": "Code", "label": "Filters Applied", "options": "JSON"},
+            {"fieldname": "request_key", "fieldtype": "Data", "label": "Request Key", "hidden": 1},
+            {"fieldname": "watermark", "fieldtype": "Data", "label": "Watermark", "hidden": 1},
+            {"fieldname": "report_file", "fieldtype": "Attach", "label": "Report File"},
+            {"fieldname": "generated_by", "fieldtype": "Link", "options": "User", "label": "Generated By"},
+            {"fieldname": "generation_time", "fieldtype": "Datetime", "label": "Generation Time"},
+            {"fieldname": "job_id", "fieldtype": "Data", "label": "Job ID"},
+            {"fieldname": "started_on", "fieldtype": "Datetime", "label": "Started On"},
+            {"fieldname": "error_message", "fieldtype": "Small Text", "label": "Error Message"}
         ]
     }
     
@@ -784,6 +823,13 @@ def create_analytics_doctypes():
 def export_analytics_data(format_type="excel", analytics_data=None):
     """Export analytics data in various formats"""
     try:
+        if format_type == "pdf" and not analytics_data:
+            # The full report is rendered section by section in background jobs
+            from .pdf_reports import queue_pdf_report
+            today = datetime.now().date()
+            job_id = queue_pdf_report(today.replace(day=1), today)
+            return {"success": True, "job_id": job_id, "format": "pdf", "message": "PDF report queued"}
+        
         if not analytics_data:
             # Get default analytics for current month
             analytics_result = get_attendance_analytics()
@@ -809,37 +855,32 @@ def export_analytics_data(format_type="excel", analytics_data=None):
 def export_to_csv(analytics_data):
     """Export analytics to CSV format"""
     try:
-        output = io.StringIO()
+        file_name = get_unique_filename("attendance_analytics", "csv")
+        path = get_export_path(file_name)
         
-        # Export daily trends
-        if analytics_data.get("daily_trends"):
-            output.write("Daily Attendance Trends\n")
-            output.write("Date,Unique Employees,Check-ins,Check-outs,Attendance %,Avg Confidence\n")
+        # Written section by section straight into the private file
+        with open_text(path) as output:
+            writer = csv.writer(output)
             
-            for trend in analytics_data["daily_trends"]:
-                output.write(f"{trend.get('date', '')},{trend.get('unique_employees', 0)},{trend.get('check_ins', 0)},{trend.get('check_outs', 0)},{trend.get('attendance_percentage', 0)},{trend.get('avg_confidence', 0)}\n")
+            # Export daily trends
+            if analytics_data.get("daily_trends"):
+                writer.writerow(["Daily Attendance Trends"])
+                writer.writerow(["Date", "Unique Employees", "Check-ins", "Check-outs", "Attendance %", "Avg Confidence"])
+                
+                for trend in analytics_data["daily_trends"]:
+                    writer.writerow([trend.get('date', ''), trend.get('unique_employees', 0), trend.get('check_ins', 0), trend.get('check_outs', 0), trend.get('attendance_percentage', 0), trend.get('avg_confidence', 0)])
+                
+                writer.writerow([])
             
-            output.write("\n")
+            # Export department stats
+            if analytics_data.get("department_stats"):
+                writer.writerow(["Department Statistics"])
+                writer.writerow(["Department", "Employees", "Total Records", "Avg Confidence", "Late Arrivals", "Punctuality %"])
+                
+                for dept in analytics_data["department_stats"]:
+                    writer.writerow([dept.get('department', ''), dept.get('unique_employees', 0), dept.get('total_records', 0), dept.get('avg_confidence', 0), dept.get('late_arrivals', 0), dept.get('punctuality_rate', 0)])
         
-        # Export department stats
-        if analytics_data.get("department_stats"):
-            output.write("Department Statistics\n")
-            output.write("Department,Employees,Total Records,Avg Confidence,Late Arrivals,Punctuality %\n")
-            
-            for dept in analytics_data["department_stats"]:
-                output.write(f"{dept.get('department', '')},{dept.get('unique_employees', 0)},{dept.get('total_records', 0)},{dept.get('avg_confidence', 0)},{dept.get('late_arrivals', 0)},{dept.get('punctuality_rate', 0)}\n")
-        
-        csv_content = output.getvalue()
-        output.close()
-        
-        # Save as file
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": f"attendance_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            "content": csv_content.encode(),
-            "is_private": 1
-        })
-        file_doc.insert()
+        file_doc = register_export_file(file_name, path)
         
         return {
             "success": True,
@@ -854,16 +895,13 @@ def export_to_csv(analytics_data):
 def export_to_json(analytics_data):
     """Export analytics to JSON format"""
     try:
-        json_content = json.dumps(analytics_data, indent=2, default=str)
-        
-        # Save as file
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": f"attendance_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            "content": json_content.encode(),
-            "is_private": 1
-        })
-        file_doc.insert()
+        file_name = get_unique_filename("attendance_analytics", "json")
+        path = get_export_path(file_name)
+        
+        with open_text(path) as output:
+            json.dump(analytics_data, output, indent=2, default=str)
+        
+        file_doc = register_export_file(file_name, path)
         
         return {
             "success": True,
@@ -878,23 +916,17 @@ def export_to_json(analytics_data):
 def export_to_pdf(analytics_data):
     """Export analytics to PDF format"""
     try:
-        # This would require a PDF library like ReportLab
-        # For now, return a placeholder
         html_content = generate_analytics_html_report(analytics_data)
         
         # Convert HTML to PDF using frappe's built-in PDF generation
         from frappe.utils.pdf import get_pdf
         
-        pdf_content = get_pdf(html_content)
+        file_name = get_unique_filename("attendance_analytics", "pdf")
+        path = get_export_path(file_name)
+        with open(path, "wb") as output:
+            output.write(get_pdf(html_content))
         
-        # Save as file
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": f"attendance_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-            "content": pdf_content,
-            "is_private": 1
-        })
-        file_doc.insert()
+        file_doc = register_export_file(file_name, path)
         
         return {
             "success": True,
@@ -908,81 +940,8 @@ def export_to_pdf(analytics_data):
 
 def generate_analytics_html_report(analytics_data):
     """Generate HTML report for PDF conversion"""
-    html = """
-    <html>
-    <head>
-        <title>Attendance Analytics Report</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 20px; }
-            h1, h2 { color: #333; }
-            table { border-collapse: collapse; width: 100%; margin: 20px 0; }
-            th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-            th { background-color: #f2f2f2; }
-        </style>
-    </head>
-    <body>
-        <h1>Attendance Analytics Report</h1>
-        <p>Generated on: """ + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + """</p>
-    """
-    
-    # Add daily trends table
-    if analytics_data.get("daily_trends"):
-        html += """
-        <h2>Daily Attendance Trends</h2>
-        <table>
-            <tr>
-                <th>Date</th>
-                <th>Unique Employees</th>
-                <th>Check-ins</th>
-                <th>Check-outs</th>
-                <th>Attendance %</th>
-            </tr>
-        """
-        
-        for trend in analytics_data["daily_trends"]:
-            html += f"""
-            <tr>
-                <td>{trend.get('date', '')}</td>
-                <td>{trend.get('unique_employees', 0)}</td>
-                <td>{trend.get('check_ins', 0)}</td>
-                <td>{trend.get('check_outs', 0)}</td>
-                <td>{trend.get('attendance_percentage', 0)}%</td>
-            </tr>
-            """
-        
-        html += "</table>"
-    
-    # Add department stats
-    if analytics_data.get("department_stats"):
-        html += """
-        <h2>Department Statistics</h2>
-        <table>
-            <tr>
-                <th>Department</th>
-                <th>Employees</th>
-                <th>Total Records</th>
-                <th>Punctuality Rate</th>
-            </tr>
-        """
-        
-        for dept in analytics_data["department_stats"]:
-            html += f"""
-            <tr>
-                <td>{dept.get('department', '')}</td>
-                <td>{dept.get('unique_employees', 0)}</td>
-                <td>{dept.get('total_records', 0)}</td>
-                <td>{dept.get('punctuality_rate', 0)}%</td>
-            </tr>
-            """
-        
-        html += "</table>"
-    
-    html += """
-    </body>
-    </html>
-    """
-    
-    return html
+    from .pdf_reports import render_summary_html
+    return render_summary_html(analytics_data)
 
 def export_to_excel(analytics_data):
     """Export analytics to Excel format"""
@@ -990,8 +949,12 @@ def export_to_excel(analytics_data):
         if not xlsxwriter:
             return {"success": False, "message": "xlsxwriter library not available"}
             
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output)
+        file_name = get_unique_filename("attendance_analytics", "xlsx")
+        path = get_export_path(file_name)
+        
+        # constant_memory flushes every row to disk once the next one starts;
+        # the sheet writers below all write in row order as it requires
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
         
         # Create worksheets for different analytics sections
         worksheets = {
@@ -1019,16 +982,8 @@ def export_to_excel(analytics_data):
         write_peak_hours_sheet(worksheets["Peak Hours"], analytics_data.get("peak_hours", []), header_format, data_format)
         
         workbook.close()
-        output.seek(0)
-        
-        # Save as file
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": f"attendance_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            "content": output.getvalue(),
-            "is_private": 1
-        })
-        file_doc.insert()
+        
+        file_doc = register_export_file(file_name, path)
         
         return {
             "success": True,
@@ -0,0 +1,538 @@
+# hrms_biometric/bio_facerecognition/api/analytics_engine.py
+
+import frappe
+import time
+import numpy as np
+from datetime import timedelta, datetime
+from frappe.utils import getdate
+
+from .analytics_dashboard import (
+    add_attendance_percentage, format_peak_hours, finish_department_stats, finish_accuracy_metrics,
+    finish_employee_patterns, finish_location_stats, finish_punctuality_stats, finish_overtime_stats
+)
+
+# Rows fetched per keyset page; each page is turned into NumPy columns and folded in
+BATCH_SIZE = 50000
+
+# Sections the hourly rollups cannot answer: they need distinct days, minimums
+# and maximums per employee, or count draft and cancelled rows
+ROW_SECTIONS = ["accuracy_metrics", "employee_patterns", "overtime_stats"]
+
+# Arrivals up to this minute of the day count as early; lateness, early
+# departure and overtime come from the columns stored at write time
+EARLY_ARRIVAL_BY_MINUTE = 9 * 60
+
+def stream_attendance_batches(start_date, end_date, batch_size=BATCH_SIZE):
+    """Employee Attendance of the range as column batches, one keyset page at a time.
+    
+    Times come back as the stored minutes of the day and dates as day
+    offsets, so the batch converts straight into NumPy arrays. Pages follow
+    (attendance_date, name), so each one is a range scan of the date index
+    starting at the last row seen.
+    """
+    start_date = getdate(start_date)
+    last_date, last_name = start_date, ""
+    while True:
+        rows = frappe.db.sql("""
+            SELECT
+                name, employee_id, employee_name, department, kiosk_location,
+                docstatus, DATEDIFF(attendance_date, %(start_date)s),
+                DATEDIFF(DATE(creation), %(start_date)s), creation,
+                check_in_minute, check_out_minute,
+                CASE attendance_type WHEN 'Check In' THEN 1 WHEN 'Check Out' THEN 2 ELSE 0 END,
+                CASE verification_status WHEN 'Verified' THEN 1 WHEN 'Failed' THEN 2 ELSE 0 END,
+                confidence_score, total_hours, is_late, is_early_departure, overtime_hours
+            FROM `tabEmployee Attendance`
+            WHERE attendance_date BETWEEN %(last_date)s AND %(end_date)s
+            AND (attendance_date > %(last_date)s OR name > %(last_name)s)
+            ORDER BY attendance_date, name
+            LIMIT %(batch_size)s
+        """, {
+            "start_date": start_date, "end_date": end_date,
+            "last_date": last_date, "last_name": last_name, "batch_size": batch_size
+        })
+        
+        if not rows:
+            return
+        
+        yield to_columns(rows)
+        last_date, last_name = start_date + timedelta(days=rows[-1][6]), rows[-1][0]
+
+def to_columns(rows):
+    (names, employees, employee_names, departments, kiosks, docstatus, days, creation_days, creations,
+     check_ins, check_outs, types, verifications, confidences, hours, late, early_departure, overtime) = zip(*rows)
+    return {
+        "employee": list(employees),
+        "employee_name": list(employee_names),
+        "department": list(departments),
+        "kiosk": list(kiosks),
+        "docstatus": np.array(docstatus, dtype=np.int8),
+        "day": np.array(days, dtype=np.int64),
+        "creation_day": np.array(creation_days, dtype=np.int64),
+        "creation": list(creations),
+        "check_in": np.array(check_ins, dtype=float),
+        "check_out": np.array(check_outs, dtype=float),
+        "type": np.array(types, dtype=np.int8),
+        "verification": np.array(verifications, dtype=np.int8),
+        "confidence": np.array(confidences, dtype=float),
+        "hours": np.array(hours, dtype=float),
+        "late": np.array(late, dtype=bool),
+        "early_departure": np.array(early_departure, dtype=bool),
+        "overtime": np.nan_to_num(np.array(overtime, dtype=float))
+    }
+
+def new_group_index():
+    return {"codes": {}, "keys": []}
+
+def encode(index, values):
+    """Dense integer codes for the values, stable across batches"""
+    codes = index["codes"]
+    out = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(index["keys"])
+            index["keys"].append(value)
+        out[i] = code
+    return out
+
+def new_state():
+    return {"groups": {}, "sums": {}, "mins": {}, "maxs": {}, "pairs": {}, "firsts": {}}
+
+def add_sum(state, name, codes, weights=None):
+    """Per-group sum (a count without weights), growing with the group index"""
+    total = np.bincount(codes, weights=weights, minlength=0) if len(codes) else np.zeros(0)
+    current = state["sums"].get(name, np.zeros(0))
+    size = max(len(total), len(current))
+    state["sums"][name] = np.pad(current, (0, size - len(current))) + np.pad(total, (0, size - len(total)))
+
+def add_extreme(state, kind, name, codes, values):
+    fill, reduce = (np.inf, np.minimum) if kind == "mins" else (-np.inf, np.maximum)
+    current = state[kind].get(name, np.zeros(0))
+    size = max(len(current), int(codes.max()) + 1 if len(codes) else 0)
+    current = np.concatenate([current, np.full(size - len(current), fill)])
+    reduce.at(current, codes, values)
+    state[kind][name] = current
+
+def add_pairs(state, name, codes, others):
+    """Distinct (group, other) pairs, for COUNT(DISTINCT ...)"""
+    state["pairs"].setdefault(name, []).append(np.unique((codes << 32) | others))
+
+def add_firsts(state, name, codes, rows_values):
+    # Non-aggregated columns (employee name, department) take the first row seen, as MySQL does
+    firsts = state["firsts"].setdefault(name, {})
+    for code, value in zip(codes.tolist(), rows_values):
+        firsts.setdefault(code, value)
+
+def get_sum(state, name, size):
+    values = state["sums"].get(name, np.zeros(0))
+    return np.pad(values, (0, max(0, size - len(values))))
+
+def get_extreme(state, kind, name, size):
+    values = state[kind].get(name, np.zeros(0))
+    return np.concatenate([values, np.full(max(0, size - len(values)), np.nan)])
+
+def get_distinct(state, name, size):
+    pairs = state["pairs"].get(name)
+    if not pairs:
+        return np.zeros(size, dtype=np.int64)
+    return np.bincount(np.unique(np.concatenate(pairs)) >> 32, minlength=size)
+
+def prepare_batch(state, batch):
+    """Group codes and masks shared by the section folds"""
+    groups = state["groups"]
+    for name in ("employee", "department", "kiosk", "creation_day"):
+        groups.setdefault(name, new_group_index())
+    
+    batch = dict(batch)
+    batch["employee_code"] = encode(groups["employee"], batch["employee"])
+    # Department stats group NULL departments as "Unknown"; patterns and overtime keep the NULL
+    batch["department_code"] = encode(groups["department"], ["Unknown" if value is None else value for value in batch["department"]])
+    batch["kiosk_code"] = encode(groups["kiosk"], batch["kiosk"])
+    batch["creation_day_code"] = encode(groups["creation_day"], batch["creation_day"].tolist())
+    
+    batch["submitted"] = batch["docstatus"] == 1
+    batch["has_check_in"] = ~np.isnan(batch["check_in"])
+    batch["has_check_out"] = ~np.isnan(batch["check_out"])
+    batch["has_confidence"] = ~np.isnan(batch["confidence"])
+    batch["has_hours"] = ~np.isnan(batch["hours"])
+    return batch
+
+def fold_daily_trends(state, b):
+    s = b["submitted"]
+    c = s & b["has_confidence"]
+    add_sum(state, "daily_records", b["day"][s])
+    add_sum(state, "daily_check_ins", b["day"][s], b["type"][s] == 1)
+    add_sum(state, "daily_check_outs", b["day"][s], b["type"][s] == 2)
+    add_sum(state, "daily_confidence_count", b["day"][c])
+    add_sum(state, "daily_confidence_sum", b["day"][c], b["confidence"][c])
+    add_pairs(state, "daily_employees", b["day"][s], b["employee_code"][s])
+
+def fold_peak_hours(state, b):
+    s = b["submitted"]
+    add_sum(state, "check_in_hours", (b["check_in"][s & b["has_check_in"]] // 60).astype(np.int64))
+    add_sum(state, "check_out_hours", (b["check_out"][s & b["has_check_out"]] // 60).astype(np.int64))
+
+def fold_department_stats(state, b):
+    s = b["submitted"]
+    c, h = s & b["has_confidence"], s & b["has_hours"]
+    department = b["department_code"]
+    add_sum(state, "department_records", department[s])
+    add_sum(state, "department_late", department[s], b["late"][s])
+    add_sum(state, "department_early_departures", department[s], b["early_departure"][s])
+    add_sum(state, "department_confidence_count", department[c])
+    add_sum(state, "department_confidence_sum", department[c], b["confidence"][c])
+    add_sum(state, "department_hours_count", department[h])
+    add_sum(state, "department_hours_sum", department[h], b["hours"][h])
+    add_pairs(state, "department_employees", department[s], b["employee_code"][s])
+
+def fold_accuracy_metrics(state, b):
+    # Recognition accuracy counts every row, drafts and cancelled ones included
+    creation_day = b["creation_day_code"]
+    c = b["has_confidence"]
+    add_sum(state, "accuracy_attempts", creation_day)
+    add_sum(state, "accuracy_verified", creation_day, b["verification"] == 1)
+    add_sum(state, "accuracy_failed", creation_day, b["verification"] == 2)
+    add_sum(state, "accuracy_confidence_count", creation_day[c])
+    add_sum(state, "accuracy_confidence_sum", creation_day[c], b["confidence"][c])
+    add_sum(state, "accuracy_confidence_sumsq", creation_day[c], b["confidence"][c] ** 2)
+    add_extreme(state, "mins", "accuracy_confidence", creation_day[c], b["confidence"][c])
+    add_extreme(state, "maxs", "accuracy_confidence", creation_day[c], b["confidence"][c])
+
+def fold_employee_patterns(state, b):
+    # Complete sessions only
+    p = b["submitted"] & b["has_check_in"] & b["has_check_out"]
+    h = p & b["has_hours"]
+    employee = b["employee_code"]
+    add_firsts(state, "employee", employee[p], zip(np.asarray(b["employee_name"], dtype=object)[p], np.asarray(b["department"], dtype=object)[p]))
+    add_pairs(state, "pattern_days", employee[p], b["day"][p])
+    add_sum(state, "pattern_sessions", employee[p])
+    add_sum(state, "pattern_check_in_sum", employee[p], b["check_in"][p] / 60)
+    add_sum(state, "pattern_check_out_sum", employee[p], b["check_out"][p] / 60)
+    add_sum(state, "pattern_hours_count", employee[h])
+    add_sum(state, "pattern_hours_sum", employee[h], b["hours"][h])
+    add_sum(state, "pattern_hours_sumsq", employee[h], b["hours"][h] ** 2)
+    add_sum(state, "pattern_late", employee[p], b["late"][p])
+    add_extreme(state, "mins", "pattern_day", employee[p], b["day"][p])
+    add_extreme(state, "maxs", "pattern_day", employee[p], b["day"][p])
+
+def fold_location_stats(state, b):
+    located = b["submitted"] & np.array([value is not None for value in b["kiosk"]], dtype=bool)
+    c = located & b["has_confidence"]
+    kiosk = b["kiosk_code"]
+    creation = np.array([value.timestamp() for value in np.asarray(b["creation"], dtype=object)[located]], dtype=float)
+    add_sum(state, "location_records", kiosk[located])
+    add_sum(state, "location_confidence_count", kiosk[c])
+    add_sum(state, "location_confidence_sum", kiosk[c], b["confidence"][c])
+    add_pairs(state, "location_employees", kiosk[located], b["employee_code"][located])
+    add_pairs(state, "location_days", kiosk[located], b["day"][located])
+    add_extreme(state, "mins", "location_creation", kiosk[located], creation)
+    add_extreme(state, "maxs", "location_creation", kiosk[located], creation)
+
+def fold_punctuality_stats(state, b):
+    c = b["submitted"] & b["has_check_in"]
+    day, check_in, late = b["day"][c], b["check_in"][c], b["late"][c]
+    early = ~late & (check_in <= EARLY_ARRIVAL_BY_MINUTE)
+    add_sum(state, "punctuality_check_ins", day)
+    add_sum(state, "punctuality_early", day, early)
+    add_sum(state, "punctuality_on_time", day, ~late & ~early)
+    add_sum(state, "punctuality_late", day, late)
+    add_sum(state, "punctuality_lateness", day, check_in - EARLY_ARRIVAL_BY_MINUTE)
+
+def fold_overtime_stats(state, b):
+    o = b["submitted"] & b["has_hours"] & (np.nan_to_num(b["hours"]) > 0)
+    employee, hours, overtime = b["employee_code"][o], b["hours"][o], b["overtime"][o]
+    add_firsts(state, "employee", employee, zip(np.asarray(b["employee_name"], dtype=object)[o], np.asarray(b["department"], dtype=object)[o]))
+    add_sum(state, "overtime_rows", employee)
+    add_sum(state, "overtime_hours", employee, overtime)
+    add_sum(state, "overtime_days", employee, overtime > 0)
+    add_extreme(state, "maxs", "overtime_max_hours", employee, hours)
+
+SECTION_FOLDS = {
+    "daily_trends": fold_daily_trends,
+    "peak_hours": fold_peak_hours,
+    "department_stats": fold_department_stats,
+    "accuracy_metrics": fold_accuracy_metrics,
+    "employee_patterns": fold_employee_patterns,
+    "location_stats": fold_location_stats,
+    "punctuality_stats": fold_punctuality_stats,
+    "overtime_stats": fold_overtime_stats
+}
+
+def fold_batch(state, batch, sections=None):
+    """Fold one column batch into the accumulators of the given (default: all) analytics"""
+    batch = prepare_batch(state, batch)
+    for section in sections or SECTION_FOLDS:
+        SECTION_FOLDS[section](state, batch)
+
+def compute_attendance_analytics(start_date, end_date, batch_size=BATCH_SIZE, sections=None):
+    """The given (default: all eight) dashboard analytics from a single pass over the date range"""
+    start_date, end_date = getdate(start_date), getdate(end_date)
+    state = new_state()
+    for batch in stream_attendance_batches(start_date, end_date, batch_size):
+        fold_batch(state, batch, sections)
+    analytics = build_analytics(state, start_date, end_date)
+    return {section: analytics[section] for section in sections or SECTION_FOLDS}
+
+def average(total, count):
+    return float(total) / float(count) if count else None
+
+def stddev(total, sumsq, count):
+    # Population standard deviation, like MySQL STDDEV
+    if not count:
+        return None
+    return float(np.sqrt(max(0.0, sumsq / count - (total / count) ** 2)))
+
+def build_analytics(state, start_date, end_date):
+    groups = state["groups"]
+    keys = {name: groups.get(name, new_group_index())["keys"] for name in ("employee", "department", "kiosk", "creation_day")}
+    days = (end_date - start_date).days + 1
+    firsts = state["firsts"].get("employee", {})
+    
+    def day_date(offset):
+        return start_date + timedelta(days=int(offset))
+    
+    # Daily trends
+    records = get_sum(state, "daily_records", days)
+    check_ins = get_sum(state, "daily_check_ins", days)
+    check_outs = get_sum(state, "daily_check_outs", days)
+    confidence_count = get_sum(state, "daily_confidence_count", days)
+    confidence_sum = get_sum(state, "daily_confidence_sum", days)
+    employees = get_distinct(state, "daily_employees", days)
+    daily_trends = add_attendance_percentage([
+        {
+            "date": day_date(d),
+            "unique_employees": int(employees[d]),
+            "total_records": int(records[d]),
+            "check_ins": int(check_ins[d]),
+            "check_outs": int(check_outs[d]),
+            "avg_confidence": average(confidence_sum[d], confidence_count[d]),
+            "day_name": day_date(d).strftime("%A")
+        }
+        for d in np.flatnonzero(records)
+    ])
+    
+    # Peak hours
+    check_in_hours = get_sum(state, "check_in_hours", 24)
+    check_out_hours = get_sum(state, "check_out_hours", 24)
+    peak_hours = format_peak_hours({
+        hour: {"check_in": int(check_in_hours[hour]), "check_out": int(check_out_hours[hour])}
+        for hour in range(24)
+    })
+    
+    # Departments
+    size = len(keys["department"])
+    records = get_sum(state, "department_records", size)
+    employees = get_distinct(state, "department_employees", size)
+    late = get_sum(state, "department_late", size)
+    early = get_sum(state, "department_early_departures", size)
+    confidence_count = get_sum(state, "department_confidence_count", size)
+    confidence_sum = get_sum(state, "department_confidence_sum", size)
+    hours_count = get_sum(state, "department_hours_count", size)
+    hours_sum = get_sum(state, "department_hours_sum", size)
+    department_stats = finish_department_stats(sorted([
+        {
+            "department": keys["department"][g],
+            "unique_employees": int(employees[g]),
+            "total_records": int(records[g]),
+            "avg_confidence": average(confidence_sum[g], confidence_count[g]),
+            "late_arrivals": int(late[g]),
+            "early_departures": int(early[g]),
+            "avg_working_hours": average(hours_sum[g], hours_count[g])
+        }
+        for g in np.flatnonzero(records)
+    ], key=lambda row: row["unique_employees"], reverse=True))
+    
+    # Recognition accuracy, by creation date
+    size = len(keys["creation_day"])
+    attempts = get_sum(state, "accuracy_attempts", size)
+    verified = get_sum(state, "accuracy_verified", size)
+    failed = get_sum(state, "accuracy_failed", size)
+    confidence_count = get_sum(state, "accuracy_confidence_count", size)
+    confidence_sum = get_sum(state, "accuracy_confidence_sum", size)
+    confidence_sumsq = get_sum(state, "accuracy_confidence_sumsq", size)
+    confidence_min = get_extreme(state, "mins", "accuracy_confidence", size)
+    confidence_max = get_extreme(state, "maxs", "accuracy_confidence", size)
+    accuracy_metrics = finish_accuracy_metrics([
+        {
+            "date": day_date(keys["creation_day"][g]),
+            "total_attempts": int(attempts[g]),
+            "successful_recognitions": int(verified[g]),
+            "failed_recognitions": int(failed[g]),
+            "avg_confidence": average(confidence_sum[g], confidence_count[g]),
+            "min_confidence": None if confidence_count[g] == 0 else float(confidence_min[g]),
+            "max_confidence": None if confidence_count[g] == 0 else float(confidence_max[g]),
+            "confidence_stddev": stddev(confidence_sum[g], confidence_sumsq[g], confidence_count[g])
+        }
+        for g in sorted(np.flatnonzero(attempts), key=lambda g: keys["creation_day"][g])
+    ])
+    
+    # Employee patterns
+    size = len(keys["employee"])
+    days_present = get_distinct(state, "pattern_days", size)
+    sessions = get_sum(state, "pattern_sessions", size)
+    check_in_sum = get_sum(state, "pattern_check_in_sum", size)
+    check_out_sum = get_sum(state, "pattern_check_out_sum", size)
+    hours_count = get_sum(state, "pattern_hours_count", size)
+    hours_sum = get_sum(state, "pattern_hours_sum", size)
+    hours_sumsq = get_sum(state, "pattern_hours_sumsq", size)
+    late = get_sum(state, "pattern_late", size)
+    first_day = get_extreme(state, "mins", "pattern_day", size)
+    last_day = get_extreme(state, "maxs", "pattern_day", size)
+    employee_patterns = finish_employee_patterns(sorted([
+        {
+            "employee_id": keys["employee"][g],
+            "employee_name": firsts[g][0],
+            "department": firsts[g][1],
+            "days_present": int(days_present[g]),
+            "avg_check_in_hour": average(check_in_sum[g], sessions[g]),
+            "avg_check_out_hour": average(check_out_sum[g], sessions[g]),
+            "avg_daily_hours": average(hours_sum[g], hours_count[g]),
+            "hours_consistency": stddev(hours_sum[g], hours_sumsq[g], hours_count[g]),
+            "late_days": int(late[g]),
+            "first_attendance": day_date(first_day[g]),
+            "last_attendance": day_date(last_day[g])
+        }
+        for g in np.flatnonzero(days_present)
+    ], key=lambda row: row["days_present"], reverse=True), start_date, end_date)
+    
+    # Locations
+    size = len(keys["kiosk"])
+    records = get_sum(state, "location_records", size)
+    employees = get_distinct(state, "location_employees", size)
+    active_days = get_distinct(state, "location_days", size)
+    confidence_count = get_sum(state, "location_confidence_count", size)
+    confidence_sum = get_sum(state, "location_confidence_sum", size)
+    first_usage = get_extreme(state, "mins", "location_creation", size)
+    last_usage = get_extreme(state, "maxs", "location_creation", size)
+    location_stats = finish_location_stats(sorted([
+        {
+            "kiosk_location": keys["kiosk"][g],
+            "unique_employees": int(employees[g]),
+            "total_records": int(records[g]),
+            "active_days": int(active_days[g]),
+            "avg_confidence": average(confidence_sum[g], confidence_count[g]),
+            "first_usage": datetime.fromtimestamp(first_usage[g]),
+            "last_usage": datetime.fromtimestamp(last_usage[g])
+        }
+        for g in np.flatnonzero(records)
+    ], key=lambda row: row["total_records"], reverse=True))
+    
+    # Punctuality
+    total = get_sum(state, "punctuality_check_ins", days)
+    early = get_sum(state, "punctuality_early", days)
+    on_time = get_sum(state, "punctuality_on_time", days)
+    late = get_sum(state, "punctuality_late", days)
+    lateness = get_sum(state, "punctuality_lateness", days)
+    punctuality_stats = finish_punctuality_stats([
+        {
+            "date": day_date(d),
+            "total_check_ins": int(total[d]),
+            "early_arrivals": int(early[d]),
+            "on_time_arrivals": int(on_time[d]),
+            "late_arrivals": int(late[d]),
+            "avg_lateness_minutes": average(lateness[d], total[d])
+        }
+        for d in np.flatnonzero(total)
+    ])
+    
+    # Overtime
+    size = len(keys["employee"])
+    working_days = get_sum(state, "overtime_rows", size)
+    overtime_hours = get_sum(state, "overtime_hours", size)
+    overtime_days = get_sum(state, "overtime_days", size)
+    max_hours = get_extreme(state, "maxs", "overtime_max_hours", size)
+    overtime_stats = finish_overtime_stats(sorted([
+        {
+            "employee_id": keys["employee"][g],
+            "employee_name": firsts[g][0],
+            "department": firsts[g][1],
+            "working_days": int(working_days[g]),
+            "total_overtime_hours": float(overtime_hours[g]),
+            "avg_overtime_per_day": float(overtime_hours[g] / working_days[g]),
+            "max_hours_single_day": float(max_hours[g]),
+            "overtime_days": int(overtime_days[g])
+        }
+        for g in np.flatnonzero(overtime_hours > 0)
+    ], key=lambda row: row["total_overtime_hours"], reverse=True))
+    
+    return {
+        "daily_trends": daily_trends,
+        "peak_hours": peak_hours,
+        "department_stats": department_stats,
+        "accuracy_metrics": accuracy_metrics,
+        "employee_patterns": employee_patterns,
+        "location_stats": location_stats,
+        "punctuality_stats": punctuality_stats,
+        "overtime_stats": overtime_stats
+    }
+
+def make_synthetic_rows(rows, employees=2000, seed=7):
+    """Rows shaped like a stream_attendance_batches page, for benchmarks"""
+    rng = np.random.default_rng(seed)
+    check_in = rng.normal(9 * 60, 30, rows).clip(0, 1439).astype(int)
+    hours = rng.normal(8.5, 1.2, rows).clip(0.5, 14)
+    check_out = (check_in + hours * 60).clip(0, 1439).astype(int)
+    created = datetime(2026, 1, 1)
+    columns = [
+        [f"EA-{i:09d}" for i in range(rows)],
+        [f"EMP-{i}" for i in rng.integers(0, employees, rows)],
+        [f"Employee {i}" for i in rng.integers(0, employees, rows)],
+        [f"Department {i}" for i in rng.integers(0, 12, rows)],
+        [f"Kiosk {i}" for i in rng.integers(0, 20, rows)],
+        rng.choice([0, 1, 2], rows, p=[0.02, 0.96, 0.02]).tolist(),
+        rng.integers(0, 365, rows).tolist(),
+        rng.integers(0, 365, rows).tolist(),
+        [created] * rows,
+        check_in.tolist(),
+        check_out.tolist(),
+        rng.integers(0, 3, rows).tolist(),
+        rng.integers(0, 3, rows).tolist(),
+        rng.uniform(40, 100, rows).tolist(),
+        hours.tolist(),
+        (check_in > 9 * 60 + 30).astype(int).tolist(),
+        (check_out < 17 * 60 + 30).astype(int).tolist(),
+        (hours - 9).clip(0, None).round(2).tolist()
+    ]
+    return list(zip(*columns))
+
+def benchmark_analytics_engine(rows=3000000, batch_size=BATCH_SIZE):
+    """Time one pass computing all eight analytics against eight passes of one section each.
+    
+    Both sides page through the same synthetic rows and convert every page
+    to NumPy columns, the part a database scan repeats; the real saving on a
+    site also includes the seven table scans no longer issued. Run with
+    bench --site <site> execute hrms_biometric.bio_facerecognition.api.analytics_engine.benchmark_analytics_engine
+    """
+    synthetic = make_synthetic_rows(rows)
+    pages = [synthetic[i:i + batch_size] for i in range(0, rows, batch_size)]
+    start_date = getdate("2026-01-01")
+    end_date = start_date + timedelta(days=364)
+    
+    started = time.perf_counter()
+    state = new_state()
+    for page in pages:
+        fold_batch(state, to_columns(page))
+    single = build_analytics(state, start_date, end_date)
+    single_pass = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    separate = {}
+    for section in SECTION_FOLDS:
+        state = new_state()
+        for page in pages:
+            fold_batch(state, to_columns(page), sections=[section])
+        separate[section] = build_analytics(state, start_date, end_date)[section]
+    eight_passes = time.perf_counter() - started
+    
+    result = {
+        "rows": rows,
+        "single_pass_seconds": round(single_pass, 2),
+        "eight_passes_seconds": round(eight_passes, 2),
+        "speedup": round(eight_passes / single_pass, 2) if single_pass else None,
+        # Only checks the single pass against per-section passes of the same engine;
+        # test_employee_attendance compares the engine with the SQL and rollup paths
+        "single_pass_matches_sections": frappe.as_json(single) == frappe.as_json(separate)
+    }
+    print(result)
+    return result
@@ -0,0 +1,160 @@
+# hrms_biometric/bio_facerecognition/api/analytics_trends.py
+
+import frappe
+from datetime import datetime, timedelta
+from frappe.utils import getdate, add_months, get_first_day, get_last_day, cint, flt
+
+from .analytics_cache import get_cached_result
+
+PERIOD_TYPES = ["day", "week", "month", "quarter"]
+MAX_PERIODS = 60
+
+# KPIs returned per period, in the order of the sparkline series
+TREND_KPIS = [
+    "active_employees", "total_attendance_records", "attendance_rate", "punctuality_rate",
+    "avg_working_hours", "recognition_confidence", "total_late_arrivals", "productivity_score"
+]
+
+def get_period_bounds(period_type, periods, end_date, period_days=None):
+    """(start, end) of the last N periods ending with the one containing end_date, oldest first.
+    
+    Weeks run Monday to Sunday, months and quarters follow the calendar and
+    "day" periods are period_days long, counted back from end_date.
+    """
+    end_date = getdate(end_date)
+    bounds = []
+    for index in range(periods):
+        if period_type == "week":
+            period_end = end_date + timedelta(days=6 - end_date.weekday()) - timedelta(weeks=index)
+            period_start = period_end - timedelta(days=6)
+        elif period_type == "month":
+            period_start = get_first_day(add_months(end_date, -index))
+            period_end = get_last_day(period_start)
+        elif period_type == "quarter":
+            quarter_start = get_first_day(end_date).replace(month=(end_date.month - 1) // 3 * 3 + 1)
+            period_start = getdate(add_months(quarter_start, -3 * index))
+            period_end = get_last_day(add_months(period_start, 2))
+        else:
+            period_end = end_date - timedelta(days=period_days * index)
+            period_start = period_end - timedelta(days=period_days - 1)
+        bounds.append((period_start, period_end))
+    return list(reversed(bounds))
+
+def get_period_index_sql(period_type):
+    """SQL for how many periods before the anchor period a record falls; 0 is the latest"""
+    if period_type == "week":
+        return "FLOOR(DATEDIFF(%(anchor)s, attendance_date) / 7)"
+    if period_type == "month":
+        return "PERIOD_DIFF(EXTRACT(YEAR_MONTH FROM %(anchor)s), EXTRACT(YEAR_MONTH FROM attendance_date))"
+    if period_type == "quarter":
+        return "(YEAR(%(anchor)s) * 4 + QUARTER(%(anchor)s)) - (YEAR(attendance_date) * 4 + QUARTER(attendance_date))"
+    return "FLOOR(DATEDIFF(%(anchor)s, attendance_date) / %(period_days)s)"
+
+def get_period_kpis(period_type, periods, end_date, period_days=None, department=None):
+    """The executive KPIs for each of the last N periods, from one grouped query"""
+    from .analytics_dashboard import calculate_productivity_score
+    
+    bounds = get_period_bounds(period_type, periods, end_date, period_days)
+    anchor = bounds[-1][1]
+    values = {
+        "start": bounds[0][0],
+        "end": getdate(end_date),
+        "anchor": anchor,
+        "period_days": cint(period_days) or 1,
+        "department": department
+    }
+    
+    rows = frappe.db.sql(f"""
+        SELECT
+            {get_period_index_sql(period_type)} AS period_index,
+            COUNT(DISTINCT employee_id) as active_employees,
+            COUNT(*) as total_attendance_records,
+            AVG(total_hours) as avg_working_hours,
+            SUM(is_late) as total_late_arrivals,
+            AVG(confidence_score) as avg_recognition_confidence
+        FROM `tabEmployee Attendance`
+        WHERE attendance_date BETWEEN %(start)s AND %(end)s
+        AND docstatus = 1
+        {"AND department = %(department)s" if department else ""}
+        GROUP BY period_index
+    """, values, as_dict=True)
+    by_index = {cint(row.period_index): row for row in rows}
+    
+    total_employees = frappe.db.count("Employee Face Recognition", {"status": "Active"})
+    result = []
+    for position, (period_start, period_end) in enumerate(bounds):
+        stats = by_index.get(len(bounds) - 1 - position) or frappe._dict(
+            active_employees=0, total_attendance_records=0, avg_working_hours=None,
+            total_late_arrivals=0, avg_recognition_confidence=None
+        )
+        records = cint(stats.total_attendance_records)
+        attendance_rate = round((stats.active_employees / total_employees) * 100, 2) if total_employees > 0 else 0
+        punctuality_rate = round(((records - cint(stats.total_late_arrivals)) / records) * 100, 2) if records > 0 else 0
+        
+        result.append({
+            "label": get_period_label(period_type, period_start, period_end),
+            "start": period_start,
+            "end": min(period_end, getdate(end_date)),
+            "total_employees": total_employees,
+            "active_employees": cint(stats.active_employees),
+            "total_attendance_records": records,
+            "attendance_rate": attendance_rate,
+            "punctuality_rate": punctuality_rate,
+            "avg_working_hours": round(flt(stats.avg_working_hours), 2),
+            "recognition_confidence": round(flt(stats.avg_recognition_confidence), 2),
+            "total_late_arrivals": cint(stats.total_late_arrivals),
+            "avg_recognition_confidence": stats.avg_recognition_confidence,
+            "productivity_score": calculate_productivity_score(stats, attendance_rate, punctuality_rate)
+        })
+    return result
+
+def get_period_label(period_type, period_start, period_end):
+    if period_type == "week":
+        return f"{period_start.isocalendar()[0]}-W{period_start.isocalendar()[1]:02d}"
+    if period_type == "month":
+        return period_start.strftime("%Y-%m")
+    if period_type == "quarter":
+        return f"{period_start.year}-Q{(period_start.month - 1) // 3 + 1}"
+    return f"{period_start} - {period_end}"
+
+def build_trends(period_type, periods, end_date, period_days=None, department=None):
+    """Per-period KPIs with sparkline series and period-over-period changes"""
+    from .analytics_dashboard import calculate_trend
+    
+    kpis = get_period_kpis(period_type, periods, end_date, period_days, department)
+    for period in kpis:
+        period.pop("avg_recognition_confidence")
+    
+    return {
+        "period_type": period_type,
+        "periods": kpis,
+        "series": {kpi: [period[kpi] for period in kpis] for kpi in TREND_KPIS},
+        "changes": {
+            kpi: [None] + [calculate_trend(current[kpi], previous[kpi]) for previous, current in zip(kpis, kpis[1:])]
+            for kpi in TREND_KPIS
+        }
+    }
+
+@frappe.whitelist()
+def get_attendance_trends(period_type="month", periods=6, end_date=None, period_days=None, department=None):
+    """Executive KPIs for the last N weeks, months, quarters or N-day periods"""
+    try:
+        periods = min(max(cint(periods), 1), MAX_PERIODS)
+        if period_type not in PERIOD_TYPES:
+            return {"success": False, "message": f"Unsupported period type: {period_type}"}
+        if period_type == "day" and cint(period_days) < 1:
+            return {"success": False, "message": "period_days is required for day periods"}
+        
+        end_date = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else datetime.now().date()
+        start_date = get_period_bounds(period_type, periods, end_date, cint(period_days))[0][0]
+        
+        trends = get_cached_result(
+            "attendance_trends", start_date, end_date,
+            lambda: build_trends(period_type, periods, end_date, cint(period_days), department),
+            {"period_type": period_type, "periods": periods, "period_days": cint(period_days), "department": department}
+        )
+        return dict({"success": True}, **trends)
+    
+    except Exception as e:
+        frappe.log_error(f"Attendance trends error: {str(e)}")
+        return {"success": False, "message": str(e)}
@@ -0,0 +1,274 @@
+# hrms_biometric/bio_facerecognition/api/attendance_history.py
+
+import frappe
+import os
+import numpy as np
+from datetime import timedelta
+from frappe.utils import getdate, get_datetime, today, now_datetime, add_days, cint
+
+from .analytics_cache import WATERMARK_KEY
+
+# One compressed shard per attendance date, in a folder per month:
+# private/attendance_history/2026-10/2026-10-19.npz
+HISTORY_FOLDER = "attendance_history"
+
+# Missing minutes are stored as -1, missing measures as NaN
+STRING_COLUMNS = ["name", "employee_id", "department", "kiosk_location"]
+MINUTE_COLUMNS = ["check_in_minute", "check_out_minute"]
+FLAG_COLUMNS = ["is_late", "is_early_departure"]
+FLOAT_COLUMNS = ["total_hours", "overtime_hours", "confidence_score"]
+
+METRICS = MINUTE_COLUMNS + FLAG_COLUMNS + FLOAT_COLUMNS
+GROUP_BY = ["employee_id", "department", "kiosk_location", "year", "month", "weekday"]
+
+def get_shard_path(attendance_date):
+    attendance_date = getdate(attendance_date)
+    return frappe.get_site_path(
+        "private", HISTORY_FOLDER, attendance_date.strftime("%Y-%m"), f"{attendance_date}.npz"
+    )
+
+def get_day_columns(attendance_date):
+    """Submitted attendance of one date as numpy columns"""
+    rows = frappe.db.sql(f"""
+        SELECT {", ".join(STRING_COLUMNS + MINUTE_COLUMNS + FLAG_COLUMNS + FLOAT_COLUMNS)}
+        FROM `tabEmployee Attendance`
+        WHERE attendance_date = %s AND docstatus = 1
+        ORDER BY name
+    """, attendance_date, as_dict=True)
+    
+    columns = {
+        "attendance_date": np.full(len(rows), np.datetime64(getdate(attendance_date), "D"))
+    }
+    for column in STRING_COLUMNS:
+        columns[column] = np.array([row[column] or "" for row in rows], dtype=str)
+    for column in MINUTE_COLUMNS:
+        columns[column] = np.array([-1 if row[column] is None else row[column] for row in rows], dtype=np.int16)
+    for column in FLAG_COLUMNS:
+        columns[column] = np.array([cint(row[column]) for row in rows], dtype=np.int8)
+    for column in FLOAT_COLUMNS:
+        columns[column] = np.array([np.nan if row[column] is None else row[column] for row in rows], dtype=np.float32)
+    return columns
+
+def write_day_shard(attendance_date):
+    """Replace the shard of one date with its current attendance"""
+    path = get_shard_path(attendance_date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    with open(path + ".tmp", "wb") as f:
+        np.savez_compressed(f, written_at=np.array(str(now_datetime())), **get_day_columns(attendance_date))
+    os.replace(path + ".tmp", path)
+
+def get_written_at(path):
+    # Members of an npz are read lazily, so this does not load the columns
+    with np.load(path) as shard:
+        return get_datetime(str(shard["written_at"]))
+
+def get_latest_shard_date():
+    """Date of the newest shard in the store, None when it is empty"""
+    root = frappe.get_site_path("private", HISTORY_FOLDER)
+    months = sorted(os.listdir(root), reverse=True) if os.path.isdir(root) else []
+    for month in months:
+        shards = sorted(name for name in os.listdir(os.path.join(root, month)) if name.endswith(".npz"))
+        if shards:
+            return getdate(shards[-1][:-len(".npz")])
+    return None
+
+def sync_attendance_history():
+    """Nightly: append the shard of every day since the newest one and rewrite
+    any earlier day changed since its shard was written"""
+    yesterday = getdate(add_days(today(), -1))
+    latest = get_latest_shard_date()
+    
+    # Days the job missed, e.g. while the scheduler was down, are caught up here
+    first_new_day = getdate(add_days(latest, 1)) if latest else yesterday
+    build_attendance_history(first_new_day, yesterday)
+    
+    # Late corrections: dates whose watermark moved after their shard was written,
+    # or that changed without ever getting one
+    for date, changed_at in (frappe.cache().hgetall(WATERMARK_KEY) or {}).items():
+        # Field names come back from hgetall as bytes
+        date = frappe.safe_decode(date)
+        if getdate(date) >= first_new_day or getdate(date) > yesterday:
+            continue
+        path = get_shard_path(date)
+        if not os.path.exists(path) or get_datetime(changed_at) > get_written_at(path):
+            write_day_shard(date)
+
+def build_attendance_history(start_date, end_date):
+    """Write the shards of every date in the range, e.g. to backfill the store"""
+    day, end_date = getdate(start_date), getdate(end_date)
+    while day <= end_date:
+        write_day_shard(day)
+        day += timedelta(days=1)
+
+def load_history(start_date, end_date, columns=None):
+    """Concatenated columns of every shard in the range; nothing is read from the database"""
+    columns = columns or (["attendance_date"] + STRING_COLUMNS + METRICS)
+    parts = {column: [] for column in columns}
+    
+    day, end_date = getdate(start_date), getdate(end_date)
+    while day <= end_date:
+        path = get_shard_path(day)
+        if os.path.exists(path):
+            with np.load(path) as shard:
+                for column in columns:
+                    parts[column].append(shard[column])
+        day += timedelta(days=1)
+    
+    return {
+        column: np.concatenate(values) if values else np.array([], dtype=get_empty_dtype(column))
+        for column, values in parts.items()
+    }
+
+def get_empty_dtype(column):
+    if column == "attendance_date":
+        return "datetime64[D]"
+    if column in STRING_COLUMNS:
+        return str
+    if column in MINUTE_COLUMNS:
+        return np.int16
+    if column in FLAG_COLUMNS:
+        return np.int8
+    return np.float32
+
+def get_group_keys(history, group_by):
+    dates = history["attendance_date"]
+    if group_by == "year":
+        return dates.astype("datetime64[Y]").astype(str)
+    if group_by == "month":
+        return dates.astype("datetime64[M]").astype(str)
+    if group_by == "weekday":
+        # 1970-01-01 was a Thursday; 0 is Monday
+        return ((dates.astype(np.int64) + 3) % 7).astype(str)
+    return history[group_by]
+
+def get_metric_values(history, metric):
+    """Metric as float64 with missing values as NaN"""
+    values = history[metric].astype(np.float64)
+    if metric in MINUTE_COLUMNS:
+        values[history[metric] < 0] = np.nan
+    return values
+
+def filter_history(history, employee_id=None, department=None, kiosk_location=None):
+    mask = np.ones(len(history["attendance_date"]), dtype=bool)
+    for column, value in (("employee_id", employee_id), ("department", department), ("kiosk_location", kiosk_location)):
+        if value:
+            mask &= history[column] == value
+    return {column: values[mask] for column, values in history.items()}
+
+def aggregate(values, keys, percentiles=()):
+    """Count, sum, mean, min, max and percentiles of values per key, without a Python loop over rows"""
+    valid = ~np.isnan(values)
+    values, keys = values[valid], keys[valid]
+    if not len(values):
+        return []
+    
+    groups, inverse = np.unique(keys, return_inverse=True)
+    order = np.lexsort((values, inverse))
+    values, inverse = values[order], inverse[order]
+    counts = np.bincount(inverse, minlength=len(groups))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sums = np.bincount(inverse, weights=values, minlength=len(groups))
+    
+    result = {
+        "count": counts,
+        "sum": sums,
+        "mean": sums / counts,
+        "min": values[starts],
+        "max": values[starts + counts - 1]
+    }
+    for percentile in percentiles:
+        # Linear interpolation between the closest ranks, as numpy.percentile does
+        position = starts + (counts - 1) * (percentile / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        result[f"p{percentile:g}"] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+    
+    return [
+        dict({"group": str(group)}, **{name: round(float(measure[index]), 4) for name, measure in result.items()})
+        for index, group in enumerate(groups)
+    ]
+
+def query_history(start_date, end_date, metric, group_by=None, percentiles=(), employee_id=None, department=None, kiosk_location=None):
+    if metric not in METRICS:
+        frappe.throw(f"Unknown metric: {metric}")
+    if group_by and group_by not in GROUP_BY:
+        frappe.throw(f"Cannot group by {group_by}")
+    
+    filters = {"employee_id": employee_id, "department": department, "kiosk_location": kiosk_location}
+    columns = ["attendance_date", metric] + [column for column, value in filters.items() if value or column == group_by]
+    history = filter_history(load_history(start_date, end_date, columns), employee_id, department, kiosk_location)
+    
+    values = get_metric_values(history, metric)
+    keys = get_group_keys(history, group_by) if group_by else np.full(len(values), "all")
+    return aggregate(values, keys, percentiles)
+
+def get_distribution(start_date, end_date, metric, bins=24, value_range=None, employee_id=None, department=None):
+    """Histogram of a metric, e.g. an employee's daily hours or check-in minutes"""
+    if metric not in METRICS:
+        frappe.throw(f"Unknown metric: {metric}")
+    
+    history = filter_history(load_history(start_date, end_date, ["attendance_date", "employee_id", "department", metric]),
+                             employee_id, department)
+    values = get_metric_values(history, metric)
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=cint(bins) or 24, range=value_range)
+    return {"counts": counts.tolist(), "edges": [round(float(edge), 4) for edge in edges]}
+
+@frappe.whitelist()
+def query_attendance_history(start_date, end_date, metric, group_by=None, percentiles=None, employee_id=None, department=None, kiosk_location=None):
+    """Aggregate and percentile queries over the columnar attendance history"""
+    try:
+        frappe.only_for(("System Manager", "HR Manager"))
+        
+        percentiles = [float(percentile) for percentile in (frappe.parse_json(percentiles) if percentiles else [])]
+        return {
+            "success": True,
+            "metric": metric,
+            "group_by": group_by,
+            "groups": query_history(start_date, end_date, metric, group_by, percentiles, employee_id, department, kiosk_location)
+        }
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"Attendance history query error: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+@frappe.whitelist()
+def get_attendance_history_distribution(start_date, end_date, metric, bins=24, employee_id=None, department=None):
+    """Histogram of a metric over the columnar attendance history"""
+    try:
+        frappe.only_for(("System Manager", "HR Manager"))
+        
+        return dict({"success": True, "metric": metric},
+                    **get_distribution(start_date, end_date, metric, bins, None, employee_id, department))
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"Attendance history distribution error: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+@frappe.whitelist()
+def rebuild_attendance_history(start_date, end_date):
+    """Queue a rewrite of the history shards over a date range"""
+    try:
+        frappe.only_for(("System Manager", "HR Manager"))
+        
+        if getdate(start_date) > getdate(end_date):
+            return {"success": False, "message": "Start date must be before end date"}
+        
+        frappe.enqueue(
+            "hrms_biometric.bio_facerecognition.api.attendance_history.build_attendance_history",
+            queue="long",
+            timeout=3600,
+            start_date=str(getdate(start_date)),
+            end_date=str(getdate(end_date))
+        )
+        return {"success": True, "message": "Attendance history rebuild queued"}
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"Attendance history rebuild error: {str(e)}")
+        return {"success": False, "message": str(e)}
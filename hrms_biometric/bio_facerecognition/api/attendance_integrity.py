@@ -0,0 +1,181 @@
+# hrms_biometric/bio_facerecognition/api/attendance_integrity.py
+
+import frappe
+import json
+from datetime import timedelta
+from frappe.utils import getdate, today, now_datetime, add_days, flt
+
+# Nightly scan covers this many days back; larger ranges go through run_integrity_scan
+NIGHTLY_SCAN_DAYS = 35
+# Every finding is counted, but only this many per check are listed in the report
+MAX_LISTED_FINDINGS = 500
+HOURS_TOLERANCE = 0.1
+
+LAST_SCAN_KEY = "attendance_integrity_last_scan"
+
+FINDING_TYPES = ("overlap", "missing_check_out", "hours_mismatch", "duplicate_open_session")
+
+def stream_attendance_rows(from_date, to_date, employee_id=None):
+    """Employee Attendance rows in the range, ordered per employee by check-in time.
+    
+    Reads through an unbuffered cursor, so the result set is never held in memory.
+    """
+    conditions = "attendance_date BETWEEN %(from_date)s AND %(to_date)s AND docstatus < 2"
+    if employee_id:
+        conditions += " AND employee_id = %(employee_id)s"
+    
+    with frappe.db.unbuffered_cursor():
+        yield from frappe.db.sql(f"""
+            SELECT name, employee_id, attendance_date, check_in_time, check_out_time, total_hours
+            FROM `tabEmployee Attendance`
+            WHERE {conditions}
+            ORDER BY employee_id, check_in_time, name
+        """, {"from_date": from_date, "to_date": to_date, "employee_id": employee_id},
+            as_dict=True, as_iterator=True)
+
+def find_integrity_issues(rows, open_before=None):
+    """Yield findings from rows ordered by employee and check-in time.
+    
+    Keeps only the employee's latest-ending session so far and their open
+    sessions, so memory does not grow with the number of rows.
+    """
+    open_before = getdate(open_before or today())
+    current_employee = None
+    latest_out = None
+    open_sessions = {}
+    
+    for row in rows:
+        if row.employee_id != current_employee:
+            current_employee = row.employee_id
+            latest_out = None
+            open_sessions = {}
+        
+        # Against the latest check-out so far, not just the previous row: a long
+        # session overlaps every shorter one that starts inside it
+        if latest_out and row.check_in_time and row.check_in_time < latest_out.check_out_time:
+            yield make_finding("overlap", row, f"Check-in overlaps {latest_out.name} ({latest_out.check_in_time} - {latest_out.check_out_time})")
+        
+        if row.check_in_time and row.check_out_time:
+            calculated_hours = (row.check_out_time - row.check_in_time).total_seconds() / 3600
+            if abs(calculated_hours - flt(row.total_hours)) > HOURS_TOLERANCE:
+                yield make_finding("hours_mismatch", row, f"Total hours {flt(row.total_hours):.2f}, expected {calculated_hours:.2f}")
+        
+        elif row.check_in_time:
+            if getdate(row.attendance_date) < open_before:
+                yield make_finding("missing_check_out", row, "No check-out recorded")
+            
+            other = open_sessions.get(row.attendance_date)
+            if other:
+                yield make_finding("duplicate_open_session", row, f"Another session {other} is open on the same date")
+            else:
+                open_sessions[row.attendance_date] = row.name
+        
+        if row.check_out_time and (not latest_out or row.check_out_time > latest_out.check_out_time):
+            latest_out = row
+
+def make_finding(finding_type, row, message):
+    return {
+        "type": finding_type,
+        "record": row.name,
+        "employee_id": row.employee_id,
+        "attendance_date": str(row.attendance_date),
+        "message": message
+    }
+
+def summarize_findings(findings):
+    """Counts per check and per employee, with a bounded sample of findings per check"""
+    summary = {
+        "total": 0,
+        "counts": {finding_type: 0 for finding_type in FINDING_TYPES},
+        "employees": {},
+        "findings": {finding_type: [] for finding_type in FINDING_TYPES}
+    }
+    
+    for finding in findings:
+        finding_type = finding["type"]
+        summary["total"] += 1
+        summary["counts"][finding_type] += 1
+        summary["employees"][finding["employee_id"]] = summary["employees"].get(finding["employee_id"], 0) + 1
+        if len(summary["findings"][finding_type]) < MAX_LISTED_FINDINGS:
+            summary["findings"][finding_type].append(finding)
+    
+    return summary
+
+def scan_attendance_integrity(from_date, to_date, employee_id=None):
+    """Run every integrity check over a date range, returns the summary"""
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    started = now_datetime()
+    
+    summary = summarize_findings(find_integrity_issues(stream_attendance_rows(from_date, to_date, employee_id)))
+    summary.update({
+        "from_date": str(from_date),
+        "to_date": str(to_date),
+        "employee_id": employee_id,
+        "scanned_at": str(started),
+        "duration_seconds": round((now_datetime() - started).total_seconds(), 2)
+    })
+    return summary
+
+def write_integrity_report(summary):
+    """Save the summary as a private JSON file and remember it as the latest scan"""
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": "attendance_integrity_{0}_{1}.json".format(summary["from_date"], summary["to_date"]),
+        "is_private": 1,
+        "content": json.dumps(summary, indent=1, default=str)
+    })
+    file_doc.insert(ignore_permissions=True)
+    
+    frappe.cache().set_value(LAST_SCAN_KEY, {
+        "from_date": summary["from_date"],
+        "to_date": summary["to_date"],
+        "scanned_at": summary["scanned_at"],
+        "duration_seconds": summary["duration_seconds"],
+        "total": summary["total"],
+        "counts": summary["counts"],
+        "report": file_doc.file_url
+    })
+    return file_doc.file_url
+
+def run_attendance_integrity_scan(from_date, to_date):
+    """Background job: scan the range and write the findings report"""
+    summary = scan_attendance_integrity(from_date, to_date)
+    write_integrity_report(summary)
+    frappe.db.commit()
+    
+    if summary["total"]:
+        frappe.logger().info(f"Attendance integrity scan {from_date} - {to_date}: {summary['total']} findings")
+
+def nightly_attendance_integrity_scan():
+    """Scheduled scan of the recent attendance history"""
+    to_date = getdate(add_days(today(), -1))
+    run_attendance_integrity_scan(to_date - timedelta(days=NIGHTLY_SCAN_DAYS - 1), to_date)
+
+@frappe.whitelist()
+def run_integrity_scan(from_date, to_date):
+    """Queue an integrity scan over an arbitrary date range"""
+    try:
+        frappe.only_for(("System Manager", "HR Manager"))
+        
+        if getdate(from_date) > getdate(to_date):
+            return {"success": False, "message": "From date must be before to date"}
+        
+        frappe.enqueue(
+            "hrms_biometric.bio_facerecognition.api.attendance_integrity.run_attendance_integrity_scan",
+            queue="long",
+            timeout=3600,
+            from_date=str(getdate(from_date)),
+            to_date=str(getdate(to_date))
+        )
+        return {"success": True, "message": "Integrity scan queued"}
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"Integrity scan error: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+@frappe.whitelist()
+def get_last_integrity_scan():
+    """Summary of the most recent integrity scan"""
+    return frappe.cache().get_value(LAST_SCAN_KEY) or {}
@@ -0,0 +1,116 @@
+# hrms_biometric/bio_facerecognition/api/attendance_metrics.py
+
+import frappe
+import pytz
+from frappe.utils import get_datetime, get_system_timezone, flt, getdate, add_months, get_first_day, get_last_day
+
+from .shift_calendar import get_shift_for_date, is_late_check_in, is_early_check_out, build_shift_calendar
+from .analytics_cache import RESULT_KEY_PREFIX
+
+# Kiosk label (kiosk_location) -> timezone, filled on demand
+KIOSK_TIMEZONE_KEY = "kiosk_timezone"
+
+# Stored on Employee Attendance at write time so analytics never compute them per row
+PUNCTUALITY_FIELDS = [
+    "check_in_minute", "check_out_minute", "check_in_hour",
+    "is_late", "is_early_departure", "overtime_hours"
+]
+
+def get_kiosk_timezone(kiosk_label):
+    """Timezone of the kiosk a record came from, the system timezone if it has none"""
+    def get_timezone():
+        timezone = frappe.db.get_value("Attendance Kiosk", {"kiosk_name": kiosk_label}, "timezone")
+        if not timezone and frappe.db.exists("Attendance Kiosk", kiosk_label):
+            timezone = frappe.db.get_value("Attendance Kiosk", kiosk_label, "timezone")
+        return timezone or get_system_timezone()
+    
+    if not kiosk_label:
+        return get_system_timezone()
+    return frappe.cache().hget(KIOSK_TIMEZONE_KEY, kiosk_label, generator=get_timezone)
+
+def to_kiosk_time(timestamp, timezone):
+    """Naive system-time timestamp as the kiosk's wall clock time"""
+    system_timezone = get_system_timezone()
+    if not timestamp or timezone == system_timezone:
+        return timestamp
+    localized = pytz.timezone(system_timezone).localize(timestamp)
+    return localized.astimezone(pytz.timezone(timezone)).replace(tzinfo=None)
+
+def minute_of_day(timestamp):
+    return timestamp.hour * 60 + timestamp.minute if timestamp else None
+
+def get_punctuality_values(employee_id, attendance_date, kiosk_label, check_in_time=None, check_out_time=None, total_hours=None, shift=None):
+    """Minute-of-day, hour bucket, lateness, early departure and overtime of a record.
+    
+    Times are taken on the kiosk's wall clock and judged against the
+    employee's shift for the attendance date.
+    """
+    timezone = get_kiosk_timezone(kiosk_label)
+    check_in = to_kiosk_time(get_datetime(check_in_time) if check_in_time else None, timezone)
+    check_out = to_kiosk_time(get_datetime(check_out_time) if check_out_time else None, timezone)
+    shift = shift or get_shift_for_date(employee_id, attendance_date)
+    
+    overtime_hours = None
+    if total_hours is not None:
+        shift_hours = (shift["end"] - shift["start"]).total_seconds() / 3600
+        overtime_hours = round(max(0.0, flt(total_hours) - shift_hours), 2)
+    
+    return {
+        "check_in_minute": minute_of_day(check_in),
+        "check_out_minute": minute_of_day(check_out),
+        "check_in_hour": check_in.hour if check_in else None,
+        "is_late": 1 if check_in and is_late_check_in(shift, check_in) else 0,
+        "is_early_departure": 1 if check_out and is_early_check_out(shift, check_out) else 0,
+        "overtime_hours": overtime_hours
+    }
+
+def set_punctuality_values(doc):
+    """Fill the stored punctuality columns of an Employee Attendance document"""
+    if not doc.employee_id or not doc.attendance_date:
+        return
+    doc.update(get_punctuality_values(
+        doc.employee_id, doc.attendance_date, doc.kiosk_location,
+        doc.check_in_time, doc.check_out_time, doc.total_hours
+    ))
+
+def backfill_punctuality_values(start_date=None, end_date=None):
+    """Compute the stored punctuality columns for existing records, a month at a time"""
+    bounds = frappe.db.sql("SELECT MIN(attendance_date), MAX(attendance_date) FROM `tabEmployee Attendance`")[0]
+    start_date = getdate(start_date or bounds[0])
+    end_date = getdate(end_date or bounds[1])
+    if not start_date or not end_date:
+        return
+    
+    month = get_first_day(start_date)
+    while month <= end_date:
+        month_start, month_end = max(month, start_date), min(get_last_day(month), end_date)
+        rows = frappe.db.sql("""
+            SELECT name, employee_id, attendance_date, kiosk_location, check_in_time, check_out_time, total_hours
+            FROM `tabEmployee Attendance`
+            WHERE attendance_date BETWEEN %s AND %s
+        """, (month_start, month_end), as_dict=True)
+        
+        # One calendar build per month instead of one shift lookup per record
+        calendars = build_shift_calendar(list({row.employee_id for row in rows}), month_start, month_end)
+        for row in rows:
+            shift = calendars[row.employee_id]["days"][str(getdate(row.attendance_date))]
+            values = get_punctuality_values(
+                row.employee_id, row.attendance_date, row.kiosk_location,
+                row.check_in_time, row.check_out_time, row.total_hours, shift
+            )
+            frappe.db.sql(f"""
+                UPDATE `tabEmployee Attendance`
+                SET {", ".join(f"{field} = %({field})s" for field in PUNCTUALITY_FIELDS)}
+                WHERE name = %(name)s
+            """, dict(values, name=row.name))
+        
+        frappe.db.commit()
+        month = add_months(month, 1)
+    
+    # The UPDATEs bypass the doc_events that move the partition watermarks,
+    # so cached analytics of the rewritten dates would otherwise stay valid
+    frappe.cache().delete_keys(RESULT_KEY_PREFIX)
+
+def on_kiosk_change(doc, method=None):
+    """doc_event: forget cached kiosk timezones when a kiosk changes"""
+    frappe.cache().delete_value(KIOSK_TIMEZONE_KEY)
@@ -0,0 +1,334 @@
+# hrms_biometric/bio_facerecognition/api/attendance_queue.py
+
+import frappe
+import json
+import time
+from datetime import timedelta
+from frappe.utils import now_datetime, get_datetime
+
+from .attendance_writer import write_punch
+from .attendance_session_state import get_punch_session_state, is_double_tap, is_out_of_order, MIN_PUNCH_GAP_MINUTES
+from .capture_storage import store_capture
+
+# Recognised punches wait in this Redis list until the consumer writes them
+ATTENDANCE_QUEUE_KEY = "attendance_event_queue"
+ATTENDANCE_QUEUE_STATS_KEY = "attendance_event_queue_stats"
+# Events whose write failed wait here, with the error, until they are requeued
+DEAD_LETTER_KEY = "attendance_event_dead_letter"
+IDEMPOTENCY_KEY_PREFIX = "attendance_event_seen"
+# The first queued frame of an employee holds their punch window; frames
+# streamed within MIN_PUNCH_GAP_MINUTES of it are double taps
+PUNCH_WINDOW_KEY_PREFIX = "attendance_punch_window"
+# Kiosks upload buffered captures up to this many days old; a claimed event
+# is remembered a day longer so late retries and replays stay duplicates
+MAX_OFFLINE_DAYS = 7
+IDEMPOTENCY_TTL_SECONDS = (MAX_OFFLINE_DAYS + 1) * 24 * 3600
+DRAIN_BATCH_SIZE = 200
+DRAIN_JOB_ID = "hrms_biometric_drain_attendance_queue"
+# Held for the whole drain so the queued job and the cron fallback never read the same batch
+DRAIN_LOCK_KEY = "attendance_event_queue_drain_lock"
+DRAIN_LOCK_SECONDS = 300
+
+def enqueue_attendance_event(employee, confidence, kiosk_name=None, frame_id=None, capture=None, punch_time=None):
+    """Queue a recognised punch and return without touching the database.
+    
+    kiosk + frame_id is the idempotency key: a frame submitted twice (kiosk
+    retry, double click) is only queued once. The capture is only stored for
+    events that are queued.
+    """
+    punch_time = punch_time or now_datetime()
+    event_id = get_event_id(kiosk_name, frame_id)
+    
+    if not claim_event(event_id):
+        return {"type": "Duplicate", "event_id": event_id, "queued": False}
+    
+    if not claim_punch_window(employee.employee_id, event_id):
+        return {
+            "type": "Duplicate",
+            "event_id": event_id,
+            "queued": False,
+            "time": punch_time.strftime("%H:%M:%S"),
+            "date": punch_time.strftime("%Y-%m-%d")
+        }
+    
+    capture_url = store_capture(capture, employee.employee_id, punch_time) if capture is not None else None
+    return push_attendance_event(event_id, employee, confidence, kiosk_name, capture_url, punch_time)
+
+def push_attendance_event(event_id, employee, confidence, kiosk_name, capture_url, punch_time):
+    """Append an already claimed event to the queue and make sure a consumer runs"""
+    frappe.cache().rpush(ATTENDANCE_QUEUE_KEY, json.dumps({
+        "event_id": event_id,
+        "employee_id": employee.employee_id,
+        "employee_name": employee.employee_name,
+        "department": employee.department,
+        "confidence": confidence,
+        "kiosk_name": kiosk_name,
+        "capture_url": capture_url,
+        "punch_time": punch_time.isoformat(),
+        "enqueued_at": time.time()
+    }))
+    
+    schedule_attendance_drain()
+    
+    return {
+        "type": "Queued",
+        "event_id": event_id,
+        "queued": True,
+        "time": punch_time.strftime("%H:%M:%S"),
+        "date": punch_time.strftime("%Y-%m-%d")
+    }
+
+def schedule_attendance_drain():
+    """Make sure a drain job is queued; the per-minute cron calls this as a safety net"""
+    frappe.enqueue(
+        "hrms_biometric.bio_facerecognition.api.attendance_queue.drain_attendance_queue",
+        queue="short",
+        job_id=DRAIN_JOB_ID,
+        deduplicate=True
+    )
+
+def get_event_id(kiosk_name, frame_id=None):
+    return f"{kiosk_name or 'Unknown'}:{frame_id or frappe.generate_hash(length=12)}"
+
+def claim_event(event_id):
+    """Mark an event as seen; False when it was already claimed within the TTL"""
+    cache = frappe.cache()
+    return bool(cache.set(
+        cache.make_key(f"{IDEMPOTENCY_KEY_PREFIX}:{event_id}"),
+        1,
+        ex=IDEMPOTENCY_TTL_SECONDS,
+        nx=True
+    ))
+
+def release_event(event_id):
+    """Forget a claimed event so a failed write can be retried"""
+    cache = frappe.cache()
+    cache.delete(cache.make_key(f"{IDEMPOTENCY_KEY_PREFIX}:{event_id}"))
+
+def claim_punch_window(employee_id, event_id):
+    """Open the employee's punch window for this event; False while another event holds it"""
+    cache = frappe.cache()
+    return bool(cache.set(
+        cache.make_key(f"{PUNCH_WINDOW_KEY_PREFIX}:{employee_id}"),
+        event_id,
+        ex=MIN_PUNCH_GAP_MINUTES * 60,
+        nx=True
+    ))
+
+def release_punch_window(employee_id, event_id):
+    """Close the employee's punch window if this event still holds it"""
+    cache = frappe.cache()
+    key = cache.make_key(f"{PUNCH_WINDOW_KEY_PREFIX}:{employee_id}")
+    holder = cache.get(key)
+    if holder and frappe.safe_decode(holder) == event_id:
+        cache.delete(key)
+
+def dead_letter_event(event, error):
+    """Park a failed event and release its claims, so a kiosk retry or a requeue can write it"""
+    frappe.cache().rpush(DEAD_LETTER_KEY, json.dumps(dict(event, error=error, failed_at=time.time())))
+    if event.get("event_id"):
+        release_event(event["event_id"])
+        release_punch_window(event.get("employee_id"), event["event_id"])
+
+def drain_attendance_queue(batch_size=DRAIN_BATCH_SIZE):
+    """Write queued punches in batches, one transaction per batch (background job)"""
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key(DRAIN_LOCK_KEY), timeout=DRAIN_LOCK_SECONDS)
+    if not lock.acquire(blocking=False):
+        # Another drain holds the head of the queue; it picks up what we would have
+        return 0
+    
+    try:
+        return drain_batches(cache, lock, batch_size)
+    finally:
+        lock.release()
+
+def drain_batches(cache, lock, batch_size):
+    drained = 0
+    while True:
+        raw_events = cache.lrange(ATTENDANCE_QUEUE_KEY, 0, batch_size - 1)
+        if not raw_events:
+            break
+        
+        events = []
+        for raw in raw_events:
+            try:
+                events.append(json.loads(raw))
+            except Exception:
+                frappe.log_error(f"Malformed attendance event: {raw!r}")
+                cache.rpush(DEAD_LETTER_KEY, json.dumps({"raw": frappe.safe_decode(raw), "error": "Malformed event"}))
+        
+        applied, failures = apply_events(events)
+        frappe.db.commit()
+        
+        # Failed events leave the queue for the dead-letter list instead of being dropped
+        for event, error in failures:
+            dead_letter_event(event, error)
+        
+        # Only drop the batch once it is committed; if the worker dies before
+        # this the batch is replayed and apply_events skips what it already wrote
+        cache.ltrim(ATTENDANCE_QUEUE_KEY, len(raw_events), -1)
+        drained += len(raw_events)
+        
+        record_drain_stats(events, applied, len(failures))
+        lock.reacquire()
+        
+        if len(raw_events) < batch_size:
+            break
+    
+    return drained
+
+def apply_events(events):
+    """Apply check-in/check-out logic to a batch in punch order per employee.
+    
+    Returns the number of punches written and the (event, error) of each failure.
+    """
+    events.sort(key=lambda event: (event["employee_id"], event["punch_time"]))
+    already_written = get_written_punches(events)
+    applied = 0
+    failures = []
+    
+    for event in events:
+        punch_time = get_datetime(event["punch_time"])
+        if (event["employee_id"], punch_time) in already_written:
+            continue
+        
+        # Consecutive frames of the same person at a kiosk are one punch
+        session = get_punch_session_state(event["employee_id"], punch_time)
+        if is_double_tap(session, punch_time):
+            continue
+        
+        # An offline capture older than a punch already stored cannot be paired
+        # with the open record; it is parked for review instead of written
+        if is_out_of_order(session, punch_time):
+            failures.append((event, "Older than the latest punch stored for the day"))
+            continue
+        
+        try:
+            frappe.db.savepoint("attendance_event")
+            write_punch(
+                frappe._dict(
+                    employee_id=event["employee_id"],
+                    employee_name=event["employee_name"],
+                    department=event["department"]
+                ),
+                punch_time,
+                event.get("kiosk_name"),
+                event.get("confidence"),
+                event.get("capture_url")
+            )
+            already_written.add((event["employee_id"], punch_time))
+            applied += 1
+        
+        except Exception as e:
+            frappe.db.rollback(save_point="attendance_event")
+            frappe.log_error(f"Attendance event {event.get('event_id')} failed: {str(e)}")
+            failures.append((event, str(e)))
+    
+    return applied, failures
+
+def get_written_punches(events):
+    """(employee_id, time) of check-ins/check-outs already stored for the batch's employees and dates"""
+    if not events:
+        return set()
+    
+    employee_ids = list({event["employee_id"] for event in events})
+    dates = list({date for event in events for date in get_candidate_dates(get_datetime(event["punch_time"]))})
+    
+    rows = frappe.db.sql("""
+        SELECT employee_id, check_in_time, check_out_time
+        FROM `tabEmployee Attendance`
+        WHERE employee_id IN %(employee_ids)s AND attendance_date IN %(dates)s AND docstatus < 2
+    """, {"employee_ids": employee_ids, "dates": dates}, as_dict=True)
+    
+    written = set()
+    for row in rows:
+        for punch in (row.check_in_time, row.check_out_time):
+            if punch:
+                written.add((row.employee_id, punch))
+    
+    return written
+
+def get_candidate_dates(punch_time):
+    """Attendance dates a punch can be stored under: write_punch files it under
+    the shift-resolved date, which for overnight shifts is not the calendar day"""
+    day = punch_time.date()
+    return [day - timedelta(days=1), day, day + timedelta(days=1)]
+
+def is_punch_written(employee_id, punch_time):
+    """True when a stored check-in or check-out already has this exact time"""
+    return bool(frappe.db.sql("""
+        SELECT name FROM `tabEmployee Attendance`
+        WHERE employee_id = %(employee_id)s AND attendance_date IN %(dates)s AND docstatus < 2
+        AND (check_in_time = %(punch_time)s OR check_out_time = %(punch_time)s)
+        LIMIT 1
+    """, {"employee_id": employee_id, "dates": get_candidate_dates(punch_time), "punch_time": punch_time}))
+
+def record_drain_stats(events, applied, failed):
+    """Keep the outcome of the last drain for get_attendance_queue_status"""
+    oldest = min((event.get("enqueued_at") or time.time() for event in events), default=time.time())
+    frappe.cache().set_value(ATTENDANCE_QUEUE_STATS_KEY, {
+        "last_drain_at": now_datetime().isoformat(),
+        "last_batch_size": len(events),
+        "last_batch_applied": applied,
+        "last_batch_failed": failed,
+        "last_batch_lag_seconds": round(time.time() - oldest, 2)
+    })
+
+@frappe.whitelist()
+def get_attendance_queue_status():
+    """Queue depth, age of the oldest waiting punch and the last drain outcome"""
+    try:
+        cache = frappe.cache()
+        depth = cache.llen(ATTENDANCE_QUEUE_KEY)
+        lag_seconds = 0
+        
+        if depth:
+            oldest = cache.lrange(ATTENDANCE_QUEUE_KEY, 0, 0)
+            if oldest:
+                lag_seconds = round(time.time() - json.loads(oldest[0]).get("enqueued_at", time.time()), 2)
+        
+        return {
+            "success": True,
+            "depth": depth,
+            "lag_seconds": lag_seconds,
+            "failed": cache.llen(DEAD_LETTER_KEY),
+            "last_drain": cache.get_value(ATTENDANCE_QUEUE_STATS_KEY) or {}
+        }
+    
+    except Exception as e:
+        return {"success": False, "message": str(e)}
+
+@frappe.whitelist()
+def requeue_failed_attendance_events():
+    """Move dead-lettered events back onto the queue; events claimed again meanwhile are dropped"""
+    try:
+        frappe.only_for(("System Manager", "HR Manager"))
+        
+        cache = frappe.cache()
+        requeued = skipped = 0
+        while True:
+            raw = cache.lpop(DEAD_LETTER_KEY)
+            if raw is None:
+                break
+            
+            event = json.loads(raw)
+            # Malformed entries and events a kiosk retry has written since stay out of the queue
+            if not event.get("event_id") or not claim_event(event["event_id"]):
+                skipped += 1
+                continue
+            
+            event.pop("error", None)
+            event.pop("failed_at", None)
+            cache.rpush(ATTENDANCE_QUEUE_KEY, json.dumps(event))
+            requeued += 1
+        
+        if requeued:
+            schedule_attendance_drain()
+        return {"success": True, "requeued": requeued, "skipped": skipped}
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"Attendance event requeue error: {str(e)}")
+        return {"success": False, "message": str(e)}
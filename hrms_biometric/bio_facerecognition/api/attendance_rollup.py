@@ -0,0 +1,220 @@
+# hrms_biometric/bio_facerecognition/api/attendance_rollup.py
+
+import frappe
+import hashlib
+from collections import defaultdict
+from datetime import datetime
+from frappe.utils import getdate, add_months, get_first_day, get_last_day, flt
+
+from .attendance_sketch import get_sketch_delta, apply_sketch_delta
+
+ROLLUP_DOCTYPE = "Attendance Hourly Rollup"
+
+# Arrivals up to this minute of the day count as early; lateness, early
+# departure and overtime are stored per record against the employee's shift
+EARLY_ARRIVAL_BY_MINUTE = 9 * 60
+
+# Additive measures per (attendance_date, department, kiosk_location, hour) cell.
+# Record measures are counted at the check-in hour, check_out_events at the
+# check-out hour; employee_days counts each employee once per day.
+MEASURES = [
+    "record_count", "employee_days", "check_in_events", "check_out_events",
+    "check_in_type_count", "check_out_type_count",
+    "confidence_count", "confidence_sum", "confidence_sumsq",
+    "hours_count", "hours_sum", "hours_sumsq",
+    "early_arrivals", "on_time_arrivals", "late_arrivals", "lateness_minutes_sum",
+    "early_departures", "overtime_records", "overtime_hours_sum"
+]
+
+ROW_FIELDS = [
+    "name", "employee_id", "attendance_date", "department", "kiosk_location", "check_in_time",
+    "check_out_time", "attendance_type", "confidence_score", "total_hours",
+    "check_in_minute", "check_out_minute", "check_in_hour", "is_late", "is_early_departure", "overtime_hours"
+]
+
+def get_employee_day_rows(employee_id, attendance_date):
+    """Submitted attendance rows of one employee on one date, as the rollup sees them"""
+    return frappe.db.sql(f"""
+        SELECT {", ".join(ROW_FIELDS)}
+        FROM `tabEmployee Attendance`
+        WHERE employee_id = %s AND attendance_date = %s AND docstatus = 1
+    """, (employee_id, attendance_date), as_dict=True)
+
+def get_contributions(rows):
+    """Rollup measures the given rows add up to, per cell"""
+    cells = defaultdict(lambda: defaultdict(float))
+    
+    first_of_day = {}
+    for row in rows:
+        key = (row.employee_id, row.attendance_date)
+        first = first_of_day.get(key)
+        if not first or (row.check_in_time or datetime.max, row.name) < (first.check_in_time or datetime.max, first.name):
+            first_of_day[key] = row
+    
+    for row in rows:
+        cell = cells[get_cell(row, row.check_in_hour)]
+        cell["record_count"] += 1
+        if first_of_day[(row.employee_id, row.attendance_date)] is row:
+            cell["employee_days"] += 1
+        
+        if row.attendance_type == "Check In":
+            cell["check_in_type_count"] += 1
+        elif row.attendance_type == "Check Out":
+            cell["check_out_type_count"] += 1
+        
+        if row.confidence_score is not None:
+            cell["confidence_count"] += 1
+            cell["confidence_sum"] += flt(row.confidence_score)
+            cell["confidence_sumsq"] += flt(row.confidence_score) ** 2
+        
+        if row.total_hours is not None:
+            cell["hours_count"] += 1
+            cell["hours_sum"] += flt(row.total_hours)
+            cell["hours_sumsq"] += flt(row.total_hours) ** 2
+        
+        if flt(row.overtime_hours) > 0:
+            cell["overtime_records"] += 1
+            cell["overtime_hours_sum"] += flt(row.overtime_hours)
+        
+        if row.check_in_minute is not None:
+            cell["check_in_events"] += 1
+            if row.is_late:
+                cell["late_arrivals"] += 1
+            elif row.check_in_minute <= EARLY_ARRIVAL_BY_MINUTE:
+                cell["early_arrivals"] += 1
+            else:
+                cell["on_time_arrivals"] += 1
+            cell["lateness_minutes_sum"] += row.check_in_minute - EARLY_ARRIVAL_BY_MINUTE
+        
+        if row.check_out_minute is not None:
+            if row.is_early_departure:
+                cell["early_departures"] += 1
+            cells[get_cell(row, row.check_out_minute // 60)]["check_out_events"] += 1
+    
+    return cells
+
+def get_cell(row, hour):
+    # Empty strings instead of NULL, so the unique key treats them as equal
+    return (
+        str(getdate(row.attendance_date)),
+        row.department or "",
+        row.kiosk_location or "",
+        hour or 0
+    )
+
+def get_delta(rows_before, rows_after):
+    before, after = get_contributions(rows_before), get_contributions(rows_after)
+    delta = {}
+    for cell in set(before) | set(after):
+        values = {measure: after[cell][measure] - before[cell][measure] for measure in MEASURES}
+        if any(values.values()):
+            delta[cell] = values
+    return delta
+
+def apply_rollup_delta(delta):
+    """Add the delta to the rollup cells in one upsert"""
+    if not delta:
+        return
+    
+    values = []
+    for cell, measures in delta.items():
+        values.append([get_rollup_name(cell), *cell] + [measures[measure] for measure in MEASURES])
+    
+    placeholders = ", ".join(["(" + ", ".join(["%s"] * len(values[0])) + ", NOW(6), NOW(6), 'Administrator', 'Administrator')"] * len(values))
+    frappe.db.sql(f"""
+        INSERT INTO `tab{ROLLUP_DOCTYPE}`
+            (name, attendance_date, department, kiosk_location, hour, {", ".join(MEASURES)},
+             creation, modified, owner, modified_by)
+        VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE
+            {", ".join(f"{measure} = {measure} + VALUES({measure})" for measure in MEASURES)},
+            modified = VALUES(modified)
+    """, [value for row in values for value in row])
+
+def get_rollup_name(cell):
+    return hashlib.sha1("|".join(str(part) for part in cell).encode("utf-8")).hexdigest()[:20]
+
+def update_employee_day(employee_id, attendance_date, rows_before):
+    """Fold the change of one employee's day into the rollups and quantile sketches;
+    rows_before is the state before the write"""
+    rows_after = get_employee_day_rows(employee_id, attendance_date)
+    apply_rollup_delta(get_delta(rows_before, rows_after))
+    apply_sketch_delta(get_sketch_delta(rows_before, rows_after))
+
+def update_rollup_on_attendance_change(doc, method=None):
+    """doc_event: keep the rollups and quantile sketches in step with submitted Employee Attendance"""
+    rows_after = get_employee_day_rows(doc.employee_id, doc.attendance_date)
+    rows_before = [row for row in rows_after if row.name != doc.name]
+    
+    if method == "on_cancel":
+        before_doc = doc
+    elif method == "on_update_after_submit":
+        before_doc = doc.get_doc_before_save()
+    else:
+        before_doc = None
+    
+    if before_doc:
+        rows_before.append(frappe._dict({field: before_doc.get(field) for field in ROW_FIELDS}))
+    
+    apply_rollup_delta(get_delta(rows_before, rows_after))
+    apply_sketch_delta(get_sketch_delta(rows_before, rows_after))
+
+def rebuild_rollups(start_date=None, end_date=None):
+    """Recompute the rollups from Employee Attendance, a month at a time"""
+    bounds = frappe.db.sql("""
+        SELECT MIN(attendance_date), MAX(attendance_date)
+        FROM `tabEmployee Attendance` WHERE docstatus = 1
+    """)[0]
+    start_date = getdate(start_date or bounds[0])
+    end_date = getdate(end_date or bounds[1])
+    if not start_date or not end_date:
+        return
+    
+    month = get_first_day(start_date)
+    while month <= end_date:
+        month_start, month_end = max(month, start_date), min(get_last_day(month), end_date)
+        frappe.db.sql(f"DELETE FROM `tab{ROLLUP_DOCTYPE}` WHERE attendance_date BETWEEN %s AND %s",
+                      (month_start, month_end))
+        
+        rows = frappe.db.sql(f"""
+            SELECT {", ".join(ROW_FIELDS)}
+            FROM `tabEmployee Attendance`
+            WHERE attendance_date BETWEEN %s AND %s AND docstatus = 1
+        """, (month_start, month_end), as_dict=True)
+        
+        apply_rollup_delta(get_delta([], rows))
+        frappe.db.commit()
+        month = add_months(month, 1)
+
+def get_rollup_totals(start_date, end_date, group_by, extra_columns=None, having="SUM(record_count) > 0", order_by=None):
+    """Sum every measure over the date range grouped by the given rollup columns"""
+    columns = ", ".join(group_by)
+    sums = ", ".join(f"SUM({measure}) AS {measure}" for measure in MEASURES)
+    return frappe.db.sql(f"""
+        SELECT {columns}, {sums}{", " + extra_columns if extra_columns else ""}
+        FROM `tab{ROLLUP_DOCTYPE}`
+        WHERE attendance_date BETWEEN %s AND %s
+        GROUP BY {columns}
+        {"HAVING " + having if having else ""}
+        ORDER BY {order_by or columns}
+    """, (start_date, end_date), as_dict=True)
+
+def get_distinct_employees(start_date, end_date, column):
+    """COUNT(DISTINCT employee_id) per department or kiosk location over the range.
+    
+    Distinct employees do not add up across rollup cells, so these come from
+    Employee Attendance, answered from its (attendance_date, docstatus,
+    column, employee_id) index without reading the rows.
+    """
+    if column not in ("department", "kiosk_location"):
+        frappe.throw(f"Cannot count distinct employees by {column}")
+    
+    return dict(frappe.db.sql(f"""
+        SELECT COALESCE({column}, '') AS group_key, COUNT(DISTINCT employee_id)
+        FROM `tabEmployee Attendance`
+        WHERE attendance_date BETWEEN %s AND %s AND docstatus = 1
+        GROUP BY group_key
+    """, (start_date, end_date)))
+
+def average(total, count):
+    return flt(total) / flt(count) if flt(count) else None
@@ -0,0 +1,107 @@
+# hrms_biometric/bio_facerecognition/api/attendance_session_state.py
+
+import frappe
+from frappe.utils import getdate
+
+from .shift_calendar import get_attendance_date
+
+# One hash field per employee holding their attendance state for the day:
+# the open (checked in, not out) record, the last punch and its kiosk
+SESSION_STATE_KEY = "attendance_session_state"
+MIN_PUNCH_GAP_MINUTES = 5
+
+def get_session_state(employee_id, attendance_date):
+    """Return the employee's session state for the date, rebuilding it from the database on a miss"""
+    attendance_date = str(getdate(attendance_date))
+    state = frappe.cache().hget(SESSION_STATE_KEY, employee_id)
+    
+    if state and state.get("date") == attendance_date:
+        return state
+    
+    return rebuild_session_state(employee_id, attendance_date)
+
+def get_punch_session_state(employee_id, punch_time):
+    """Session state of the attendance date (per the shift calendar) a punch belongs to"""
+    return get_session_state(employee_id, get_attendance_date(employee_id, punch_time))
+
+def rebuild_session_state(employee_id, attendance_date):
+    """Load the day's records of one employee and cache the derived state"""
+    records = frappe.db.sql("""
+        SELECT name, check_in_time, check_out_time, kiosk_location
+        FROM `tabEmployee Attendance`
+        WHERE employee_id = %s AND attendance_date = %s AND docstatus < 2
+        ORDER BY creation DESC
+    """, (employee_id, attendance_date), as_dict=True)
+    
+    state = empty_session_state(attendance_date)
+    
+    for record in records:
+        if not state["open_record"] and record.check_in_time and not record.check_out_time:
+            state["open_record"] = record.name
+            state["check_in_time"] = record.check_in_time
+            state["open_kiosk"] = record.kiosk_location
+        
+        for punch_time in (record.check_in_time, record.check_out_time):
+            if punch_time and (not state["last_punch_time"] or punch_time > state["last_punch_time"]):
+                state["last_punch_time"] = punch_time
+                state["last_kiosk"] = record.kiosk_location
+    
+    frappe.cache().hset(SESSION_STATE_KEY, employee_id, state)
+    return state
+
+def empty_session_state(attendance_date):
+    return {
+        "date": str(attendance_date),
+        "open_record": None,
+        "check_in_time": None,
+        "open_kiosk": None,
+        "last_punch_time": None,
+        "last_kiosk": None
+    }
+
+def record_punch(employee_id, attendance_type, record_name, punch_time, kiosk_name=None, attendance_date=None):
+    """Write-through update after a punch is stored.
+    
+    If the surrounding transaction is rolled back the entry is dropped, so the
+    next lookup rebuilds it from what was actually committed.
+    """
+    state = get_session_state(employee_id, attendance_date or punch_time.date())
+    
+    if attendance_type == "Check In":
+        state["open_record"] = record_name
+        state["check_in_time"] = punch_time
+        state["open_kiosk"] = kiosk_name
+    elif state["open_record"] == record_name:
+        state["open_record"] = None
+        state["check_in_time"] = None
+        state["open_kiosk"] = None
+    
+    if not state["last_punch_time"] or punch_time >= state["last_punch_time"]:
+        state["last_punch_time"] = punch_time
+        state["last_kiosk"] = kiosk_name
+    
+    frappe.cache().hset(SESSION_STATE_KEY, employee_id, state)
+    frappe.db.after_rollback.add(lambda: clear_session_state(employee_id))
+
+def is_double_tap(state, punch_time, min_gap_minutes=MIN_PUNCH_GAP_MINUTES):
+    """True when the punch follows the last one too closely to be intentional"""
+    if not state["last_punch_time"]:
+        return False
+    
+    return abs((punch_time - state["last_punch_time"]).total_seconds()) < min_gap_minutes * 60
+
+def is_out_of_order(state, punch_time):
+    """True when the punch is older than the latest one stored for its attendance date.
+    
+    write_punch pairs a punch with the open record, so such a punch (an offline
+    capture uploaded after a live one) would close a session it happened before.
+    """
+    return bool(state["last_punch_time"]) and punch_time < state["last_punch_time"]
+
+def clear_session_state(employee_id):
+    frappe.cache().hdel(SESSION_STATE_KEY, employee_id)
+
+def invalidate_session_state(doc, method=None):
+    """doc_events hook: drop the cached state whenever a record is changed outside the kiosk writer"""
+    if doc.employee_id:
+        clear_session_state(doc.employee_id)
@@ -0,0 +1,179 @@
+# hrms_biometric/bio_facerecognition/api/attendance_sketch.py
+
+import frappe
+import json
+import hashlib
+import numpy as np
+from collections import defaultdict
+from frappe.utils import getdate, add_months, get_first_day, get_last_day, flt
+
+SKETCH_DOCTYPE = "Attendance Quantile Sketch"
+
+# Fixed-width histograms per (attendance_date, department, kiosk_location, metric).
+# They merge by adding counts and, unlike KLL or t-digest, can also be
+# subtracted, so cancelled and edited records fold in through the same
+# before/after delta as the hourly rollups. Quantiles are exact to one bin.
+SKETCH_METRICS = {
+    # metric: (lowest value, bin width, number of bins)
+    "check_in_minute": (0, 1, 1440),
+    "check_out_minute": (0, 1, 1440),
+    "total_hours": (0, 0.05, 480),
+    "confidence_score": (0, 0.5, 200)
+}
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+def get_bin(metric, value):
+    low, width, size = SKETCH_METRICS[metric]
+    return min(max(int((flt(value) - low) // width), 0), size - 1)
+
+def get_sketch_contributions(rows):
+    """Histogram counts the given rows add up to, per cell and metric"""
+    sketches = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        cell = (str(getdate(row.attendance_date)), row.department or "", row.kiosk_location or "")
+        for metric in SKETCH_METRICS:
+            if row.get(metric) is not None:
+                sketches[cell + (metric,)][get_bin(metric, row.get(metric))] += 1
+    return sketches
+
+def get_sketch_delta(rows_before, rows_after):
+    before, after = get_sketch_contributions(rows_before), get_sketch_contributions(rows_after)
+    delta = {}
+    for key in set(before) | set(after):
+        bins = {}
+        for index in set(before[key]) | set(after[key]):
+            change = after[key][index] - before[key][index]
+            if change:
+                bins[index] = change
+        if bins:
+            delta[key] = bins
+    return delta
+
+def get_sketch_name(key):
+    return hashlib.sha1("|".join(str(part) for part in key).encode("utf-8")).hexdigest()[:20]
+
+def apply_sketch_delta(delta):
+    """Add the delta to the stored sketches; the sketch rows stay locked until commit"""
+    if not delta:
+        return
+    
+    # In name order, so the INSERT IGNORE takes its row locks in the same order as the SELECT below
+    keys = dict(sorted((get_sketch_name(key), key) for key in delta))
+    row_placeholder = "(%s, %s, %s, %s, %s, %s, %s, NOW(6), NOW(6), 'Administrator', 'Administrator')"
+    
+    # Make sure every row exists, then lock them, both in name order so writers cannot deadlock
+    frappe.db.sql(f"""
+        INSERT IGNORE INTO `tab{SKETCH_DOCTYPE}`
+            (name, attendance_date, department, kiosk_location, metric, sample_count, bins,
+             creation, modified, owner, modified_by)
+        VALUES {", ".join([row_placeholder] * len(keys))}
+    """, [value for name, key in keys.items() for value in (name, *key, 0, "{}")])
+    
+    stored = dict(frappe.db.sql(f"""
+        SELECT name, bins FROM `tab{SKETCH_DOCTYPE}`
+        WHERE name IN %(names)s
+        ORDER BY name
+        FOR UPDATE
+    """, {"names": tuple(keys)}))
+    
+    values = []
+    for name, key in keys.items():
+        bins = {int(index): count for index, count in json.loads(stored.get(name) or "{}").items()}
+        for index, change in delta[key].items():
+            bins[index] = bins.get(index, 0) + change
+        bins = {index: bins[index] for index in sorted(bins) if bins[index]}
+        values.extend([name, *key, sum(bins.values()), json.dumps(bins)])
+    
+    frappe.db.sql(f"""
+        INSERT INTO `tab{SKETCH_DOCTYPE}`
+            (name, attendance_date, department, kiosk_location, metric, sample_count, bins,
+             creation, modified, owner, modified_by)
+        VALUES {", ".join([row_placeholder] * len(keys))}
+        ON DUPLICATE KEY UPDATE
+            sample_count = VALUES(sample_count),
+            bins = VALUES(bins),
+            modified = VALUES(modified)
+    """, values)
+
+def rebuild_sketches(start_date=None, end_date=None):
+    """Recompute the sketches from Employee Attendance, a month at a time"""
+    from .attendance_rollup import ROW_FIELDS
+    
+    bounds = frappe.db.sql("""
+        SELECT MIN(attendance_date), MAX(attendance_date)
+        FROM `tabEmployee Attendance` WHERE docstatus = 1
+    """)[0]
+    start_date = getdate(start_date or bounds[0])
+    end_date = getdate(end_date or bounds[1])
+    if not start_date or not end_date:
+        return
+    
+    month = get_first_day(start_date)
+    while month <= end_date:
+        month_start, month_end = max(month, start_date), min(get_last_day(month), end_date)
+        frappe.db.sql(f"DELETE FROM `tab{SKETCH_DOCTYPE}` WHERE attendance_date BETWEEN %s AND %s",
+                      (month_start, month_end))
+        
+        rows = frappe.db.sql(f"""
+            SELECT {", ".join(ROW_FIELDS)}
+            FROM `tabEmployee Attendance`
+            WHERE attendance_date BETWEEN %s AND %s AND docstatus = 1
+        """, (month_start, month_end), as_dict=True)
+        
+        apply_sketch_delta(get_sketch_delta([], rows))
+        frappe.db.commit()
+        month = add_months(month, 1)
+
+def merge_sketches(start_date, end_date, metrics=None, group_by=None):
+    """Merged histogram per (group, metric) over the date range; only sketch rows are read"""
+    metrics = [metric for metric in (metrics or SKETCH_METRICS) if metric in SKETCH_METRICS]
+    group_column = group_by if group_by in ("department", "kiosk_location") else "''"
+    
+    rows = frappe.db.sql(f"""
+        SELECT {group_column} AS group_key, metric, bins
+        FROM `tab{SKETCH_DOCTYPE}`
+        WHERE attendance_date BETWEEN %(start)s AND %(end)s
+        AND metric IN %(metrics)s
+        AND sample_count > 0
+    """, {"start": start_date, "end": end_date, "metrics": tuple(metrics)})
+    
+    histograms = {}
+    for group_key, metric, bins in rows:
+        key = (group_key or "", metric)
+        if key not in histograms:
+            histograms[key] = np.zeros(SKETCH_METRICS[metric][2], dtype=np.int64)
+        bins = json.loads(bins)
+        np.add.at(
+            histograms[key],
+            np.fromiter((int(index) for index in bins), dtype=np.int64, count=len(bins)),
+            np.fromiter(bins.values(), dtype=np.int64, count=len(bins))
+        )
+    return histograms
+
+def get_quantiles(metric, histogram, percentiles=DEFAULT_PERCENTILES):
+    """Percentiles of a merged histogram, interpolated linearly within the bin they fall in"""
+    low, width, size = SKETCH_METRICS[metric]
+    cumulative = np.cumsum(histogram)
+    total = int(cumulative[-1]) if size else 0
+    if not total:
+        return {"count": 0}
+    
+    # Ranks of at least half a sample land in the first non-empty bin
+    ranks = np.maximum(np.asarray(percentiles, dtype=np.float64) / 100 * total, 0.5)
+    index = np.minimum(np.searchsorted(cumulative, ranks, side="left"), size - 1)
+    within = (ranks - (cumulative[index] - histogram[index])) / np.maximum(histogram[index], 1)
+    values = low + (index + within) * width
+    
+    midpoints = low + (np.arange(size) + 0.5) * width
+    result = {"count": total, "mean": round(float(np.dot(histogram, midpoints) / total), 2)}
+    for percentile, value in zip(percentiles, values):
+        result[f"p{percentile:g}"] = round(float(value), 2)
+    return result
+
+def get_percentiles(start_date, end_date, metrics=None, group_by=None, percentiles=DEFAULT_PERCENTILES):
+    """{group: {metric: {count, mean, p50, ...}}} for the range"""
+    result = defaultdict(dict)
+    for (group_key, metric), histogram in sorted(merge_sketches(start_date, end_date, metrics, group_by).items()):
+        result[group_key or "All"][metric] = get_quantiles(metric, histogram, percentiles)
+    return dict(result)
@@ -0,0 +1,192 @@
+# hrms_biometric/bio_facerecognition/api/attendance_writer.py
+
+import frappe
+from frappe.utils import now_datetime
+
+from .attendance_session_state import record_punch
+from .shift_calendar import resolve_punch_shift
+from .kiosk_status import record_kiosk_punch
+from .attendance_rollup import get_employee_day_rows, update_employee_day
+from .analytics_cache import touch_attendance_partition
+from .attendance_metrics import get_punctuality_values
+
+APP_HOOK_PREFIX = "hrms_biometric."
+LIFECYCLE_CHECK_CACHE_KEY = "attendance_writer_needs_document"
+LIFECYCLE_CHECK_CACHE_SECONDS = 300
+
+def write_punch(employee, punch_time=None, kiosk_name=None, confidence=None, capture_url=None):
+    """Record a kiosk punch as a check-in or check-out for the employee.
+    
+    Punches of one employee are serialised by locking their Employee Face
+    Recognition row and the open record for the day. Check-ins are inserted
+    directly as submitted rows and check-outs are updated in place, unless
+    other apps hook into Employee Attendance and need the full document path.
+    The attendance date and lateness come from the employee's shift calendar,
+    so punches after midnight count towards an overnight shift's start date.
+    The caller owns the transaction.
+    """
+    punch_time = punch_time or now_datetime()
+    punch_shift = resolve_punch_shift(employee.employee_id, punch_time)
+    
+    if needs_document_lifecycle():
+        return write_punch_with_document(employee, punch_time, kiosk_name, confidence, capture_url, punch_shift)
+    
+    attendance_date = punch_shift.attendance_date
+    open_record = lock_open_record(employee.employee_id, attendance_date)
+    # Raw writes skip doc_events, so the analytics rollups are updated here
+    rows_before = get_employee_day_rows(employee.employee_id, attendance_date)
+    
+    if open_record:
+        total_hours = round((punch_time - open_record.check_in_time).total_seconds() / 3600, 2)
+        values = get_punctuality_values(
+            employee.employee_id, attendance_date, open_record.kiosk_location,
+            open_record.check_in_time, punch_time, total_hours, punch_shift.shift
+        )
+        frappe.db.sql("""
+            UPDATE `tabEmployee Attendance`
+            SET check_out_time = %s, attendance_type = 'Check Out', total_hours = %s,
+                check_out_minute = %s, is_early_departure = %s, overtime_hours = %s,
+                modified = %s, modified_by = %s
+            WHERE name = %s
+        """, (
+            punch_time, total_hours,
+            values["check_out_minute"], values["is_early_departure"], values["overtime_hours"],
+            punch_time, frappe.session.user, open_record.name
+        ))
+        update_employee_day(employee.employee_id, attendance_date, rows_before)
+        touch_attendance_partition(attendance_date)
+    
+        record_punch(employee.employee_id, "Check Out", open_record.name, punch_time, kiosk_name, attendance_date)
+    
+        record_kiosk_punch(kiosk_name, punch_time)
+        return punch_result("Check Out", open_record.name, punch_time, attendance_date)
+    
+    name = frappe.generate_hash(length=10)
+    values = get_punctuality_values(
+        employee.employee_id, attendance_date, kiosk_name or "Unknown", punch_time, shift=punch_shift.shift
+    )
+    frappe.db.sql("""
+        INSERT INTO `tabEmployee Attendance`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             employee_id, employee_name, department, attendance_date, check_in_time,
+             attendance_type, status, kiosk_location, confidence_score,
+             face_image_captured, created_by_system, verification_status,
+             check_in_minute, check_in_hour, is_late, is_early_departure)
+        VALUES (%s, %s, %s, %s, %s, 1, 0, %s, %s, %s, %s, %s,
+                'Check In', %s, %s, %s, %s, 1, 'Verified', %s, %s, %s, 0)
+    """, (
+        name, punch_time, punch_time, frappe.session.user, frappe.session.user,
+        employee.employee_id, employee.employee_name, employee.department,
+        attendance_date, punch_time, get_check_in_status(values),
+        kiosk_name or "Unknown", confidence, capture_url,
+        values["check_in_minute"], values["check_in_hour"], values["is_late"]
+    ))
+    update_employee_day(employee.employee_id, attendance_date, rows_before)
+    touch_attendance_partition(attendance_date)
+    
+    record_punch(employee.employee_id, "Check In", name, punch_time, kiosk_name, attendance_date)
+    
+    record_kiosk_punch(kiosk_name, punch_time)
+    return punch_result("Check In", name, punch_time, attendance_date)
+
+def write_punch_with_document(employee, punch_time, kiosk_name=None, confidence=None, capture_url=None, punch_shift=None):
+    """Record a punch through Employee Attendance documents so every hook runs"""
+    punch_shift = punch_shift or resolve_punch_shift(employee.employee_id, punch_time)
+    attendance_date = punch_shift.attendance_date
+    open_record = lock_open_record(employee.employee_id, attendance_date)
+    
+    if open_record:
+        doc = frappe.get_doc("Employee Attendance", open_record.name)
+        doc.check_out_time = punch_time
+        doc.attendance_type = "Check Out"
+        doc.total_hours = round((punch_time - doc.check_in_time).total_seconds() / 3600, 2)
+        doc.flags.ignore_validate_update_after_submit = True
+        doc.save(ignore_permissions=True)
+    
+        record_punch(employee.employee_id, "Check Out", doc.name, punch_time, kiosk_name, attendance_date)
+    
+        record_kiosk_punch(kiosk_name, punch_time)
+        return punch_result("Check Out", doc.name, punch_time, attendance_date)
+    
+    values = get_punctuality_values(
+        employee.employee_id, attendance_date, kiosk_name or "Unknown", punch_time, shift=punch_shift.shift
+    )
+    doc = frappe.new_doc("Employee Attendance")
+    doc.employee_id = employee.employee_id
+    doc.employee_name = employee.employee_name
+    doc.department = employee.department
+    doc.attendance_date = attendance_date
+    doc.check_in_time = punch_time
+    doc.attendance_type = "Check In"
+    doc.status = get_check_in_status(values)
+    doc.kiosk_location = kiosk_name or "Unknown"
+    doc.confidence_score = confidence
+    doc.verification_status = "Verified"
+    doc.created_by_system = 1
+    doc.face_image_captured = capture_url
+    doc.insert(ignore_permissions=True)
+    doc.submit()
+    
+    record_punch(employee.employee_id, "Check In", doc.name, punch_time, kiosk_name, attendance_date)
+    
+    record_kiosk_punch(kiosk_name, punch_time)
+    return punch_result("Check In", doc.name, punch_time, attendance_date)
+
+def lock_open_record(employee_id, attendance_date):
+    """Lock the employee and return their open (checked in, not out) record for the day.
+    
+    The Employee Face Recognition row is locked first so that two kiosks
+    punching the same employee queue up even when no attendance row exists yet.
+    """
+    frappe.db.sql("""
+        SELECT name FROM `tabEmployee Face Recognition`
+        WHERE name = %s
+        FOR UPDATE
+    """, (employee_id,))
+    
+    records = frappe.db.sql("""
+        SELECT name, check_in_time, kiosk_location
+        FROM `tabEmployee Attendance`
+        WHERE employee_id = %s AND attendance_date = %s AND docstatus < 2
+            AND check_in_time IS NOT NULL AND check_out_time IS NULL
+        ORDER BY creation DESC
+        LIMIT 1
+        FOR UPDATE
+    """, (employee_id, attendance_date), as_dict=True)
+    
+    return records[0] if records else None
+
+def needs_document_lifecycle():
+    """True when other apps or Server Scripts listen to Employee Attendance events"""
+    cached = frappe.cache().get_value(LIFECYCLE_CHECK_CACHE_KEY)
+    if cached is not None:
+        return cached
+    
+    handlers = frappe.get_hooks("doc_events").get("Employee Attendance", {})
+    foreign_handlers = [
+        handler
+        for event_handlers in handlers.values()
+        for handler in event_handlers
+        if not handler.startswith(APP_HOOK_PREFIX)
+    ]
+    
+    server_scripts = frappe.db.exists("Server Script", {
+        "reference_doctype": "Employee Attendance",
+        "disabled": 0
+    })
+    
+    needed = bool(foreign_handlers or server_scripts)
+    frappe.cache().set_value(LIFECYCLE_CHECK_CACHE_KEY, needed, expires_in_sec=LIFECYCLE_CHECK_CACHE_SECONDS)
+    return needed
+
+def get_check_in_status(values):
+    # From the stored is_late, so status and analytics judge the punch on the same kiosk-local clock
+    return "Late" if values["is_late"] else "Present"
+
+def punch_result(attendance_type, name, punch_time, attendance_date=None):
+    return {
+        "type": attendance_type,
+        "name": name,
+        "time": punch_time.strftime("%H:%M:%S"),
+        "date": str(attendance_date or punch_time.date())
+    }
@@ -0,0 +1,89 @@
+# hrms_biometric/bio_facerecognition/api/capture_hints.py
+
+import frappe
+import random
+from frappe.utils import cint
+
+from .attendance_queue import ATTENDANCE_QUEUE_KEY
+
+# Face width in pixels recognition needs; frames are sized so the typical face
+# at a kiosk comes out at about this width
+TARGET_FACE_PIXELS = 120
+MIN_FRAME_WIDTH = 320
+MAX_FRAME_WIDTH = 1280
+# Weight of the newest observation in the per-kiosk face size average
+FACE_SIZE_ALPHA = 0.2
+FACE_SIZE_KEY = "kiosk_face_size"
+
+JPEG_QUALITY = 0.8
+JPEG_QUALITY_UNDER_LOAD = 0.65
+# Idle kiosks keep their usual 3 s cadence; load only ever lengthens it
+POLL_DELAY_MS = 3000
+POLL_DELAY_UNDER_LOAD_MS = 10000
+# Queued punches at which the fleet is told to back off completely
+QUEUE_DEPTH_HIGH = 500
+
+RECOGNITIONS_IN_FLIGHT_KEY = "face_recognitions_in_flight"
+
+def observe_face_size(kiosk_name, frame):
+    """Fold the face width of a frame, relative to the frame width, into the kiosk's average"""
+    if not frame or not frame.get("face_location"):
+        return
+    
+    top, right, bottom, left = frame["face_location"]
+    ratio = (right - left) / frame["image"].shape[1]
+    if ratio <= 0:
+        return
+    
+    key = kiosk_name or "Unknown"
+    average = frappe.cache().hget(FACE_SIZE_KEY, key)
+    if average:
+        ratio = FACE_SIZE_ALPHA * ratio + (1 - FACE_SIZE_ALPHA) * average
+    frappe.cache().hset(FACE_SIZE_KEY, key, ratio)
+
+def get_target_frame_width(kiosk_name):
+    """Frame width that keeps the kiosk's typical face near TARGET_FACE_PIXELS, None until observed"""
+    ratio = frappe.cache().hget(FACE_SIZE_KEY, kiosk_name or "Unknown")
+    if not ratio:
+        return None
+    
+    width = min(MAX_FRAME_WIDTH, max(MIN_FRAME_WIDTH, TARGET_FACE_PIXELS / ratio))
+    return int(round(width / 32.0)) * 32
+
+def get_load_factor():
+    """0 when idle, 1 when kiosks should back off as far as they can"""
+    queue_depth = frappe.cache().llen(ATTENDANCE_QUEUE_KEY) or 0
+    in_flight = cint(frappe.cache().get(frappe.cache().make_key(RECOGNITIONS_IN_FLIGHT_KEY)))
+    max_concurrent = cint(frappe.get_cached_doc("Face Recognition Settings").max_concurrent_recognitions) or 2
+    
+    # Up to max_concurrent recognitions running at once is normal
+    recognition_load = max(0, in_flight - max_concurrent) / max_concurrent
+    return min(1.0, max(queue_depth / QUEUE_DEPTH_HIGH, recognition_load))
+
+def get_capture_hints(kiosk_name, frame=None):
+    """Frame width, JPEG quality and next capture delay for a kiosk"""
+    observe_face_size(kiosk_name, frame)
+    load = get_load_factor()
+    
+    poll_delay = POLL_DELAY_MS + load * (POLL_DELAY_UNDER_LOAD_MS - POLL_DELAY_MS)
+    # Spread the fleet out so kiosks backing off do not all return at once
+    poll_delay *= 1 + random.uniform(0, 0.2)
+    
+    return {
+        "frame_width": get_target_frame_width(kiosk_name),
+        "jpeg_quality": round(JPEG_QUALITY - load * (JPEG_QUALITY - JPEG_QUALITY_UNDER_LOAD), 2),
+        "poll_delay_ms": int(poll_delay)
+    }
+
+def begin_recognition():
+    cache = frappe.cache()
+    key = cache.make_key(RECOGNITIONS_IN_FLIGHT_KEY)
+    cache.incr(key)
+    # Recover from workers that died mid-recognition
+    cache.expire(key, 60)
+
+def end_recognition():
+    cache = frappe.cache()
+    key = cache.make_key(RECOGNITIONS_IN_FLIGHT_KEY)
+    if cint(cache.decr(key)) < 0:
+        cache.delete(key)
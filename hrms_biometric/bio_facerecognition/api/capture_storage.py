@@ -0,0 +1,192 @@
+# hrms_biometric/bio_facerecognition/api/capture_storage.py
+
+import frappe
+import cv2
+import base64
+import hashlib
+import json
+import os
+from frappe.utils import now_datetime, cint
+
+from .image_processing import get_face_roi, convert_base64_to_cv2
+
+# Captures are kept as small face crops; frames without a detected face are
+# downscaled so their longest edge fits FALLBACK_MAX_EDGE
+CAPTURE_FACE_SIZE = 160
+CAPTURE_FALLBACK_MAX_EDGE = 320
+CAPTURE_QUALITY = 80
+CAPTURE_FOLDER = "attendance_captures"
+
+# Encoded crops wait in this Redis list until the scheduler writes them out
+CAPTURE_BUFFER_KEY = "attendance_capture_buffer"
+CAPTURE_FLUSH_BATCH_SIZE = 500
+# Held for the whole flush so overlapping cron runs never read the same entries
+CAPTURE_FLUSH_LOCK_KEY = "attendance_capture_flush_lock"
+CAPTURE_FLUSH_LOCK_SECONDS = 300
+
+CAPTURE_FORMATS = {
+    "JPEG": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "WebP": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+def encode_capture(frame_or_image, image_format="JPEG"):
+    """Encode the face crop (or a downscaled frame) of a capture, returns (bytes, extension)"""
+    if isinstance(frame_or_image, dict):
+        if frame_or_image.get("face_location"):
+            image = get_face_roi(frame_or_image, CAPTURE_FACE_SIZE)["bgr"]
+        else:
+            image = frame_or_image["image"]
+    else:
+        image = convert_base64_to_cv2(frame_or_image)
+    
+    if image is None:
+        return None, None
+    
+    height, width = image.shape[:2]
+    longest_edge = max(height, width)
+    if longest_edge > CAPTURE_FALLBACK_MAX_EDGE:
+        scale = CAPTURE_FALLBACK_MAX_EDGE / longest_edge
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    
+    extension, quality_flag = CAPTURE_FORMATS.get(image_format, CAPTURE_FORMATS["JPEG"])
+    ok, buffer = cv2.imencode(extension, image, [int(quality_flag), CAPTURE_QUALITY])
+    if not ok:
+        return None, None
+    
+    return buffer.tobytes(), extension
+
+def get_capture_file_url(content_hash, extension, timestamp):
+    """Private, date-sharded URL of a capture; identical content maps to one file per day"""
+    return "/private/files/{0}/{1}/{2}{3}".format(
+        CAPTURE_FOLDER, timestamp.strftime("%Y/%m/%d"), content_hash, extension
+    )
+
+def store_capture(frame_or_image, employee_id, timestamp=None):
+    """Queue a captured face for storage and return the file URL it will be served from.
+    
+    Only the crop is encoded on the request path; writing the file and its
+    File row is left to flush_capture_buffer.
+    """
+    try:
+        timestamp = timestamp or now_datetime()
+        settings = frappe.get_cached_doc("Face Recognition Settings")
+        content, extension = encode_capture(frame_or_image, settings.get("capture_image_format") or "JPEG")
+        if not content:
+            return None
+    
+        content_hash = hashlib.sha1(content).hexdigest()
+        file_url = get_capture_file_url(content_hash, extension, timestamp)
+    
+        frappe.cache().rpush(CAPTURE_BUFFER_KEY, json.dumps({
+            "file_url": file_url,
+            "content_hash": content_hash,
+            "employee_id": employee_id,
+            "content": base64.b64encode(content).decode("utf-8")
+        }))
+    
+        return file_url
+    
+    except Exception as e:
+        frappe.log_error(f"Capture storage error: {str(e)}")
+        return None
+
+def flush_capture_buffer(batch_size=CAPTURE_FLUSH_BATCH_SIZE):
+    """Write buffered captures to disk and create their File rows in bulk (scheduled)"""
+    cache = frappe.cache()
+    lock = cache.lock(cache.make_key(CAPTURE_FLUSH_LOCK_KEY), timeout=CAPTURE_FLUSH_LOCK_SECONDS)
+    if not lock.acquire(blocking=False):
+        # The flush still running from an earlier minute will get to these entries
+        return 0
+    
+    try:
+        return flush_batches(cache, lock, batch_size)
+    finally:
+        lock.release()
+
+def flush_batches(cache, lock, batch_size):
+    flushed = 0
+    while True:
+        # New captures are appended at the tail, so trimming the head we just
+        # read never drops an entry
+        raw_entries = cache.lrange(CAPTURE_BUFFER_KEY, 0, batch_size - 1)
+        if not raw_entries:
+            break
+    
+        entries = {}
+        for raw in raw_entries:
+            try:
+                entry = json.loads(raw)
+                entries[entry["file_url"]] = entry
+            except Exception:
+                continue
+    
+        write_captures(list(entries.values()))
+        cache.ltrim(CAPTURE_BUFFER_KEY, len(raw_entries), -1)
+        flushed += len(raw_entries)
+        lock.reacquire()
+    
+        if len(raw_entries) < batch_size:
+            break
+    
+    return flushed
+
+def write_captures(entries):
+    """Write capture files that are not on disk yet and bulk insert the missing File rows"""
+    if not entries:
+        return
+    
+    existing_urls = set(frappe.get_all(
+        "File",
+        filters={"file_url": ["in", [entry["file_url"] for entry in entries]]},
+        pluck="file_url"
+    ))
+    
+    timestamp = now_datetime()
+    file_rows = []
+    
+    for entry in entries:
+        try:
+            path = frappe.get_site_path(entry["file_url"].lstrip("/"))
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                content = base64.b64decode(entry["content"])
+                with open(path, "wb") as f:
+                    f.write(content)
+    
+            if entry["file_url"] in existing_urls:
+                continue
+    
+            file_rows.append((
+                frappe.generate_hash(length=10),
+                os.path.basename(path),
+                entry["file_url"],
+                1,
+                cint(os.path.getsize(path)),
+                entry["content_hash"],
+                "Home/Attachments",
+                timestamp,
+                timestamp,
+                "Administrator",
+                "Administrator"
+            ))
+    
+        except Exception as e:
+            frappe.log_error(f"Error writing capture {entry.get('file_url')}: {str(e)}")
+    
+    if file_rows:
+        frappe.db.bulk_insert(
+            "File",
+            fields=["name", "file_name", "file_url", "is_private", "file_size", "content_hash",
+                    "folder", "creation", "modified", "owner", "modified_by"],
+            values=file_rows,
+            ignore_duplicates=True
+        )
+        frappe.db.commit()
+
+@frappe.whitelist()
+def get_capture_buffer_status():
+    """Number of captures waiting to be written"""
+    try:
+        return {"success": True, "pending": frappe.cache().llen(CAPTURE_BUFFER_KEY)}
+    except Exception as e:
+        return {"success": False, "message": str(e)}
@@ -11,12 +11,28 @@ from io import BytesIO
 import logging
 import time
 from frappe.utils.file_manager import save_file
+from frappe.utils import now_datetime, cint
+
+from .image_processing import detect_anti_spoofing, ANTI_SPOOFING_TIME_BUDGET_MS
+from .capture_storage import store_capture
+from .attendance_writer import write_punch
+from .attendance_queue import enqueue_attendance_event
+from .attendance_session_state import get_session_state, get_punch_session_state, is_double_tap, record_punch
+from .shift_calendar import resolve_punch_shift, get_shift_for_date
+from .attendance_integrity import stream_attendance_rows, find_integrity_issues
+from .capture_hints import get_capture_hints, begin_recognition, end_recognition
+from .kiosk_status import record_kiosk_recognition
 
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# How long a liveness verdict is trusted for the same kiosk session and employee
+LIVENESS_CACHE_SECONDS = 600
+# Largest frame accepted by the raw upload endpoint
+MAX_UPLOAD_FRAME_BYTES = 2 * 1024 * 1024
+
 
 
 
@@ -179,30 +195,41 @@ def process_face_encoding_on_save(doc, method=None):
         logger.error(f"Error in process_face_encoding_on_save: {str(e)}")
         frappe.throw(f"Error processing face encodings: {str(e)}")
 
-def extract_face_encoding(image_data):
-    """Extract face encoding from image data with enhanced accuracy."""
+def decode_image(image_data):
+    """Decode base64 / data URI / raw bytes into a BGR OpenCV image."""
+    # Handle different image data formats
+    if isinstance(image_data, str):
+        if image_data.startswith('data:image'):
+            # Base64 with data URI
+            image_data = base64.b64decode(image_data.split(',')[1])
+        else:
+            # Try to decode as base64
+            try:
+                image_data = base64.b64decode(image_data)
+            except:
+                # If not base64, treat as file path or raw data
+                pass
+    
+    # Convert to numpy array
+    np_array = np.frombuffer(image_data, np.uint8)
+    return cv2.imdecode(np_array, cv2.IMREAD_COLOR)
+
+def prepare_frame(image_data):
+    """Decode a capture and run face detection and encoding once.
+
+    Returns a frame dict holding the decoded image, the detected face location
+    and its encoding. Later stages (anti-spoofing, capture storage) read the
+    face crop from this dict instead of decoding the capture again.
+    """
     try:
-        # Handle different image data formats
-        if isinstance(image_data, str):
-            if image_data.startswith('data:image'):
-                # Base64 with data URI
-                image_data = base64.b64decode(image_data.split(',')[1])
-            else:
-                # Try to decode as base64
-                try:
-                    image_data = base64.b64decode(image_data)
-                except:
-                    # If not base64, treat as file path or raw data
-                    pass
-        
-        # Convert to numpy array
-        np_array = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(np_array, cv2.IMREAD_COLOR)
+        image = decode_image(image_data)
         
         if image is None:
             logger.error("Could not decode image")
             return None
         
+        frame = {"image": image, "face_location": None, "encoding": None}
+        
         # Convert BGR to RGB
         rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
@@ -222,7 +249,7 @@ def extract_face_encoding(image_data):
         
         if not face_locations:
             logger.warning("No face detected in image")
-            return None
+            return frame
         
         # Get face encodings with enhanced parameters
         face_encodings = face_recognition.face_encodings(
@@ -233,15 +260,22 @@ def extract_face_encoding(image_data):
         )
         
         if face_encodings:
-            return face_encodings[0]
+            frame["face_location"] = face_locations[0]
+            frame["encoding"] = face_encodings[0]
         else:
             logger.warning("Could not generate face encoding")
-            return None
+        
+        return frame
             
     except Exception as e:
         logger.error(f"Error extracting face encoding: {str(e)}")
         return None
 
+def extract_face_encoding(image_data):
+    """Extract face encoding from image data with enhanced accuracy."""
+    frame = prepare_frame(image_data)
+    return frame["encoding"] if frame else None
+
 # def enhance_image_quality(image):
 #     """Enhance image quality for better face recognition."""
 #     try:
@@ -301,164 +335,224 @@ def enhance_image_quality(image):
         return image
 
 @frappe.whitelist()
-def recognize_face_from_camera(captured_image, kiosk_name=None):
+def recognize_face_from_camera(captured_image, kiosk_name=None, session_id=None, frame_id=None):
     """Recognize face from camera capture with enhanced accuracy."""
     try:
         if not captured_image:
             return {"success": False, "message": "No image provided"}
         
-        # Decode captured image
-        captured_face_encoding = extract_face_encoding(captured_image)
-        
-        if captured_face_encoding is None:
-            return {"success": False, "message": "No face detected in captured image. Please ensure your face is clearly visible."}
+        return recognize_frame(prepare_frame(captured_image), kiosk_name, session_id, frame_id)
+            
+    except Exception as e:
+        logger.error(f"Error in recognize_face_from_camera: {str(e)}")
+        return {"success": False, "message": f"System error: {str(e)}"}
+
+@frappe.whitelist(methods=["POST"])
+def recognize_face_from_upload():
+    """Recognize a face from a raw JPEG/PNG request body or a multipart "image" file.
+    
+    Meant for IP cameras and hardware terminals: the frame is decoded straight
+    from the request bytes, without base64 or JSON. The kiosk is identified by
+    the X-Kiosk-ID header; X-Session-ID and X-Frame-ID are optional.
+    """
+    try:
+        kiosk_id = frappe.get_request_header("X-Kiosk-ID")
+        kiosk = frappe.db.get_value("Attendance Kiosk", kiosk_id, ["name", "kiosk_name", "is_active"], as_dict=True) if kiosk_id else None
+        if not kiosk or not kiosk.is_active:
+            return {"success": False, "message": "Unknown or inactive kiosk"}
         
-        # Get all active employees with face encodings
-        employees = frappe.get_all(
-            "Employee Face Recognition",
-            filters={"status": "Active", "encoding_data": ["!=", ""]},
-            fields=["name", "employee_id", "employee_name", "department", "designation", "encoding_data"]
-        )
+        if cint(frappe.request.content_length) > MAX_UPLOAD_FRAME_BYTES:
+            return {"success": False, "message": "Image too large"}
         
-        if not employees:
-            return {"success": False, "message": "No employees registered for face recognition"}
+        upload = frappe.request.files.get("image") if frappe.request.files else None
+        image_bytes = upload.stream.read() if upload else frappe.request.get_data()
+        if not image_bytes:
+            return {"success": False, "message": "No image provided"}
         
-        best_match = None
-        best_distance = float('inf')
-        min_confidence_threshold = 0.4  # Lower is better for face_recognition library
+        return recognize_frame(
+            prepare_frame(image_bytes),
+            kiosk.kiosk_name or kiosk.name,
+            frappe.get_request_header("X-Session-ID"),
+            frappe.get_request_header("X-Frame-ID")
+        )
         
-        for employee in employees:
-            try:
-                if not employee.encoding_data:
-                    continue
-                    
-                stored_encodings = json.loads(employee.encoding_data)
-                
-                for encoding_data in stored_encodings:
-                    if not encoding_data:
-                        continue
-                        
-                    stored_encoding = np.array(encoding_data)
-                    
-                    # Calculate face distance
-                    distance = face_recognition.face_distance([stored_encoding], captured_face_encoding)[0]
-                    
-                    # Check if this is the best match so far
-                    if distance < best_distance and distance < min_confidence_threshold:
-                        best_distance = distance
-                        best_match = employee
-                        
-            except Exception as e:
-                logger.error(f"Error comparing with employee {employee.employee_id}: {str(e)}")
-                continue
+    except Exception as e:
+        logger.error(f"Error in recognize_face_from_upload: {str(e)}")
+        return {"success": False, "message": f"System error: {str(e)}"}
+
+def recognize_frame(frame, kiosk_name=None, session_id=None, frame_id=None):
+    """Match a prepared frame against the gallery and record the attendance.
+    
+    Every response carries capture hints telling the kiosk what frame size,
+    JPEG quality and capture delay to use next.
+    """
+    record_kiosk_recognition(kiosk_name)
+    begin_recognition()
+    try:
+        result = match_frame(frame, kiosk_name, session_id, frame_id)
+    finally:
+        end_recognition()
+    
+    result["hints"] = get_capture_hints(kiosk_name, frame)
+    return result
+
+def match_frame(frame, kiosk_name=None, session_id=None, frame_id=None):
+    captured_face_encoding = frame["encoding"] if frame else None
+    
+    if captured_face_encoding is None:
+        return {"success": False, "message": "No face detected in captured image. Please ensure your face is clearly visible."}
+    
+    # Get all active employees with face encodings
+    employees = get_recognition_gallery()
+    
+    if not employees:
+        return {"success": False, "message": "No employees registered for face recognition"}
+    
+    best_match, best_distance = find_best_match(employees, captured_face_encoding)
+    
+    if best_match:
+        # Reject photos/screens before anything is written
+        liveness = check_liveness(frame, best_match.employee_id, kiosk_name, session_id)
+        if liveness and not liveness["is_live"]:
+            return {
+                "success": False,
+                "message": "Liveness check failed. Please look at the camera directly.",
+                "anti_spoofing": liveness
+            }
         
-        if best_match:
-            # Calculate confidence percentage (convert distance to confidence)
-            confidence = max(0, (1 - best_distance) * 100)
-            
-            # Log attendance
+        # Calculate confidence percentage (convert distance to confidence)
+        confidence = max(0, (1 - best_distance) * 100)
+        
+        # Log attendance, or queue it for the background writer
+        if frappe.get_cached_doc("Face Recognition Settings").enable_async_attendance:
+            attendance_result = enqueue_attendance_event(
+                best_match,
+                confidence,
+                kiosk_name,
+                frame_id=frame_id,
+                capture=frame
+            )
+        else:
             attendance_result = log_attendance(
                 best_match, 
-                captured_image, 
+                None, 
                 confidence, 
-                kiosk_name
+                kiosk_name,
+                frame=frame
             )
+        
+        return {
+            "success": True,
+            "employee": {
+                "employee_id": best_match.employee_id,
+                "employee_name": best_match.employee_name,
+                "department": best_match.department,
+                "designation": best_match.designation
+            },
+            "confidence": round(confidence, 2),
+            "attendance": attendance_result,
+            "message": f"Welcome {best_match.employee_name}!"
+        }
+    else:
+        return {
+            "success": False, 
+            "message": "Face not recognized. Please ensure you are registered in the system."
+        }
+
+def get_recognition_gallery():
+    """Active employees with their stored face encodings"""
+    return frappe.get_all(
+        "Employee Face Recognition",
+        filters={"status": "Active", "encoding_data": ["!=", ""]},
+        fields=["name", "employee_id", "employee_name", "department", "designation", "encoding_data"]
+    )
+
+def find_best_match(employees, captured_face_encoding):
+    """Return the closest employee within the recognition threshold and its face distance"""
+    best_match = None
+    best_distance = float('inf')
+    min_confidence_threshold = 0.4  # Lower is better for face_recognition library
+    
+    for employee in employees:
+        try:
+            if not employee.encoding_data:
+                continue
+                
+            stored_encodings = json.loads(employee.encoding_data)
             
-            return {
-                "success": True,
-                "employee": {
-                    "employee_id": best_match.employee_id,
-                    "employee_name": best_match.employee_name,
-                    "department": best_match.department,
-                    "designation": best_match.designation
-                },
-                "confidence": round(confidence, 2),
-                "attendance": attendance_result,
-                "message": f"Welcome {best_match.employee_name}!"
-            }
-        else:
-            return {
-                "success": False, 
-                "message": "Face not recognized. Please ensure you are registered in the system."
-            }
-            
-    except Exception as e:
-        logger.error(f"Error in recognize_face_from_camera: {str(e)}")
-        return {"success": False, "message": f"System error: {str(e)}"}
+            for encoding_data in stored_encodings:
+                if not encoding_data:
+                    continue
+                    
+                stored_encoding = np.array(encoding_data)
+                
+                # Calculate face distance
+                distance = face_recognition.face_distance([stored_encoding], captured_face_encoding)[0]
+                
+                # Check if this is the best match so far
+                if distance < best_distance and distance < min_confidence_threshold:
+                    best_distance = distance
+                    best_match = employee
+                    
+        except Exception as e:
+            logger.error(f"Error comparing with employee {employee.employee_id}: {str(e)}")
+            continue
+    
+    return best_match, best_distance
 
-def log_attendance(employee, captured_image, confidence, kiosk_name):
+def check_liveness(frame, employee_id, kiosk_name, session_id=None):
+    """Run anti-spoofing on the matched face when enabled in settings.
+
+    Completed verdicts are cached per kiosk session and employee, so the check
+    only runs on the first frame of a session. Returns None when disabled.
+    """
+    settings = frappe.get_cached_doc("Face Recognition Settings")
+    if not settings.enable_anti_spoofing:
+        return None
+    
+    cache_key = f"anti_spoofing:{kiosk_name or 'Unknown'}:{session_id or 'default'}:{employee_id}"
+    cached_verdict = frappe.cache().get_value(cache_key)
+    if cached_verdict:
+        return cached_verdict
+    
+    verdict = detect_anti_spoofing(
+        frame["image"],
+        frame=frame,
+        time_budget_ms=settings.get("anti_spoofing_time_budget_ms") or ANTI_SPOOFING_TIME_BUDGET_MS
+    )
+    
+    # Only remember live verdicts that ran every check within the budget; a
+    # rejected or partial frame is simply checked again on the next capture
+    if verdict.get("complete") and verdict.get("is_live"):
+        frappe.cache().set_value(cache_key, verdict, expires_in_sec=LIVENESS_CACHE_SECONDS)
+    
+    return verdict
+
+def log_attendance(employee, captured_image, confidence, kiosk_name, frame=None):
     """Log attendance for recognized employee."""
     try:
-        current_time = datetime.now()
-        current_date = current_time.date()
+        current_time = now_datetime()
         
-        # Check if there's already an attendance record for today
-        existing_attendance = frappe.get_all(
-            "Employee Attendance",
-            filters={
-                "employee_id": employee.employee_id,
-                "attendance_date": current_date
-            },
-            fields=["name", "check_in_time", "check_out_time", "attendance_type"],
-            order_by="creation desc",
-            limit=1
-        )
+        # Repeated recognitions of someone still standing at the kiosk are not new punches
+        session = get_punch_session_state(employee.employee_id, current_time)
+        if is_double_tap(session, current_time):
+            return {
+                "type": "Duplicate",
+                "time": current_time.strftime("%H:%M:%S"),
+                "date": current_time.strftime("%Y-%m-%d")
+            }
         
-        attendance_type = "Check In"
-        doc_name = None
-        
-        if existing_attendance:
-            last_record = existing_attendance[0]
-            if last_record.check_in_time and not last_record.check_out_time:
-                # Employee has checked in but not checked out
-                attendance_type = "Check Out"
-                doc_name = last_record.name
-        
-        if doc_name:
-            # Update existing record with check out
-            doc = frappe.get_doc("Employee Attendance", doc_name)
-            doc.check_out_time = current_time
-            doc.attendance_type = "Check Out"
-            
-            # Calculate total hours
-            if doc.check_in_time:
-                time_diff = current_time - doc.check_in_time
-                doc.total_hours = round(time_diff.total_seconds() / 3600, 2)
-            
-            doc.save(ignore_permissions=True)
-        else:
-            # Create new attendance record
-            doc = frappe.new_doc("Employee Attendance")
-            doc.employee_id = employee.employee_id
-            doc.employee_name = employee.employee_name
-            doc.department = employee.department
-            doc.attendance_date = current_date
-            doc.check_in_time = current_time
-            doc.attendance_type = "Check In"
-            doc.kiosk_location = kiosk_name or "Unknown"
-            doc.confidence_score = confidence
-            doc.verification_status = "Verified"
-            doc.created_by_system = 1
-            
-            # Save captured image
-            if captured_image:
-                try:
-                    # Save the captured image as attachment
-                    file_doc = save_captured_image(captured_image, employee.employee_id, current_time)
-                    if file_doc:
-                        doc.face_image_captured = file_doc.file_url
-                except Exception as e:
-                    logger.error(f"Error saving captured image: {str(e)}")
-            
-            doc.save(ignore_permissions=True)
-            doc.submit()
+        # Keep a compact face crop; the file itself is written off the request path
+        capture_url = None
+        if frame or captured_image:
+            capture_url = store_capture(frame or captured_image, employee.employee_id, current_time)
         
-        frappe.db.commit()
+        result = write_punch(employee, current_time, kiosk_name, confidence, capture_url)
         
         return {
-            "type": attendance_type,
-            "time": current_time.strftime("%H:%M:%S"),
-            "date": current_date.strftime("%Y-%m-%d")
+            "type": result["type"],
+            "time": result["time"],
+            "date": result["date"]
         }
         
     except Exception as e:
@@ -466,33 +560,6 @@ def log_attendance(employee, captured_image, confidence, kiosk_name):
         frappe.db.rollback()
         return {"error": str(e)}
 
-def save_captured_image(image_data, employee_id, timestamp):
-    """Save captured image as file attachment."""
-    try:
-        # Decode base64 image
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
-        
-        # Generate filename
-        filename = f"attendance_{employee_id}_{timestamp.strftime('%Y%m%d_%H%M%S')}.png"
-        
-        # Create file doc
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": filename,
-            "content": image_bytes,
-            "is_private": 1
-        })
-        file_doc.save(ignore_permissions=True)
-        
-        return file_doc
-        
-    except Exception as e:
-        logger.error(f"Error saving captured image: {str(e)}")
-        return None
-
 @frappe.whitelist()
 def get_attendance_stats(employee_id=None):
     """Get attendance statistics."""
@@ -584,22 +651,14 @@ def enhanced_log_attendance(employee, captured_image, confidence, kiosk_name):
         current_time = datetime.now()
         current_date = current_time.date()
         
-        # Get ALL attendance records for today (not just latest)
-        existing_attendance = frappe.get_all(
-            "Employee Attendance",
-            filters={
-                "employee_id": employee.employee_id,
-                "attendance_date": current_date
-            },
-            fields=["name", "check_in_time", "check_out_time", "attendance_type", "creation"],
-            order_by="check_in_time desc"  # Order by actual check-in time
-        )
+        # Today's open session and last punch, served from cache in the common case
+        session = get_session_state(employee.employee_id, current_date)
         
         # IMPROVED LOGIC: Determine check-in vs check-out based on pattern
-        attendance_type = determine_attendance_type(existing_attendance, current_time)
+        attendance_type = determine_attendance_type(session, current_time)
         
         # IMPROVEMENT: Minimum time gap between check-ins (prevent accidental double-taps)
-        if not validate_minimum_time_gap(existing_attendance, current_time):
+        if not validate_minimum_time_gap(session, current_time):
             return {
                 "success": False,
                 "message": "Please wait at least 5 minutes between check-ins"
@@ -608,14 +667,16 @@ def enhanced_log_attendance(employee, captured_image, confidence, kiosk_name):
         # IMPROVEMENT: Handle break times
         if attendance_type == "Check Out":
             # Update the latest incomplete record
-            incomplete_record = get_incomplete_attendance_record(existing_attendance)
+            incomplete_record = get_incomplete_attendance_record(session)
             if incomplete_record:
                 update_checkout_record(incomplete_record, current_time, captured_image, confidence)
+                record_punch(employee.employee_id, attendance_type, incomplete_record.name, current_time, kiosk_name)
             else:
                 return {"success": False, "message": "No active check-in found"}
                 
         else:  # Check In
-            create_checkin_record(employee, current_time, captured_image, confidence, kiosk_name)
+            doc = create_checkin_record(employee, current_time, captured_image, confidence, kiosk_name)
+            record_punch(employee.employee_id, attendance_type, doc.name, current_time, kiosk_name)
             
         # IMPROVEMENT: Send contextual notifications
         # send_smart_notification(employee, attendance_type, current_time, existing_attendance)
@@ -631,49 +692,24 @@ def enhanced_log_attendance(employee, captured_image, confidence, kiosk_name):
         frappe.log_error(f"Enhanced attendance logging error: {str(e)}")
         return {"success": False, "message": str(e)}
 
-def determine_attendance_type(existing_records, current_time):
+def determine_attendance_type(session, current_time):
     """Smarter logic to determine if this should be check-in or check-out"""
     
-    if not existing_records:
-        return "Check In"  # First entry of the day
-    
-    # Find the most recent incomplete record
-    for record in existing_records:
-        if record.check_in_time and not record.check_out_time:
-            # There's an active check-in without check-out
-            return "Check Out"
+    # An active check-in without check-out means this punch closes it;
+    # otherwise it is the first entry of the day or a return from break/lunch
+    if session["open_record"]:
+        return "Check Out"
     
-    # All records are complete (have both check-in and check-out)
-    # This could be returning from break/lunch
     return "Check In"
 
-def validate_minimum_time_gap(existing_records, current_time, min_gap_minutes=5):
+def validate_minimum_time_gap(session, current_time, min_gap_minutes=5):
     """Prevent accidental double-taps by enforcing minimum time gap"""
-    
-    if not existing_records:
-        return True
-    
-    latest_record = existing_records[0]
-    
-    # Check against latest check-in time
-    if latest_record.check_in_time:
-        time_diff = current_time - latest_record.check_in_time
-        if time_diff.total_seconds() < (min_gap_minutes * 60):
-            return False
-    
-    # Check against latest check-out time if exists
-    if latest_record.check_out_time:
-        time_diff = current_time - latest_record.check_out_time
-        if time_diff.total_seconds() < (min_gap_minutes * 60):
-            return False
-    
-    return True
+    return not is_double_tap(session, current_time, min_gap_minutes)
 
-def get_incomplete_attendance_record(existing_records):
+def get_incomplete_attendance_record(session):
     """Find the most recent attendance record without check-out"""
-    for record in existing_records:
-        if record.check_in_time and not record.check_out_time:
-            return frappe.get_doc("Employee Attendance", record.name)
+    if session["open_record"]:
+        return frappe.get_doc("Employee Attendance", session["open_record"])
     return None
 
 def update_checkout_record(doc, current_time, captured_image, confidence):
@@ -688,7 +724,7 @@ def update_checkout_record(doc, current_time, captured_image, confidence):
     
     # Add check-out image if needed
     if captured_image:
-        doc.face_image_captured = captured_image
+        doc.face_image_captured = store_capture(captured_image, doc.employee_id, current_time)
     
     doc.confidence_score = confidence
     doc.save(ignore_permissions=True)
@@ -708,9 +744,10 @@ def create_checkin_record(employee, current_time, captured_image, confidence, ki
     doc.created_by_system = 1
     
     if captured_image:
-        doc.face_image_captured = captured_image
+        doc.face_image_captured = store_capture(captured_image, employee.employee_id, current_time)
     
     doc.insert(ignore_permissions=True)
+    return doc
 
 def send_smart_notification(employee, attendance_type, current_time, existing_records):
     """Send contextual notifications based on attendance patterns"""
@@ -731,20 +768,10 @@ def send_smart_notification(employee, attendance_type, current_time, existing_re
 def validate_location_consistency(employee_id, current_location, current_date):
     """Ensure employee isn't checking in from multiple locations simultaneously"""
     
-    active_checkins = frappe.get_all(
-        "Employee Attendance",
-        filters={
-            "employee_id": employee_id,
-            "attendance_date": current_date,
-            "check_in_time": ["is", "set"],
-            "check_out_time": ["is", "not set"]
-        },
-        fields=["kiosk_location", "check_in_time"]
-    )
+    session = get_session_state(employee_id, current_date)
     
-    for checkin in active_checkins:
-        if checkin.kiosk_location != current_location:
-            return False, f"You are still checked in at {checkin.kiosk_location}"
+    if session["open_record"] and session["open_kiosk"] != current_location:
+        return False, f"You are still checked in at {session['open_kiosk']}"
     
     return True, "Location validation passed"
 
@@ -770,53 +797,20 @@ def detect_break_patterns(existing_records, current_time):
     return False
 
 # ISSUE 4: Overnight Shift Handling
-def handle_overnight_shifts(employee, current_time, existing_records):
+def handle_overnight_shifts(employee, current_time, existing_records=None):
     """Handle employees working overnight shifts"""
     
-    # Check if employee has overnight shift pattern
-    shift_settings = get_employee_shift_settings(employee.employee_id)
-    
-    if shift_settings and shift_settings.is_overnight_shift:
-        # For overnight shifts, attendance date should be the shift start date
-        # not the current date
-        return calculate_overnight_attendance_date(current_time, shift_settings)
-    
-    return current_time.date()
+    # The shift calendar assigns punches after midnight to the shift that
+    # started the evening before
+    return resolve_punch_shift(employee.employee_id, current_time).attendance_date
 
-def get_employee_shift_settings(employee_id):
+def get_employee_shift_settings(employee_id, attendance_date=None):
     """Get employee's shift configuration"""
-    # This would integrate with ERPNext's Shift Management
-    return frappe.get_value("Employee", employee_id, 
-                          ["shift_type", "default_shift"], as_dict=True)
+    return get_shift_for_date(employee_id, attendance_date or now_datetime().date())
 
 # ISSUE 5: Data Integrity Checks
 def validate_attendance_data_integrity(employee_id, attendance_date):
     """Ensure attendance data is consistent"""
     
-    records = frappe.get_all(
-        "Employee Attendance",
-        filters={
-            "employee_id": employee_id,
-            "attendance_date": attendance_date
-        },
-        fields=["check_in_time", "check_out_time", "total_hours"],
-        order_by="check_in_time"
-    )
-    
-    issues = []
-    
-    for i, record in enumerate(records):
-        # Check for overlapping times
-        if i > 0:
-            prev_record = records[i-1]
-            if (prev_record.check_out_time and record.check_in_time and 
-                record.check_in_time < prev_record.check_out_time):
-                issues.append(f"Overlapping attendance times detected")
-        
-        # Validate total hours calculation
-        if record.check_in_time and record.check_out_time:
-            calculated_hours = (record.check_out_time - record.check_in_time).total_seconds() / 3600
-            if abs(calculated_hours - (record.total_hours or 0)) > 0.1:
-                issues.append(f"Total hours mismatch in record")
-    
-    return issues
+    rows = stream_attendance_rows(attendance_date, attendance_date, employee_id)
+    return [issue["message"] for issue in find_integrity_issues(rows)]
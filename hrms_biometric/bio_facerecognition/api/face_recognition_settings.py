@@ -20,8 +20,11 @@ def get_face_recognition_settings():
                 "max_face_images": settings.max_face_images,
                 "image_quality_threshold": settings.image_quality_threshold,
                 "auto_cleanup_days": settings.auto_cleanup_days,
+                "capture_image_format": settings.capture_image_format,
+                "enable_async_attendance": settings.enable_async_attendance,
                 "enable_face_enhancement": settings.enable_face_enhancement,
                 "enable_anti_spoofing": settings.enable_anti_spoofing,
+                "anti_spoofing_time_budget_ms": settings.anti_spoofing_time_budget_ms,
                 "working_hours_start": settings.working_hours_start,
                 "working_hours_end": settings.working_hours_end,
                 "default_hourly_rate": settings.default_hourly_rate,
@@ -0,0 +1,164 @@
+# hrms_biometric/bio_facerecognition/api/gallery_snapshot.py
+
+import frappe
+import json
+import os
+import numpy as np
+from datetime import datetime, timedelta
+from frappe.utils import get_datetime
+
+from hrms_biometric.edge.gallery_sync import ENCODING_SIZE, gallery_checksum, pack, unpack
+
+# Built snapshots are kept on disk per version; only the newest few are retained
+SNAPSHOT_FOLDER = "gallery_snapshots"
+SNAPSHOTS_TO_KEEP = 3
+VERSION_EPOCH = datetime(1970, 1, 1)
+
+def to_version(timestamp):
+    """Versions are the latest change timestamp as microseconds since 1970, which fits an int64"""
+    if not timestamp:
+        return 0
+    delta = get_datetime(timestamp) - VERSION_EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def from_version(version):
+    return VERSION_EPOCH + timedelta(microseconds=int(version)) if version else None
+
+def get_current_version():
+    """Latest change to the gallery: an edited, added or deleted Employee Face Recognition"""
+    last_modified = frappe.db.sql("SELECT MAX(modified) FROM `tabEmployee Face Recognition`")[0][0]
+    last_deleted = frappe.db.sql("""
+        SELECT MAX(creation) FROM `tabDeleted Document`
+        WHERE deleted_doctype = 'Employee Face Recognition'
+    """)[0][0]
+    return max(to_version(last_modified), to_version(last_deleted))
+
+def build_gallery_arrays(rows):
+    """Employee index, names, float32 encoding matrix and row owners from gallery rows"""
+    employee_ids, employee_names, encodings, owners = [], [], [], []
+    
+    for row in rows:
+        try:
+            row_encodings = [encoding for encoding in json.loads(row.encoding_data) if encoding]
+        except Exception:
+            continue
+        if not row_encodings:
+            continue
+        
+        owners.extend([len(employee_ids)] * len(row_encodings))
+        encodings.extend(row_encodings)
+        employee_ids.append(row.employee_id)
+        employee_names.append(row.employee_name or "")
+    
+    return {
+        "employee_ids": np.array(employee_ids, dtype=str),
+        "employee_names": np.array(employee_names, dtype=str),
+        "encodings": np.array(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE),
+        "owners": np.array(owners, dtype=np.int32)
+    }
+
+def get_gallery_rows():
+    return frappe.get_all(
+        "Employee Face Recognition",
+        filters={"status": "Active", "encoding_data": ["!=", ""]},
+        fields=["employee_id", "employee_name", "encoding_data"]
+    )
+
+def build_snapshot(version):
+    gallery = build_gallery_arrays(get_gallery_rows())
+    gallery["version"] = version
+    return pack(dict(gallery, version=np.int64(version), checksum=np.array(gallery_checksum(gallery))))
+
+def get_snapshot(version):
+    """Compressed snapshot of the given (current) version, built once and kept on disk"""
+    folder = frappe.get_site_path("private", SNAPSHOT_FOLDER)
+    path = os.path.join(folder, f"{version}.npz")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    
+    content = build_snapshot(version)
+    os.makedirs(folder, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+    
+    for old_file in sorted(os.listdir(folder))[:-SNAPSHOTS_TO_KEEP]:
+        os.remove(os.path.join(folder, old_file))
+    
+    return content
+
+def build_delta(since_version, version):
+    """Employees changed or removed after since_version, plus the checksum of the result"""
+    since = from_version(since_version)
+    changed = frappe.get_all(
+        "Employee Face Recognition",
+        filters={"modified": [">", since]} if since else {},
+        fields=["employee_id", "employee_name", "encoding_data", "status"]
+    )
+    deleted = frappe.get_all(
+        "Deleted Document",
+        filters={"deleted_doctype": "Employee Face Recognition", "creation": [">", since]} if since else
+                {"deleted_doctype": "Employee Face Recognition"},
+        pluck="deleted_name"
+    )
+    
+    upserts = build_gallery_arrays([row for row in changed if row.status == "Active" and row.encoding_data])
+    upserted = set(upserts["employee_ids"].tolist())
+    removed = sorted({row.employee_id for row in changed if row.employee_id not in upserted} | set(deleted))
+    
+    # The snapshot's checksum lets the edge node confirm it now matches the full gallery
+    checksum = unpack(get_snapshot(version))["checksum"]
+    return pack(dict(
+        upserts,
+        base_version=np.int64(since_version),
+        version=np.int64(version),
+        removed=np.array(removed, dtype=str),
+        checksum=checksum
+    ))
+
+def send_file(filename, content):
+    frappe.local.response.filename = filename
+    frappe.local.response.filecontent = content
+    frappe.local.response.type = "download"
+
+@frappe.whitelist()
+def get_gallery_version():
+    """Current gallery version and size, for edge nodes deciding whether to sync"""
+    frappe.only_for(("System Manager", "HR Manager"))
+    version = get_current_version()
+    return {
+        "version": version,
+        "employees": frappe.db.count("Employee Face Recognition", {"status": "Active", "encoding_data": ["!=", ""]})
+    }
+
+@frappe.whitelist()
+def download_gallery_snapshot():
+    """Full gallery as a compressed npz: float32 encodings, their owners and the employee index"""
+    frappe.only_for(("System Manager", "HR Manager"))
+    version = get_current_version()
+    send_file(f"gallery_{version}.npz", get_snapshot(version))
+
+@frappe.whitelist()
+def download_gallery_delta(since_version):
+    """Only the employees changed since an edge node's version"""
+    frappe.only_for(("System Manager", "HR Manager"))
+    since_version = int(since_version or 0)
+    version = get_current_version()
+    
+    if since_version >= version:
+        # Already current: an empty delta that keeps the edge node's version
+        content = pack({
+            "employee_ids": np.array([], dtype=str),
+            "employee_names": np.array([], dtype=str),
+            "encodings": np.zeros((0, ENCODING_SIZE), dtype=np.float32),
+            "owners": np.zeros(0, dtype=np.int32),
+            "base_version": np.int64(since_version),
+            "version": np.int64(since_version),
+            "removed": np.array([], dtype=str),
+            "checksum": np.array("")
+        })
+    else:
+        content = build_delta(since_version, version)
+    
+    send_file(f"gallery_{since_version}_{version}.npz", content)
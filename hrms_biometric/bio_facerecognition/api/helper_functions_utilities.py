@@ -6,6 +6,7 @@ This file serves as the central hub for all utility functions.
 """
 
 import frappe
+import os
 from frappe import _
 from datetime import datetime, timedelta
 
@@ -224,61 +225,9 @@ def export_data_to_format(data, format_type, filename=None):
 def export_to_excel_helper(data, filename=None):
     """Export data to Excel format with formatting"""
     try:
-        import xlsxwriter
-        import io
-        
-        if not data:
-            return {"success": False, "message": "No data to export"}
-        
-        output = io.BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-        worksheet = workbook.add_worksheet("Data")
-        
-        # Create formats
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#4F81BD',
-            'font_color': 'white',
-            'border': 1
-        })
-        
-        data_format = workbook.add_format({'border': 1})
-        
-        # Write headers
-        if data:
-            headers = list(data[0].keys())
-            for col, header in enumerate(headers):
-                worksheet.write(0, col, header, header_format)
-            
-            # Write data
-            for row_num, record in enumerate(data, 1):
-                for col, header in enumerate(headers):
-                    value = record.get(header, "")
-                    if isinstance(value, datetime):
-                        value = value.strftime("%Y-%m-%d %H:%M:%S")
-                    worksheet.write(row_num, col, value, data_format)
-        
-        workbook.close()
-        output.seek(0)
-        
-        # Save as file
-        if not filename:
-            filename = get_unique_filename("export", "xlsx")
-        
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": filename,
-            "content": output.getvalue(),
-            "is_private": 1
-        })
-        file_doc.insert(ignore_permissions=True)
-        
-        return {
-            "success": True,
-            "file_url": file_doc.file_url,
-            "filename": filename,
-            "records_exported": len(data)
-        }
+        # Written in xlsxwriter's constant_memory mode, one row at a time
+        from .streaming_export import export_rows
+        return export_rows(data, "xlsx", filename)
         
     except Exception as e:
         return {"success": False, "message": str(e)}
@@ -287,67 +236,54 @@ def export_to_pdf_helper(data, filename=None):
     """Export data to PDF format"""
     try:
         from reportlab.lib import colors
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-        from reportlab.lib.styles import getSampleStyleSheet
-        import io
+        from reportlab.lib.pagesizes import A4
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+        from .streaming_export import (
+            peek_columns, format_value, get_export_stem, get_export_path, register_export_file
+        )
         
-        if not data:
+        headers, rows = peek_columns(data)
+        if not headers:
             return {"success": False, "message": "No data to export"}
         
-        output = io.BytesIO()
-        doc = SimpleDocTemplate(output, pagesize=A4)
-        
-        # Prepare data for table
-        if data:
-            headers = list(data[0].keys())
-            table_data = [headers]
-            
-            for record in data:
-                row = []
-                for header in headers:
-                    value = record.get(header, "")
-                    if isinstance(value, datetime):
-                        value = value.strftime("%Y-%m-%d %H:%M:%S")
-                    row.append(str(value))
-                table_data.append(row)
-            
-            # Create table
-            table = Table(table_data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 14),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            # Build PDF
-            elements = [table]
-            doc.build(elements)
-        
-        output.seek(0)
-        
-        # Save as file
-        if not filename:
-            filename = get_unique_filename("export", "pdf")
-        
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": filename,
-            "content": output.getvalue(),
-            "is_private": 1
-        })
-        file_doc.insert(ignore_permissions=True)
+        filename = get_unique_filename(get_export_stem(filename), "pdf")
+        path = get_export_path(filename)
+        
+        style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 14),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+        
+        # Tables of a few hundred rows lay out far cheaper than one huge table,
+        # and the document is built straight into the private file
+        elements, table_data, count = [], [headers], 0
+        for record in rows:
+            table_data.append([str(format_value(record.get(header))) for header in headers])
+            count += 1
+            if len(table_data) > 500:
+                elements.append(Table(table_data, repeatRows=1, style=style))
+                table_data = [headers]
+        if len(table_data) > 1:
+            elements.append(Table(table_data, repeatRows=1, style=style))
+        
+        try:
+            SimpleDocTemplate(path, pagesize=A4).build(elements)
+            file_doc = register_export_file(filename, path)
+        except Exception:
+            os.remove(path)
+            raise
         
         return {
             "success": True,
             "file_url": file_doc.file_url,
             "filename": filename,
-            "records_exported": len(data)
+            "records_exported": count
         }
         
     except Exception as e:
@@ -0,0 +1,135 @@
+# hrms_biometric/bio_facerecognition/api/kiosk_status.py
+
+import frappe
+import json
+from functools import partial
+from frappe.utils import now_datetime, today, cint, get_datetime
+
+# Live per-kiosk state, keyed by the kiosk label stored in kiosk_location
+KIOSK_ACTIVITY_KEY = "kiosk_last_activity"
+KIOSK_HEARTBEAT_KEY = "kiosk_heartbeat"
+# Daily counters are plain Redis integers: kiosk_punches:<date>:<kiosk>
+PUNCH_COUNTER_PREFIX = "kiosk_punches"
+RECOGNITION_COUNTER_PREFIX = "kiosk_recognitions"
+COUNTER_TTL_SECONDS = 2 * 24 * 3600
+
+# Kiosk apps send a heartbeat every minute; three missed ones mean offline
+HEARTBEAT_INTERVAL_SECONDS = 60
+OFFLINE_AFTER_SECONDS = 3 * HEARTBEAT_INTERVAL_SECONDS
+# A kiosk with a recognition this recent is busy rather than idle
+ACTIVE_WINDOW_SECONDS = 15 * 60
+
+def get_counter_key(prefix, kiosk_label, date):
+    return frappe.cache().make_key(f"{prefix}:{date}:{kiosk_label}")
+
+def increment_counter(prefix, kiosk_label, date):
+    cache = frappe.cache()
+    key = get_counter_key(prefix, kiosk_label, date)
+    cache.incr(key)
+    cache.expire(key, COUNTER_TTL_SECONDS)
+
+def record_kiosk_recognition(kiosk_label):
+    """Count a recognition attempt and mark the kiosk as active"""
+    increment_counter(RECOGNITION_COUNTER_PREFIX, kiosk_label or "Unknown", today())
+    frappe.cache().hset(KIOSK_ACTIVITY_KEY, kiosk_label or "Unknown", now_datetime())
+
+def record_kiosk_punch(kiosk_label, punch_time):
+    """Count a written punch for its day once the transaction commits"""
+    frappe.db.after_commit.add(partial(
+        increment_counter, PUNCH_COUNTER_PREFIX, kiosk_label or "Unknown", str(punch_time.date())
+    ))
+
+def record_heartbeat(kiosk_label, status=None):
+    """Remember the latest heartbeat and what the kiosk app reported with it"""
+    status = status or {}
+    frappe.cache().hset(KIOSK_HEARTBEAT_KEY, kiosk_label, {
+        "at": now_datetime(),
+        "pending_events": cint(status.get("pending_events")),
+        "camera_active": bool(status.get("camera_active")),
+        "client": {key: status.get(key) for key in ("app_version", "user_agent") if status.get(key)}
+    })
+
+def get_live_hash(key):
+    """Kiosk label -> value of a live hash; hgetall leaves the labels as bytes"""
+    return {frappe.safe_decode(label): value for label, value in (frappe.cache().hgetall(key) or {}).items()}
+
+def get_kiosk_live_status(kiosk_labels):
+    """Today's counters, last activity, last heartbeat and status of each kiosk.
+    
+    Three Redis round trips regardless of the number of kiosks.
+    """
+    cache = frappe.cache()
+    date = today()
+    now = now_datetime()
+    
+    counter_keys = [get_counter_key(PUNCH_COUNTER_PREFIX, label, date) for label in kiosk_labels]
+    counter_keys += [get_counter_key(RECOGNITION_COUNTER_PREFIX, label, date) for label in kiosk_labels]
+    counters = cache.mget(counter_keys) if counter_keys else []
+    activity = get_live_hash(KIOSK_ACTIVITY_KEY)
+    heartbeats = get_live_hash(KIOSK_HEARTBEAT_KEY)
+    
+    live = {}
+    for index, label in enumerate(kiosk_labels):
+        heartbeat = heartbeats.get(label) or {}
+        last_activity = activity.get(label)
+        live[label] = {
+            "today_attendance_count": cint(counters[index]),
+            "today_recognition_count": cint(counters[len(kiosk_labels) + index]),
+            "last_activity": last_activity,
+            "last_heartbeat": heartbeat.get("at"),
+            "pending_events": heartbeat.get("pending_events", 0),
+            "camera_active": heartbeat.get("camera_active"),
+            "status": get_kiosk_state(last_activity, heartbeat.get("at"), now)
+        }
+    
+    return live
+
+def get_kiosk_state(last_activity, last_heartbeat, now):
+    # Kiosks without the app (e.g. the embedded desk kiosk) never send heartbeats
+    if last_heartbeat and (now - get_datetime(last_heartbeat)).total_seconds() > OFFLINE_AFTER_SECONDS:
+        return "offline"
+    if last_activity and (now - get_datetime(last_activity)).total_seconds() <= ACTIVE_WINDOW_SECONDS:
+        return "active"
+    return "idle"
+
+def flush_kiosk_status():
+    """Snapshot the live state of every active kiosk into Kiosk Heartbeat Log (hourly)"""
+    kiosks = frappe.get_all("Attendance Kiosk", filters={"is_active": 1}, fields=["name", "kiosk_name"])
+    if not kiosks:
+        return
+    
+    labels = [kiosk.kiosk_name or kiosk.name for kiosk in kiosks]
+    live = get_kiosk_live_status(labels)
+    heartbeats = get_live_hash(KIOSK_HEARTBEAT_KEY)
+    timestamp = now_datetime()
+    
+    rows = []
+    for kiosk, label in zip(kiosks, labels):
+        status = live[label]
+        client = (heartbeats.get(label) or {}).get("client")
+        rows.append((
+            frappe.generate_hash(length=10),
+            kiosk.name,
+            label,
+            status["status"].title(),
+            timestamp,
+            status["last_heartbeat"],
+            status["last_activity"],
+            status["today_attendance_count"],
+            status["today_recognition_count"],
+            status["pending_events"],
+            json.dumps(client) if client else None,
+            timestamp,
+            timestamp,
+            "Administrator",
+            "Administrator"
+        ))
+    
+    frappe.db.bulk_insert(
+        "Kiosk Heartbeat Log",
+        fields=["name", "kiosk", "kiosk_name", "status", "log_time", "last_heartbeat", "last_activity",
+                "punches_today", "recognitions_today", "pending_events", "client_info",
+                "creation", "modified", "owner", "modified_by"],
+        values=rows
+    )
+    frappe.db.commit()
@@ -0,0 +1,103 @@
+# hrms_biometric/bio_facerecognition/api/kiosk_stream.py
+
+import frappe
+import json
+import time
+
+from .enhanced_face_recognition import prepare_frame, recognize_frame
+
+# Key layout shared with realtime/handlers.js: the socket server parks the
+# newest frame of every stream in a hash and pushes the stream id onto the
+# ready list when the stream was not already waiting there
+KEY_PREFIX = "kiosk_frames"
+# A waiting frame older than this is no longer worth recognising
+MAX_FRAME_AGE_MS = 5000
+
+FRAME_WORKERS = 2
+FRAME_WORKER_JOB_ID = "kiosk_frame_worker"
+# Workers give their RQ slot back after this long, or sooner once the kiosks go quiet
+FRAME_WORKER_MAX_SECONDS = 600
+FRAME_WORKER_IDLE_SECONDS = 60
+FRAME_WAIT_SECONDS = 5
+
+def get_key(*parts):
+    # Site-scoped rather than make_key'd, the socket server does not know the db name
+    return "|".join([KEY_PREFIX, frappe.local.site, *parts])
+
+def get_room(stream_id):
+    return f"kiosk_stream:{stream_id}"
+
+@frappe.whitelist()
+def start_frame_workers():
+    """Called by a kiosk before it streams, so its first frames do not wait for the cron"""
+    schedule_frame_workers(force=True)
+    return {"success": True}
+
+def schedule_frame_workers(force=False):
+    """Keep the frame workers running while kiosks stream; the per-minute cron calls this"""
+    if not force and not frappe.cache().get(get_key("active")):
+        return
+
+    for index in range(FRAME_WORKERS):
+        frappe.enqueue(
+            "hrms_biometric.bio_facerecognition.api.kiosk_stream.serve_kiosk_frames",
+            queue="long",
+            timeout=FRAME_WORKER_MAX_SECONDS + 120,
+            job_id=f"{FRAME_WORKER_JOB_ID}_{index}",
+            deduplicate=True
+        )
+
+def serve_kiosk_frames():
+    """Recognise streamed frames as the socket server parks them (background job)"""
+    cache = frappe.cache()
+    started = last_frame = time.monotonic()
+
+    while time.monotonic() - started < FRAME_WORKER_MAX_SECONDS:
+        popped = cache.blpop(get_key("ready"), timeout=FRAME_WAIT_SECONDS)
+        if not popped:
+            if time.monotonic() - last_frame > FRAME_WORKER_IDLE_SECONDS:
+                break
+            continue
+
+        last_frame = time.monotonic()
+        serve_frame(cache, frappe.safe_decode(popped[1]))
+
+def serve_frame(cache, stream_id):
+    """Take the waiting frame of a stream and send its result to the kiosk's socket"""
+    frame_key = get_key("frame", stream_id)
+
+    # Taking the frame is atomic with the socket server replacing it, so a
+    # frame is either recognised here or reported dropped there, never both
+    pipeline = cache.pipeline()
+    pipeline.hmget(frame_key, ["meta", "image"])
+    pipeline.delete(frame_key)
+    (meta, image), _ = pipeline.execute()
+
+    if not meta or not image:
+        # Expired, or the kiosk stopped streaming
+        return
+
+    meta = json.loads(meta)
+    room = get_room(stream_id)
+    if time.time() * 1000 - meta["received_at"] > MAX_FRAME_AGE_MS:
+        frappe.publish_realtime("kiosk_frame_dropped", {"frame_id": meta.get("frame_id")}, room=room)
+        return
+
+    user = frappe.session.user
+    try:
+        # Attendance is recorded as the user signed in on the kiosk
+        frappe.set_user(meta["user"])
+        result = recognize_frame(
+            prepare_frame(image), meta.get("kiosk_name"), meta.get("session_id"), meta.get("frame_id")
+        )
+        frappe.db.commit()
+
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Kiosk frame {meta.get('frame_id')} error: {str(e)}")
+        result = {"success": False, "message": "Recognition failed"}
+
+    finally:
+        frappe.set_user(user)
+
+    frappe.publish_realtime("kiosk_frame_result", {"frame_id": meta.get("frame_id"), "result": result}, room=room)
@@ -3,6 +3,8 @@ import json
 from datetime import datetime, timedelta
 from frappe import _
 
+from .kiosk_status import get_kiosk_live_status
+
 # Multi-Location Kiosk Management
 @frappe.whitelist()
 def get_all_kiosk_locations():
@@ -18,30 +20,10 @@ def get_all_kiosk_locations():
             order_by="kiosk_name"
         )
         
-        # Add real-time status for each kiosk
+        # Live counters and status are kept in Redis by the recognition path
+        live_status = get_kiosk_live_status([kiosk.kiosk_name or kiosk.name for kiosk in kiosks])
         for kiosk in kiosks:
-            # Get today's attendance count for this kiosk
-            today_count = frappe.db.count(
-                "Employee Attendance",
-                filters={
-                    "kiosk_location": kiosk.kiosk_name,
-                    "attendance_date": datetime.now().date()
-                }
-            )
-            
-            # Get last activity timestamp
-            last_activity = frappe.db.sql("""
-                SELECT MAX(creation) as last_activity
-                FROM `tabEmployee Attendance`
-                WHERE kiosk_location = %s
-                AND DATE(creation) = CURDATE()
-            """, (kiosk.kiosk_name,), as_dict=True)
-            
-            kiosk.update({
-                "today_attendance_count": today_count,
-                "last_activity": last_activity[0].get("last_activity") if last_activity[0].get("last_activity") else None,
-                "status": "active" if last_activity[0].get("last_activity") else "idle"
-            })
+            kiosk.update(live_status[kiosk.kiosk_name or kiosk.name])
         
         return {
             "success": True,
@@ -153,13 +135,13 @@ def get_location_analytics():
             # Peak hours
             peak_hours = frappe.db.sql("""
                 SELECT 
-                    HOUR(check_in_time) as hour,
+                    check_in_hour as hour,
                     COUNT(*) as count
                 FROM `tabEmployee Attendance`
                 WHERE kiosk_location = %s
                 AND attendance_date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-                AND check_in_time IS NOT NULL
-                GROUP BY HOUR(check_in_time)
+                AND check_in_hour IS NOT NULL
+                GROUP BY check_in_hour
                 ORDER BY count DESC
                 LIMIT 5
             """, (location,), as_dict=True)
@@ -0,0 +1,212 @@
+# hrms_biometric/bio_facerecognition/api/offline_sync.py
+
+import frappe
+import hashlib
+import hmac
+import json
+from datetime import timedelta
+from frappe.utils import get_datetime, now_datetime, convert_utc_to_system_timezone
+from frappe.utils.password import get_decrypted_password
+
+from .enhanced_face_recognition import prepare_frame, get_recognition_gallery, find_best_match, check_liveness
+from .capture_storage import store_capture
+from .attendance_writer import write_punch
+from .attendance_queue import (
+    get_event_id, claim_event, release_event, push_attendance_event, is_punch_written, MAX_OFFLINE_DAYS
+)
+from .attendance_session_state import get_punch_session_state, is_double_tap, is_out_of_order
+from .capture_hints import get_capture_hints, observe_face_size
+from .kiosk_status import record_kiosk_recognition, record_heartbeat
+
+# The kiosk app uploads at most this many buffered captures per request
+MAX_EVENTS_PER_REQUEST = 50
+# Captures stamped in the future (kiosk clock drift) or older than the offline
+# window (MAX_OFFLINE_DAYS) are refused rather than guessed at
+MAX_CLOCK_SKEW_SECONDS = 300
+
+@frappe.whitelist()
+def get_kiosk_credentials(kiosk):
+    """Kiosk id and signing secret for the kiosk app, generating the secret on first use"""
+    frappe.only_for(("System Manager", "HR Manager"))
+
+    doc = frappe.get_doc("Attendance Kiosk", kiosk)
+    secret = doc.get_password("kiosk_secret", raise_exception=False)
+
+    if not secret:
+        secret = frappe.generate_hash(length=32)
+        doc.kiosk_secret = secret
+        doc.save(ignore_permissions=True)
+
+    return {
+        "kiosk": doc.name,
+        "kiosk_name": doc.kiosk_name or doc.name,
+        "secret": secret
+    }
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def ingest_kiosk_events(kiosk, events):
+    """Bulk endpoint for captures buffered by the kiosk app.
+
+    Every event is {frame_id, captured_at (UTC ISO), image, signature}. Events
+    are authenticated with the kiosk secret, recognised in capture order and
+    recorded at their original capture time. Re-uploaded frames are reported
+    as duplicates, so the app can safely retry a batch.
+    """
+    try:
+        if isinstance(events, str):
+            events = json.loads(events)
+
+        kiosk_doc = frappe.db.get_value(
+            "Attendance Kiosk", kiosk, ["name", "kiosk_name", "is_active"], as_dict=True
+        )
+        if not kiosk_doc or not kiosk_doc.is_active:
+            return {"success": False, "message": "Unknown or inactive kiosk"}
+
+        if len(events) > MAX_EVENTS_PER_REQUEST:
+            return {"success": False, "message": f"At most {MAX_EVENTS_PER_REQUEST} events per request"}
+
+        secret = get_decrypted_password("Attendance Kiosk", kiosk_doc.name, "kiosk_secret", raise_exception=False)
+        if not secret:
+            return {"success": False, "message": "Kiosk has not been provisioned"}
+
+        context = frappe._dict(
+            kiosk=kiosk_doc,
+            kiosk_label=kiosk_doc.kiosk_name or kiosk_doc.name,
+            secret=secret,
+            gallery=None,
+            async_attendance=frappe.get_cached_doc("Face Recognition Settings").enable_async_attendance
+        )
+
+        # Oldest first, so check-in/check-out alternate as they happened
+        events = sorted(events, key=lambda event: event.get("captured_at") or "")
+        results = [ingest_event(context, event) for event in events]
+
+        return {"success": True, "results": results, "hints": get_capture_hints(context.kiosk_label)}
+
+    except Exception as e:
+        frappe.log_error(f"Kiosk event ingestion error: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+def ingest_event(context, event):
+    """Verify, recognise and record one buffered capture"""
+    frame_id = event.get("frame_id")
+    result = {"frame_id": frame_id}
+
+    if not verify_event_signature(context.kiosk.name, context.secret, event):
+        return dict(result, status="rejected", message="Invalid signature")
+
+    punch_time = get_punch_time(event.get("captured_at"))
+    if not punch_time:
+        return dict(result, status="rejected", message="Capture time outside the accepted window")
+
+    event_id = get_event_id(context.kiosk_label, frame_id)
+    if not claim_event(event_id):
+        return dict(result, status="duplicate")
+
+    record_kiosk_recognition(context.kiosk_label)
+
+    try:
+        frappe.db.savepoint("kiosk_event")
+
+        frame = prepare_frame(event.get("image"))
+        if not frame or frame["encoding"] is None:
+            return dict(result, status="no_face")
+        observe_face_size(context.kiosk_label, frame)
+
+        if context.gallery is None:
+            context.gallery = get_recognition_gallery()
+
+        best_match, best_distance = find_best_match(context.gallery, frame["encoding"])
+        if not best_match:
+            return dict(result, status="unrecognized")
+
+        liveness = check_liveness(frame, best_match.employee_id, context.kiosk_label)
+        if liveness and not liveness["is_live"]:
+            return dict(result, status="rejected", message="Liveness check failed")
+
+        result.update({
+            "employee_id": best_match.employee_id,
+            "employee_name": best_match.employee_name,
+            "confidence": round(max(0, (1 - best_distance) * 100), 2)
+        })
+        if context.async_attendance:
+            attendance = push_attendance_event(
+                event_id, best_match, result["confidence"], context.kiosk_label,
+                store_capture(frame, best_match.employee_id, punch_time), punch_time
+            )
+            return dict(result, status="queued", attendance=attendance)
+
+        # A retry or replay of a punch that is already stored
+        if is_punch_written(best_match.employee_id, punch_time):
+            return dict(result, status="duplicate")
+
+        session = get_punch_session_state(best_match.employee_id, punch_time)
+        if is_double_tap(session, punch_time):
+            return dict(result, status="duplicate")
+
+        if is_out_of_order(session, punch_time):
+            return dict(result, status="rejected", message="Older than the latest punch stored for the day")
+
+        capture_url = store_capture(frame, best_match.employee_id, punch_time)
+        attendance = write_punch(best_match, punch_time, context.kiosk_label, result["confidence"], capture_url)
+        return dict(result, status="recorded", attendance=attendance)
+
+    except Exception as e:
+        frappe.db.rollback(save_point="kiosk_event")
+        release_event(event_id)
+        frappe.log_error(f"Kiosk event {event_id} failed: {str(e)}")
+        return dict(result, status="error", message=str(e))
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def kiosk_heartbeat(kiosk, sent_at, status, signature):
+    """Liveness ping from the kiosk app, signed like an event with the status JSON as payload"""
+    try:
+        kiosk_doc = frappe.db.get_value(
+            "Attendance Kiosk", kiosk, ["name", "kiosk_name", "is_active"], as_dict=True
+        )
+        if not kiosk_doc or not kiosk_doc.is_active:
+            return {"success": False, "message": "Unknown or inactive kiosk"}
+
+        secret = get_decrypted_password("Attendance Kiosk", kiosk_doc.name, "kiosk_secret", raise_exception=False)
+        event = {"frame_id": "heartbeat", "captured_at": sent_at, "image": status, "signature": signature}
+        if not secret or not verify_event_signature(kiosk_doc.name, secret, event):
+            return {"success": False, "message": "Invalid signature"}
+
+        # A replayed heartbeat must not keep a dead kiosk looking alive
+        sent_time = get_punch_time(sent_at)
+        if not sent_time or abs((now_datetime() - sent_time).total_seconds()) > MAX_CLOCK_SKEW_SECONDS:
+            return {"success": False, "message": "Stale heartbeat"}
+
+        record_heartbeat(kiosk_doc.kiosk_name or kiosk_doc.name, json.loads(status) if status else {})
+        return {"success": True}
+
+    except Exception as e:
+        frappe.log_error(f"Kiosk heartbeat error: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+def verify_event_signature(kiosk, secret, event):
+    """HMAC-SHA256 over kiosk, frame id, capture time and the SHA-256 of the image string"""
+    image = event.get("image") or ""
+    message = "|".join([
+        kiosk,
+        str(event.get("frame_id") or ""),
+        str(event.get("captured_at") or ""),
+        hashlib.sha256(image.encode("utf-8")).hexdigest()
+    ])
+    expected = hmac.new(secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, str(event.get("signature") or ""))
+
+def get_punch_time(captured_at):
+    """Convert the kiosk's UTC capture time to system time, None when it is not plausible"""
+    try:
+        punch_time = convert_utc_to_system_timezone(get_datetime(captured_at)).replace(tzinfo=None)
+    except Exception:
+        return None
+
+    now = now_datetime()
+    if punch_time > now + timedelta(seconds=MAX_CLOCK_SKEW_SECONDS):
+        return None
+    if punch_time < now - timedelta(days=MAX_OFFLINE_DAYS):
+        return None
+
+    return punch_time
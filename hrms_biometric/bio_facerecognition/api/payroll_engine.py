@@ -0,0 +1,194 @@
+# hrms_biometric/bio_facerecognition/api/payroll_engine.py
+
+import frappe
+import numpy as np
+from datetime import timedelta
+from frappe.utils import getdate
+
+from .working_calendar import get_employee_working_days
+
+BATCH_SIZE = 20000
+
+# Standard work timings, as microseconds of the day so they compare like datetime.time
+STANDARD_START_US = 9 * 3600 * 1000000
+STANDARD_END_US = 18 * 3600 * 1000000
+STANDARD_HOURS_PER_DAY = 9
+LUNCH_BREAK_HOURS = 1
+
+DEFAULT_HOURLY_RATE = 50.0
+OVERTIME_MULTIPLIER = 1.5
+# 30 min deduction per late day
+LATE_DEDUCTION_HOURS = 0.5
+
+def time_of_day_sql(column):
+    return f"""(HOUR({column}) * 3600000000 + MINUTE({column}) * 60000000
+        + SECOND({column}) * 1000000 + MICROSECOND({column}))"""
+
+def stream_payroll_attendance(start_date, end_date, batch_size=BATCH_SIZE):
+    """Submitted attendance of the range as column batches, one keyset page at a
+    time along (attendance_date, name)"""
+    start_date = getdate(start_date)
+    last_date, last_name = start_date, ""
+    while True:
+        rows = frappe.db.sql(f"""
+            SELECT
+                name, employee_id, DATEDIFF(attendance_date, %(start_date)s),
+                check_in_time IS NOT NULL AND check_out_time IS NOT NULL,
+                COALESCE({time_of_day_sql("check_in_time")}, 0),
+                COALESCE({time_of_day_sql("check_out_time")}, 0),
+                COALESCE(total_hours, 0)
+            FROM `tabEmployee Attendance`
+            WHERE attendance_date BETWEEN %(last_date)s AND %(end_date)s
+            AND (attendance_date > %(last_date)s OR name > %(last_name)s)
+            AND docstatus = 1
+            ORDER BY attendance_date, name
+            LIMIT %(batch_size)s
+        """, {
+            "start_date": start_date, "end_date": end_date,
+            "last_date": last_date, "last_name": last_name, "batch_size": batch_size
+        })
+        
+        if not rows:
+            return
+        
+        names, employees, days, complete, check_ins, check_outs, hours = zip(*rows)
+        yield {
+            "name": np.array(names, dtype=str),
+            "employee": np.array(employees, dtype=str),
+            "day": np.array(days, dtype=np.int64),
+            "complete": np.array(complete, dtype=bool),
+            "check_in": np.array(check_ins, dtype=np.int64),
+            "check_out": np.array(check_outs, dtype=np.int64),
+            "hours": np.array(hours, dtype=np.float64)
+        }
+        last_date, last_name = start_date + timedelta(days=rows[-1][2]), rows[-1][0]
+
+def load_payroll_attendance(employee_ids, start_date, end_date):
+    """The range's attendance of the given employees, ordered by employee and date.
+    
+    code is the employee's position in employee_ids; rows of other employees
+    are dropped.
+    """
+    columns = ["name", "day", "complete", "check_in", "check_out", "hours", "code"]
+    empty = {column: np.array([], dtype=np.int64) for column in columns}
+    if not len(employee_ids):
+        # Nobody to pay; there is no position to map any attendance row to
+        return empty
+    
+    order = np.argsort(np.array(employee_ids, dtype=str))
+    sorted_ids = np.array(employee_ids, dtype=str)[order]
+    
+    parts = []
+    for batch in stream_payroll_attendance(start_date, end_date):
+        position = np.minimum(np.searchsorted(sorted_ids, batch["employee"]), len(sorted_ids) - 1)
+        known = sorted_ids[position] == batch["employee"]
+        batch["code"] = order[position]
+        parts.append({column: values[known] for column, values in batch.items()})
+    
+    if not parts:
+        return empty
+    
+    attendance = {column: np.concatenate([part[column] for part in parts]) for column in columns}
+    # Per employee in attendance_date order, so hours add up in the same order as calculate_working_hours
+    sort = np.lexsort((attendance["name"], attendance["day"], attendance["code"]))
+    return {column: values[sort] for column, values in attendance.items()}
+
+def compute_working_hours_summaries(employee_ids, start_date, end_date, working_days=None):
+    """calculate_working_hours' summary for every employee, from one pass over the range"""
+    if working_days is None:
+        working_days = get_employee_working_days(employee_ids, start_date, end_date)
+    
+    attendance = load_payroll_attendance(employee_ids, start_date, end_date)
+    size = len(employee_ids)
+    
+    complete = attendance["complete"]
+    codes = attendance["code"][complete]
+    effective_hours = np.maximum(0, attendance["hours"][complete] - LUNCH_BREAK_HOURS)
+    overtime = np.maximum(0, effective_hours - STANDARD_HOURS_PER_DAY)
+    
+    # bincount adds the weights in row order, like the running totals of the per-employee loop
+    records = np.bincount(attendance["code"], minlength=size)
+    total_days = np.bincount(codes, minlength=size)
+    total_hours = np.bincount(codes, weights=effective_hours, minlength=size)
+    overtime_hours = np.bincount(codes, weights=overtime, minlength=size)
+    late_days = np.bincount(codes, weights=attendance["check_in"][complete] > STANDARD_START_US, minlength=size)
+    early_departures = np.bincount(codes, weights=attendance["check_out"][complete] < STANDARD_END_US, minlength=size)
+    
+    summaries = {}
+    for code, employee_id in enumerate(employee_ids):
+        days, hours = int(total_days[code]), float(total_hours[code])
+        average_hours_per_day = hours / days if days > 0 else 0
+        attendance_percentage = (days / int(records[code])) * 100 if records[code] else 0
+        
+        summaries[employee_id] = {
+            "total_hours": round(hours, 2),
+            "total_days": days,
+            "working_days": working_days[employee_id],
+            "average_hours_per_day": round(average_hours_per_day, 2),
+            "late_days": int(late_days[code]),
+            "early_departures": int(early_departures[code]),
+            "overtime_hours": round(float(overtime_hours[code]), 2),
+            "attendance_percentage": round(attendance_percentage, 2)
+        }
+    return summaries
+
+def get_hourly_rates(employee_ids):
+    """get_employee_hourly_rate for every employee, from one query and one settings read"""
+    if not employee_ids:
+        return {}
+    
+    try:
+        custom_rates = dict(frappe.get_all(
+            "Employee Face Recognition",
+            filters={"name": ["in", list(employee_ids)]},
+            fields=["name", "hourly_rate"],
+            as_list=True
+        ))
+    except Exception:
+        return {employee_id: DEFAULT_HOURLY_RATE for employee_id in employee_ids}
+    
+    try:
+        default_rate = frappe.db.get_single_value("Face Recognition Settings", "default_hourly_rate") or DEFAULT_HOURLY_RATE
+    except Exception:
+        default_rate = DEFAULT_HOURLY_RATE
+    
+    return {employee_id: custom_rates.get(employee_id) or default_rate for employee_id in employee_ids}
+
+def compute_payroll(employees, month, year, start_date, end_date):
+    """Payroll records of the employees for the month, as generate_payroll_data stores them"""
+    employee_ids = [employee.employee_id for employee in employees]
+    if not employee_ids:
+        return []
+    
+    summaries = compute_working_hours_summaries(employee_ids, start_date, end_date)
+    hourly_rates = get_hourly_rates(employee_ids)
+    
+    payroll_data = []
+    for employee in employees:
+        summary = summaries[employee.employee_id]
+        hourly_rate = hourly_rates[employee.employee_id]
+        overtime_rate = hourly_rate * OVERTIME_MULTIPLIER
+        
+        basic_pay = summary["total_hours"] * hourly_rate
+        overtime_pay = summary["overtime_hours"] * overtime_rate
+        late_deduction = summary["late_days"] * (hourly_rate * LATE_DEDUCTION_HOURS)
+        gross_pay = basic_pay + overtime_pay - late_deduction
+        
+        payroll_data.append({
+            "employee_id": employee.employee_id,
+            "employee_name": employee.employee_name,
+            "department": employee.department,
+            "month": month,
+            "year": year,
+            "working_hours": summary["total_hours"],
+            "overtime_hours": summary["overtime_hours"],
+            "late_days": summary["late_days"],
+            "working_days": summary["working_days"],
+            "attendance_percentage": summary["attendance_percentage"],
+            "hourly_rate": hourly_rate,
+            "basic_pay": round(basic_pay, 2),
+            "overtime_pay": round(overtime_pay, 2),
+            "late_deduction": round(late_deduction, 2),
+            "gross_pay": round(gross_pay, 2)
+        })
+    return payroll_data
@@ -3,10 +3,16 @@ from datetime import datetime, timedelta
 from frappe import _
 import calendar
 
+from .working_calendar import get_employee_working_days
+from .payroll_engine import compute_payroll
+
 @frappe.whitelist()
-def calculate_working_hours(employee_id, start_date, end_date):
+def calculate_working_hours(employee_id, start_date, end_date, working_days=None):
     """Calculate working hours for payroll integration"""
     try:
+        if working_days is None:
+            working_days = get_employee_working_days([employee_id], start_date, end_date)[employee_id]
+        
         attendance_records = frappe.get_all(
             "Employee Attendance",
             filters={
@@ -86,6 +92,7 @@ def calculate_working_hours(employee_id, start_date, end_date):
             "summary": {
                 "total_hours": round(total_hours, 2),
                 "total_days": total_days,
+                "working_days": working_days,
                 "average_hours_per_day": round(average_hours_per_day, 2),
                 "late_days": late_days,
                 "early_departures": early_departures,
@@ -114,48 +121,8 @@ def generate_payroll_data(month, year):
         start_date = datetime(int(year), int(month), 1).date()
         end_date = datetime(int(year), int(month), calendar.monthrange(int(year), int(month))[1]).date()
         
-        payroll_data = []
-        
-        for employee in employees:
-            working_hours_data = calculate_working_hours(
-                employee.employee_id, 
-                start_date, 
-                end_date
-            )
-            
-            if working_hours_data["success"]:
-                summary = working_hours_data["summary"]
-                
-                # Calculate pay components (configurable rates)
-                hourly_rate = get_employee_hourly_rate(employee.employee_id)
-                overtime_rate = hourly_rate * 1.5  # 1.5x for overtime
-                
-                basic_pay = summary["total_hours"] * hourly_rate
-                overtime_pay = summary["overtime_hours"] * overtime_rate
-                
-                # Deductions for late arrivals (configurable)
-                late_deduction = summary["late_days"] * (hourly_rate * 0.5)  # 30 min deduction per late day
-                
-                gross_pay = basic_pay + overtime_pay - late_deduction
-                
-                payroll_record = {
-                    "employee_id": employee.employee_id,
-                    "employee_name": employee.employee_name,
-                    "department": employee.department,
-                    "month": month,
-                    "year": year,
-                    "working_hours": summary["total_hours"],
-                    "overtime_hours": summary["overtime_hours"],
-                    "late_days": summary["late_days"],
-                    "attendance_percentage": summary["attendance_percentage"],
-                    "hourly_rate": hourly_rate,
-                    "basic_pay": round(basic_pay, 2),
-                    "overtime_pay": round(overtime_pay, 2),
-                    "late_deduction": round(late_deduction, 2),
-                    "gross_pay": round(gross_pay, 2)
-                }
-                
-                payroll_data.append(payroll_record)
+        # One streamed pass over the month's attendance and one rate query for the whole workforce
+        payroll_data = compute_payroll(employees, month, year, start_date, end_date)
         
         # Create payroll summary document
         payroll_summary = frappe.new_doc("Payroll Summary")
@@ -211,36 +178,19 @@ def export_payroll_to_external_system(payroll_summary_id, system_type="csv"):
         payroll_data = frappe.parse_json(payroll_summary.payroll_data)
         
         if system_type == "csv":
-            # Generate CSV format
-            import csv
-            import io
+            # Rows are written straight into a private file, never built up as one string
+            from .streaming_export import write_export
+            from .utilities import get_unique_filename
             
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=[
+            result = write_export(get_unique_filename(f"payroll_{payroll_summary.month}_{payroll_summary.year}", "csv"), [
                 'employee_id', 'employee_name', 'department', 'working_hours',
                 'overtime_hours', 'late_days', 'basic_pay', 'overtime_pay',
                 'late_deduction', 'gross_pay'
-            ])
-            
-            writer.writeheader()
-            for record in payroll_data:
-                writer.writerow(record)
-            
-            csv_content = output.getvalue()
-            output.close()
-            
-            # Save as file
-            file_doc = frappe.get_doc({
-                "doctype": "File",
-                "file_name": f"payroll_{payroll_summary.month}_{payroll_summary.year}.csv",
-                "content": csv_content,
-                "is_private": 1
-            })
-            file_doc.insert()
+            ], payroll_data, "csv")
             
             return {
                 "success": True,
-                "file_url": file_doc.file_url,
+                "file_url": result["file_url"],
                 "format": "csv"
             }
             
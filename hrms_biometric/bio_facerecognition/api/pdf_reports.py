@@ -0,0 +1,281 @@
+# hrms_biometric/bio_facerecognition/api/pdf_reports.py
+
+import frappe
+import os
+import json
+import shutil
+from datetime import datetime
+from frappe.utils import getdate, cint
+
+from .streaming_export import get_export_path, register_export_file
+
+# Rendered through frappe.render_template, so each template is compiled once per worker
+SUMMARY_TEMPLATE = "hrms_biometric/templates/reports/analytics_summary.html"
+SECTION_TEMPLATE = "hrms_biometric/templates/reports/department_section.html"
+
+# Employee rows per rendered section; departments larger than this are split into parts
+SECTION_SIZE = 200
+
+PDF_REPORT_KEY_PREFIX = "attendance_pdf_report"
+PDF_PARTS_FOLDER = "attendance_pdf_parts"
+PDF_REPORT_STATE_SECONDS = 24 * 3600
+
+def get_state_key(job_id):
+    return f"{PDF_REPORT_KEY_PREFIX}:{job_id}"
+
+def get_counter_key(job_id):
+    return frappe.cache().make_key(f"{PDF_REPORT_KEY_PREFIX}:{job_id}:done")
+
+def get_state(job_id):
+    return frappe.cache().get_value(get_state_key(job_id))
+
+def set_state(job_id, **values):
+    state = dict(get_state(job_id) or {}, job_id=job_id, **values)
+    frappe.cache().set_value(get_state_key(job_id), state, expires_in_sec=PDF_REPORT_STATE_SECONDS)
+    return state
+
+def get_parts_folder(job_id):
+    return frappe.get_site_path("private", PDF_PARTS_FOLDER, job_id)
+
+def get_section_data_path(job_id, index):
+    return os.path.join(get_parts_folder(job_id), f"{index:05d}.json")
+
+def write_section_data(job_id, index, data):
+    with open(get_section_data_path(job_id, index), "w") as output:
+        json.dump(data, output, default=str)
+
+def read_section_data(job_id, index):
+    with open(get_section_data_path(job_id, index)) as data:
+        return json.load(data)
+
+def get_done_sections(job_id):
+    return cint(frappe.cache().get(get_counter_key(job_id)))
+
+def get_progress(state):
+    if state["status"] == "Completed":
+        return 100
+    if not state.get("total"):
+        return 0
+    return round(get_done_sections(state["job_id"]) * 100 / state["total"])
+
+def publish_progress(state):
+    frappe.publish_realtime(
+        "attendance_pdf_report_progress",
+        {
+            "job_id": state["job_id"],
+            "status": state["status"],
+            "progress": get_progress(state),
+            "file_url": state.get("file_url"),
+            "message": state.get("message")
+        },
+        user=state.get("user")
+    )
+
+def get_filters(department=None):
+    return {"department": department} if department else {}
+
+def get_employee_rows(start_date, end_date, department=None):
+    """Employee rows of the report, from the cached performance report"""
+    from .analytics_dashboard import get_employee_performance_report
+    
+    report = get_employee_performance_report(getdate(start_date), getdate(end_date), get_filters(department))
+    return report["employee_details"]
+
+def group_by_department(employee_rows):
+    departments = {}
+    for row in employee_rows:
+        departments.setdefault(row.get("department") or "No Department", []).append(row)
+    return departments
+
+def plan_sections(employee_rows):
+    """Summary first, then every department in name order, split into SECTION_SIZE parts.
+    
+    Department sections carry their own employee rows.
+    """
+    departments = group_by_department(employee_rows)
+    
+    sections = [{"type": "summary"}]
+    for department in sorted(departments):
+        rows = departments[department]
+        parts = (len(rows) + SECTION_SIZE - 1) // SECTION_SIZE
+        for part in range(parts):
+            sections.append({
+                "type": "department",
+                "department": department,
+                "part": part + 1,
+                "parts": parts,
+                "employees": rows[part * SECTION_SIZE:(part + 1) * SECTION_SIZE]
+            })
+    return sections
+
+def render_summary_html(analytics_data, period=None):
+    return frappe.render_template(SUMMARY_TEMPLATE, {
+        "period": period,
+        "generated_on": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "daily_trends": analytics_data.get("daily_trends") or [],
+        "department_stats": analytics_data.get("department_stats") or []
+    })
+
+def render_section_html(state, section, data):
+    period = {"start": state["start_date"], "end": state["end_date"]}
+    
+    if section["type"] == "summary":
+        return render_summary_html(data, period)
+    
+    return frappe.render_template(SECTION_TEMPLATE, {
+        "period": period,
+        "department": section["department"],
+        "part": section["part"],
+        "parts": section["parts"],
+        "employees": data
+    })
+
+def prepare_pdf_report(report_job_id, start_date, end_date, department=None, user=None):
+    """Background job: snapshot the report data, then queue one render job per section"""
+    from .analytics_dashboard import get_analytics_result
+    
+    try:
+        sections = plan_sections(get_employee_rows(start_date, end_date, department))
+        analytics = get_analytics_result(getdate(start_date), getdate(end_date))["analytics"]
+        
+        # Every section renders from this one snapshot, written to the parts folder,
+        # so attendance changing while the report renders cannot shift rows between parts
+        os.makedirs(get_parts_folder(report_job_id), exist_ok=True)
+        for index, section in enumerate(sections):
+            if section["type"] == "summary":
+                data = {"daily_trends": analytics.get("daily_trends"), "department_stats": analytics.get("department_stats")}
+            else:
+                data = section.pop("employees")
+            write_section_data(report_job_id, index, data)
+        
+        frappe.cache().delete(get_counter_key(report_job_id))
+        state = set_state(report_job_id, status="Running", total=len(sections), sections=sections)
+        publish_progress(state)
+        
+        for index in range(len(sections)):
+            frappe.enqueue(
+                "hrms_biometric.bio_facerecognition.api.pdf_reports.render_pdf_section",
+                queue="long",
+                timeout=1800,
+                # One RQ job per section; job_id is frappe.enqueue's own argument
+                job_id=f"pdf_report_{report_job_id}_{index}",
+                report_job_id=report_job_id,
+                index=index
+            )
+    
+    except Exception as e:
+        frappe.log_error(f"PDF report preparation error: {str(e)}")
+        publish_progress(set_state(report_job_id, status="Failed", message=str(e)))
+        shutil.rmtree(get_parts_folder(report_job_id), ignore_errors=True)
+
+def render_pdf_section(report_job_id, index):
+    """Background job: render one section to its own PDF; the last one to finish merges them"""
+    from frappe.utils.pdf import get_pdf
+    
+    state = get_state(report_job_id)
+    if not state or state["status"] != "Running":
+        return
+    
+    try:
+        html = render_section_html(state, state["sections"][index], read_section_data(report_job_id, index))
+        with open(os.path.join(get_parts_folder(report_job_id), f"{index:05d}.pdf"), "wb") as output:
+            output.write(get_pdf(html))
+        
+        # Only the counter is shared between section jobs, so they never rewrite each other's state
+        cache = frappe.cache()
+        done = cache.incr(get_counter_key(report_job_id))
+        cache.expire(get_counter_key(report_job_id), PDF_REPORT_STATE_SECONDS)
+        
+        if done < state["total"]:
+            publish_progress(state)
+        elif done == state["total"]:
+            merge_pdf_report(report_job_id)
+    
+    except Exception as e:
+        frappe.log_error(f"PDF report section error: {str(e)}")
+        publish_progress(set_state(report_job_id, status="Failed", message=str(e)))
+        shutil.rmtree(get_parts_folder(report_job_id), ignore_errors=True)
+
+def merge_pdf_report(job_id):
+    """Concatenate the section PDFs in order into one private file"""
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        from PyPDF2 import PdfWriter
+    
+    state = get_state(job_id)
+    folder = get_parts_folder(job_id)
+    
+    writer = PdfWriter()
+    for index in range(state["total"]):
+        writer.append(os.path.join(folder, f"{index:05d}.pdf"))
+    
+    file_name = f"attendance_report_{getdate(state['start_date']).strftime('%Y%m%d')}_{getdate(state['end_date']).strftime('%Y%m%d')}_{job_id}.pdf"
+    path = get_export_path(file_name)
+    with open(path, "wb") as output:
+        writer.write(output)
+    writer.close()
+    
+    file_doc = register_export_file(file_name, path)
+    frappe.db.commit()
+    shutil.rmtree(folder, ignore_errors=True)
+    
+    publish_progress(set_state(job_id, status="Completed", file_url=file_doc.file_url))
+
+def queue_pdf_report(start_date, end_date, department=None):
+    job_id = frappe.generate_hash(length=10)
+    start_date, end_date = str(getdate(start_date)), str(getdate(end_date))
+    
+    set_state(
+        job_id, status="Queued", user=frappe.session.user,
+        start_date=start_date, end_date=end_date, department=department
+    )
+    frappe.enqueue(
+        "hrms_biometric.bio_facerecognition.api.pdf_reports.prepare_pdf_report",
+        queue="long",
+        timeout=1800,
+        job_id=f"pdf_report_{job_id}",
+        report_job_id=job_id,
+        start_date=start_date,
+        end_date=end_date,
+        department=department,
+        user=frappe.session.user
+    )
+    return job_id
+
+@frappe.whitelist()
+def start_pdf_report(start_date, end_date, department=None):
+    """Queue an attendance PDF report; progress arrives as attendance_pdf_report_progress events"""
+    try:
+        frappe.only_for(("System Manager", "HR Manager"))
+        
+        if getdate(start_date) > getdate(end_date):
+            return {"success": False, "message": "Start date must be before end date"}
+        
+        job_id = queue_pdf_report(start_date, end_date, department)
+        return {"success": True, "job_id": job_id, "message": "PDF report queued"}
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"PDF report queue error: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+@frappe.whitelist()
+def get_pdf_report_status(job_id):
+    """Status, progress and, once merged, the file of a queued PDF report"""
+    state = get_state(job_id)
+    if not state:
+        return {"success": False, "message": "PDF report not found"}
+    if state.get("user") != frappe.session.user:
+        frappe.only_for("System Manager")
+    
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": state["status"],
+        "progress": get_progress(state),
+        "total_sections": state.get("total"),
+        "file_url": state.get("file_url"),
+        "message": state.get("message")
+    }
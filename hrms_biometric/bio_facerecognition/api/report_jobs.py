@@ -0,0 +1,247 @@
+# hrms_biometric/bio_facerecognition/api/report_jobs.py
+
+import frappe
+import json
+from datetime import timedelta
+from frappe.utils import getdate, today, add_days, add_months, get_first_day, get_last_day, now_datetime, cint
+
+from .analytics_cache import get_result_key, get_watermark
+from .streaming_export import get_export_path, open_text, register_export_file
+from .utilities import get_unique_filename
+
+REPORT_DOCTYPE = "Attendance Report"
+REPORT_TIMEOUT = 3600
+
+# Report sections in the order they are computed, with the report types that include them
+REPORT_SECTIONS = [
+    ("executive_summary", ("comprehensive", "summary")),
+    ("detailed_analytics", ("comprehensive", "detailed")),
+    ("employee_performance", ("comprehensive", "employee")),
+    ("operational_insights", ("comprehensive", "operational"))
+]
+
+def get_period_dates(period, start_date=None, end_date=None):
+    """Date range of a relative period as of today, the given range for Custom"""
+    current = getdate(today())
+    if period == "Month to Date":
+        return get_first_day(current), current
+    if period == "Last 7 Days":
+        return getdate(add_days(current, -6)), current
+    if period == "Last 30 Days":
+        return getdate(add_days(current, -29)), current
+    if period == "Previous Month":
+        month = get_first_day(add_months(current, -1))
+        return month, get_last_day(month)
+    return getdate(start_date), getdate(end_date)
+
+def get_request_key(report_type, start_date, end_date, filters):
+    return get_result_key(f"attendance_report_{report_type.lower()}", start_date, end_date, filters)
+
+def compute_section(section, start_date, end_date, filters):
+    """One section of the report from the shared result cache. Errors propagate,
+    so a failed section fails the report instead of being stored as empty"""
+    from . import analytics_dashboard
+    
+    if section == "executive_summary":
+        return analytics_dashboard.get_executive_summary(start_date, end_date, filters)
+    if section == "detailed_analytics":
+        return dict(analytics_dashboard.get_analytics_result(start_date, end_date), success=True)
+    if section == "employee_performance":
+        return analytics_dashboard.get_employee_performance_report(start_date, end_date, filters)
+    return analytics_dashboard.get_operational_insights(start_date, end_date, filters)
+
+def find_reusable_report(request_key, start_date, end_date):
+    """An identical report still being generated, or generated from attendance that has not changed since"""
+    in_flight_since = now_datetime() - timedelta(seconds=REPORT_TIMEOUT)
+    for report in frappe.get_all(
+        REPORT_DOCTYPE,
+        filters={"request_key": request_key, "status": ["in", ["Queued", "Running", "Generated"]]},
+        fields=["name", "status", "watermark", "modified"],
+        order_by="modified desc",
+        limit_page_length=5
+    ):
+        if report.status == "Generated":
+            if report.watermark == get_watermark(start_date, end_date):
+                return report.name
+        elif report.modified >= in_flight_since:
+            # Progress updates keep modified current; older in-flight reports lost their job
+            return report.name
+    return None
+
+def queue_attendance_report(report_type, start_date, end_date, filters=None, period="Custom", auto_refresh=0):
+    """Attendance Report for the request, reusing an identical in-flight or up-to-date one"""
+    report_type = report_type.title()
+    filters = filters or {}
+    start_date, end_date = get_period_dates(period, start_date, end_date)
+    request_key = get_request_key(report_type, start_date, end_date, filters)
+    
+    name = find_reusable_report(request_key, start_date, end_date)
+    if name:
+        frappe.db.sql(f"""
+            UPDATE `tab{REPORT_DOCTYPE}` SET request_count = request_count + 1,
+                auto_refresh = GREATEST(auto_refresh, %s)
+            WHERE name = %s
+        """, (cint(auto_refresh), name))
+        return frappe.get_doc(REPORT_DOCTYPE, name)
+    
+    report_doc = frappe.new_doc(REPORT_DOCTYPE)
+    report_doc.report_type = report_type
+    report_doc.period = period
+    report_doc.start_date = start_date
+    report_doc.end_date = end_date
+    report_doc.filters_applied = json.dumps(filters, sort_keys=True)
+    report_doc.request_key = request_key
+    report_doc.auto_refresh = cint(auto_refresh)
+    report_doc.status = "Queued"
+    report_doc.generated_by = frappe.session.user
+    report_doc.insert()
+    
+    enqueue_report(report_doc.name)
+    return report_doc
+
+def get_report_job_id(report_name):
+    return f"attendance_report::{report_name}"
+
+def enqueue_report(report_name):
+    # Deferred until the report is committed, so enqueue returns no job; the id
+    # is fixed per report instead, which also keeps one job per report queued
+    job_id = get_report_job_id(report_name)
+    frappe.enqueue(
+        "hrms_biometric.bio_facerecognition.api.report_jobs.run_attendance_report",
+        queue="long",
+        timeout=REPORT_TIMEOUT,
+        enqueue_after_commit=True,
+        job_id=job_id,
+        deduplicate=True,
+        report_name=report_name
+    )
+    frappe.db.set_value(REPORT_DOCTYPE, report_name, {
+        "status": "Queued",
+        "progress": 0,
+        "job_id": job_id
+    })
+
+def update_report(report_name, user=None, **values):
+    """Commit report progress so pollers see it, and push it to the requesting user"""
+    frappe.db.set_value(REPORT_DOCTYPE, report_name, values)
+    frappe.db.commit()
+    if user:
+        frappe.publish_realtime("attendance_report_progress", dict(values, report=report_name), user=user)
+
+def run_attendance_report(report_name):
+    """Background job: compute the report's sections and write the result file"""
+    report_doc = frappe.get_doc(REPORT_DOCTYPE, report_name)
+    user = report_doc.generated_by
+    start_date, end_date = get_period_dates(report_doc.period, report_doc.start_date, report_doc.end_date)
+    filters = json.loads(report_doc.filters_applied or "{}")
+    report_type = report_doc.report_type.lower()
+    
+    # Taken before computing, so changes made meanwhile leave the result stale
+    watermark = get_watermark(start_date, end_date)
+    update_report(
+        report_name, user, status="Running", progress=0, started_on=now_datetime(), error_message=None,
+        start_date=start_date, end_date=end_date,
+        request_key=get_request_key(report_type, start_date, end_date, filters)
+    )
+    
+    try:
+        sections = [section for section, report_types in REPORT_SECTIONS if report_type in report_types]
+        report_data = {}
+        for index, section in enumerate(sections, 1):
+            report_data[section] = compute_section(section, start_date, end_date, filters)
+            update_report(report_name, user, progress=round(index * 100 / (len(sections) + 1), 1))
+        
+        file_url = write_report_file(report_name, report_type, start_date, end_date, filters, report_data)
+        previous_file = report_doc.report_file
+        
+        update_report(
+            report_name, user, status="Generated", progress=100, report_file=file_url,
+            watermark=watermark, generation_time=now_datetime()
+        )
+        remove_report_file(previous_file)
+    
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Report generation error: {str(e)}")
+        update_report(report_name, user, status="Failed", error_message=str(e))
+
+def write_report_file(report_name, report_type, start_date, end_date, filters, report_data):
+    file_name = get_unique_filename(f"attendance_report_{report_type}_{start_date}_{end_date}", "json")
+    path = get_export_path(file_name)
+    with open_text(path) as f:
+        json.dump({
+            "report": report_name,
+            "report_type": report_type,
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "filters": filters,
+            "report_data": report_data
+        }, f, default=str)
+    return register_export_file(file_name, path).file_url
+
+def remove_report_file(file_url):
+    if not file_url:
+        return
+    for file_name in frappe.get_all("File", filters={"file_url": file_url}, pluck="name"):
+        frappe.delete_doc("File", file_name, ignore_permissions=True)
+    frappe.db.commit()
+
+def refresh_scheduled_reports():
+    """Daily: regenerate reports marked for refresh whose attendance has changed"""
+    for report in frappe.get_all(
+        REPORT_DOCTYPE,
+        filters={"auto_refresh": 1, "status": ["in", ["Generated", "Failed"]]},
+        fields=["name", "period", "start_date", "end_date", "status", "watermark"]
+    ):
+        start_date, end_date = get_period_dates(report.period, report.start_date, report.end_date)
+        if report.status == "Generated" and report.watermark == get_watermark(start_date, end_date):
+            continue
+        enqueue_report(report.name)
+    frappe.db.commit()
+
+@frappe.whitelist()
+def get_attendance_report_status(report_id, include_data=0):
+    """Status and progress of a report, with its data once generated if asked"""
+    try:
+        report_doc = frappe.get_doc(REPORT_DOCTYPE, report_id)
+        report_doc.check_permission("read")
+        
+        result = {
+            "success": True,
+            "report_id": report_doc.name,
+            "status": report_doc.status,
+            "progress": report_doc.progress,
+            "file_url": report_doc.report_file,
+            "error_message": report_doc.error_message
+        }
+        
+        if cint(include_data) and report_doc.status == "Generated" and report_doc.report_file:
+            file_doc = frappe.get_doc("File", {"file_url": report_doc.report_file})
+            result["report_data"] = json.loads(file_doc.get_content())["report_data"]
+        
+        return result
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"Report status error: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+@frappe.whitelist()
+def refresh_attendance_report(report_id):
+    """Regenerate an existing report now"""
+    try:
+        report_doc = frappe.get_doc(REPORT_DOCTYPE, report_id)
+        report_doc.check_permission("write")
+        
+        if report_doc.status in ("Queued", "Running"):
+            return {"success": True, "report_id": report_doc.name, "status": report_doc.status}
+        
+        enqueue_report(report_doc.name)
+        return {"success": True, "report_id": report_doc.name, "status": "Queued"}
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"Report refresh error: {str(e)}")
+        return {"success": False, "message": str(e)}
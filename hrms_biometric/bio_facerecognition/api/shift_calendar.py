@@ -0,0 +1,241 @@
+# hrms_biometric/bio_facerecognition/api/shift_calendar.py
+
+import frappe
+from datetime import datetime, timedelta
+from frappe.utils import getdate, today, to_timedelta, cint
+
+# Materialised per employee for a rolling window of days around today; one
+# Redis hash field per employee holds every day of the window
+SHIFT_CALENDAR_KEY = "shift_calendar"
+WINDOW_PAST_DAYS = 1
+WINDOW_FUTURE_DAYS = 14
+
+# Used when a Shift Type does not say how early/late punches may happen
+DEFAULT_CHECK_IN_BEFORE_MINUTES = 60
+DEFAULT_CHECK_OUT_AFTER_MINUTES = 60
+
+SHIFT_TYPE_FIELDS = [
+    "name", "start_time", "end_time",
+    "enable_late_entry_marking", "late_entry_grace_period",
+    "enable_early_exit_marking", "early_exit_grace_period",
+    "begin_check_in_before_shift_start_time", "allow_check_out_after_shift_end_time"
+]
+
+def get_window():
+    start = getdate(today()) - timedelta(days=WINDOW_PAST_DAYS)
+    return start, start + timedelta(days=WINDOW_PAST_DAYS + WINDOW_FUTURE_DAYS)
+
+def get_shift_for_date(employee_id, attendance_date):
+    """Expected shift of the employee on a date, from the cached calendar"""
+    attendance_date = getdate(attendance_date)
+    calendar = frappe.cache().hget(SHIFT_CALENDAR_KEY, employee_id)
+    
+    if not calendar or str(attendance_date) not in calendar["days"]:
+        window_start, window_end = get_window()
+        if window_start <= attendance_date <= window_end:
+            calendar = rebuild_employee_calendar(employee_id)
+        else:
+            # Outside the window (e.g. an old offline backlog): compute without caching
+            calendar = build_shift_calendar([employee_id], attendance_date, attendance_date).get(employee_id)
+    
+    return calendar["days"][str(attendance_date)]
+
+def resolve_punch_shift(employee_id, punch_time):
+    """Attendance date and shift a punch belongs to.
+    
+    A punch early in the morning that still falls within yesterday's overnight
+    shift (up to its check-out allowance) counts towards yesterday.
+    """
+    punch_date = punch_time.date()
+    previous_date = punch_date - timedelta(days=1)
+    previous_shift = get_shift_for_date(employee_id, previous_date)
+    
+    if previous_shift["overnight"] and punch_time <= previous_shift["check_out_until"]:
+        return frappe._dict(attendance_date=previous_date, shift=previous_shift)
+    
+    return frappe._dict(attendance_date=punch_date, shift=get_shift_for_date(employee_id, punch_date))
+
+def get_attendance_date(employee_id, punch_time):
+    return resolve_punch_shift(employee_id, punch_time).attendance_date
+
+def is_late_check_in(shift, punch_time):
+    return bool(shift["late_after"]) and punch_time > shift["late_after"]
+
+def is_early_check_out(shift, punch_time):
+    return bool(shift["early_before"]) and punch_time < shift["early_before"]
+
+def rebuild_employee_calendar(employee_id):
+    """Recompute and cache one employee's calendar for the current window"""
+    window_start, window_end = get_window()
+    calendar = build_shift_calendar([employee_id], window_start, window_end)[employee_id]
+    frappe.cache().hset(SHIFT_CALENDAR_KEY, employee_id, calendar)
+    return calendar
+
+def materialize_shift_calendar():
+    """Rebuild the calendar of every active employee for the rolling window (daily)"""
+    employee_ids = frappe.get_all("Employee Face Recognition", filters={"status": "Active"}, pluck="employee_id")
+    window_start, window_end = get_window()
+    
+    frappe.cache().delete_key(SHIFT_CALENDAR_KEY)
+    for employee_id, calendar in build_shift_calendar(employee_ids, window_start, window_end).items():
+        frappe.cache().hset(SHIFT_CALENDAR_KEY, employee_id, calendar)
+
+def build_shift_calendar(employee_ids, start_date, end_date):
+    """Expected shift per employee per day from Shift Assignments, the Employee's
+    default shift and finally the working hours in Face Recognition Settings.
+    
+    Uses a fixed number of queries regardless of how many employees or days.
+    """
+    start_date, end_date = getdate(start_date), getdate(end_date)
+    assignments = get_shift_assignments(employee_ids, start_date, end_date)
+    default_shifts = get_default_shifts(employee_ids)
+    
+    shift_type_names = {row.shift_type for rows in assignments.values() for row in rows}
+    shift_type_names.update(default_shifts.values())
+    shift_types = get_shift_types(shift_type_names)
+    settings = frappe.get_cached_doc("Face Recognition Settings")
+    
+    calendars = {}
+    for employee_id in employee_ids:
+        days = {}
+        day = start_date
+        while day <= end_date:
+            shift_type = get_assigned_shift_type(assignments.get(employee_id, []), day)
+            source = "Shift Assignment"
+            if not shift_type:
+                shift_type = default_shifts.get(employee_id)
+                source = "Default Shift"
+            
+            if shift_type and shift_type in shift_types:
+                days[str(day)] = make_shift_entry(day, shift_types[shift_type], source)
+            else:
+                days[str(day)] = make_settings_entry(day, settings)
+            
+            day += timedelta(days=1)
+        
+        calendars[employee_id] = {"window": (str(start_date), str(end_date)), "days": days}
+    
+    return calendars
+
+def get_shift_assignments(employee_ids, start_date, end_date):
+    if not employee_ids or not frappe.db.table_exists("Shift Assignment"):
+        return {}
+    
+    rows = frappe.get_all(
+        "Shift Assignment",
+        filters={
+            "employee": ["in", employee_ids],
+            "docstatus": 1,
+            "status": "Active",
+            "start_date": ["<=", end_date]
+        },
+        or_filters=[["end_date", "is", "not set"], ["end_date", ">=", start_date]],
+        fields=["employee", "shift_type", "start_date", "end_date"],
+        order_by="start_date desc"
+    )
+    
+    assignments = {}
+    for row in rows:
+        assignments.setdefault(row.employee, []).append(row)
+    return assignments
+
+def get_assigned_shift_type(assignments, day):
+    # Latest starting assignment wins where several overlap
+    for assignment in assignments:
+        if assignment.start_date <= day and (not assignment.end_date or assignment.end_date >= day):
+            return assignment.shift_type
+    return None
+
+def get_default_shifts(employee_ids):
+    if not employee_ids or not frappe.get_meta("Employee").has_field("default_shift"):
+        return {}
+    
+    rows = frappe.get_all(
+        "Employee",
+        filters={"name": ["in", employee_ids], "default_shift": ["is", "set"]},
+        fields=["name", "default_shift"]
+    )
+    return {row.name: row.default_shift for row in rows}
+
+def get_shift_types(names):
+    if not names or not frappe.db.table_exists("Shift Type"):
+        return {}
+    
+    meta = frappe.get_meta("Shift Type")
+    fields = [field for field in SHIFT_TYPE_FIELDS if field == "name" or meta.has_field(field)]
+    rows = frappe.get_all("Shift Type", filters={"name": ["in", list(names)]}, fields=fields)
+    return {row.name: row for row in rows}
+
+def make_shift_entry(day, shift_type, source):
+    start = datetime.combine(day, datetime.min.time()) + to_timedelta(shift_type.start_time)
+    end = datetime.combine(day, datetime.min.time()) + to_timedelta(shift_type.end_time)
+    overnight = end <= start
+    if overnight:
+        end += timedelta(days=1)
+    
+    late_after = None
+    if shift_type.get("enable_late_entry_marking"):
+        late_after = start + timedelta(minutes=cint(shift_type.get("late_entry_grace_period")))
+    
+    early_before = None
+    if shift_type.get("enable_early_exit_marking"):
+        early_before = end - timedelta(minutes=cint(shift_type.get("early_exit_grace_period")))
+    
+    check_in_before = shift_type.get("begin_check_in_before_shift_start_time")
+    check_out_after = shift_type.get("allow_check_out_after_shift_end_time")
+    
+    return {
+        "shift_type": shift_type.name,
+        "source": source,
+        "start": start,
+        "end": end,
+        "overnight": overnight,
+        "late_after": late_after,
+        "early_before": early_before,
+        "check_in_from": start - timedelta(minutes=DEFAULT_CHECK_IN_BEFORE_MINUTES if check_in_before is None else cint(check_in_before)),
+        "check_out_until": end + timedelta(minutes=DEFAULT_CHECK_OUT_AFTER_MINUTES if check_out_after is None else cint(check_out_after))
+    }
+
+def make_settings_entry(day, settings):
+    """Shift from the working hours configured in Face Recognition Settings"""
+    midnight = datetime.combine(day, datetime.min.time())
+    start = midnight + to_timedelta(settings.working_hours_start or "09:00:00")
+    end = midnight + to_timedelta(settings.working_hours_end or "18:00:00")
+    overnight = end <= start
+    if overnight:
+        end += timedelta(days=1)
+    
+    late_after = midnight + to_timedelta(settings.late_arrival_threshold or "09:30:00")
+    early_before = midnight + to_timedelta(settings.early_departure_threshold or "17:30:00")
+    if overnight:
+        # Thresholds before the start time refer to the morning after
+        if late_after < start:
+            late_after += timedelta(days=1)
+        if early_before < start:
+            early_before += timedelta(days=1)
+    
+    return {
+        "shift_type": None,
+        "source": "Settings",
+        "start": start,
+        "end": end,
+        "overnight": overnight,
+        "late_after": late_after,
+        "early_before": early_before,
+        "check_in_from": start - timedelta(minutes=DEFAULT_CHECK_IN_BEFORE_MINUTES),
+        "check_out_until": end + timedelta(minutes=DEFAULT_CHECK_OUT_AFTER_MINUTES)
+    }
+
+# doc_events: rebuild only what a change can affect
+
+def on_shift_assignment_change(doc, method=None):
+    if doc.employee and frappe.cache().hget(SHIFT_CALENDAR_KEY, doc.employee) is not None:
+        rebuild_employee_calendar(doc.employee)
+
+def on_employee_change(doc, method=None):
+    if doc.has_value_changed("default_shift") and frappe.cache().hget(SHIFT_CALENDAR_KEY, doc.name) is not None:
+        rebuild_employee_calendar(doc.name)
+
+def on_shift_calendar_source_change(doc, method=None):
+    """Shift Type or working hours changed: drop the calendar, it rebuilds lazily per employee"""
+    frappe.cache().delete_key(SHIFT_CALENDAR_KEY)
@@ -0,0 +1,281 @@
+# hrms_biometric/bio_facerecognition/api/streaming_export.py
+
+import frappe
+import csv
+import gzip
+import json
+import os
+import re
+from itertools import chain
+from datetime import datetime, date, timedelta
+from frappe.utils import getdate, cint
+
+from .utilities import get_unique_filename
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Rows held in memory at a time while an export is written
+CHUNK_SIZE = 5000
+
+ATTENDANCE_EXPORT_FIELDS = [
+    "name", "employee_id", "employee_name", "department", "attendance_date",
+    "check_in_time", "check_out_time", "total_hours", "attendance_type",
+    "kiosk_location", "confidence_score", "is_late", "is_early_departure",
+    "overtime_hours", "docstatus"
+]
+
+EXPORT_FORMATS = {
+    "csv": "csv",
+    "jsonl": "jsonl",
+    "xlsx": "xlsx",
+    "excel": "xlsx"
+}
+
+def to_filter_list(doctype, filters):
+    """Dict filters as a list, so the keyset condition can be appended"""
+    if not filters:
+        return []
+    if isinstance(filters, (list, tuple)):
+        return list(filters)
+    return [
+        [doctype, field, *value] if isinstance(value, (list, tuple)) else [doctype, field, "=", value]
+        for field, value in filters.items()
+    ]
+
+def iter_rows(doctype, fields, filters=None, chunk_size=CHUNK_SIZE):
+    """Rows of a doctype in name order, fetched a chunk at a time past the last name seen"""
+    fields = fields if "name" in fields else ["name"] + list(fields)
+    base_filters = to_filter_list(doctype, filters)
+    last_name = None
+    
+    while True:
+        chunk_filters = base_filters + ([[doctype, "name", ">", last_name]] if last_name is not None else [])
+        rows = frappe.get_all(
+            doctype,
+            filters=chunk_filters,
+            fields=fields,
+            order_by="name asc",
+            limit_page_length=chunk_size
+        )
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_name = rows[-1].name
+
+def iter_attendance_rows(start_date, end_date, filters=None, fields=None):
+    """Employee Attendance in date order, one day's keyset-paginated rows at a time"""
+    day, end_date = getdate(start_date), getdate(end_date)
+    while day <= end_date:
+        yield from iter_rows(
+            "Employee Attendance",
+            fields or ATTENDANCE_EXPORT_FIELDS,
+            dict(filters or {}, attendance_date=str(day))
+        )
+        day += timedelta(days=1)
+
+def format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, (date, timedelta)):
+        return str(value)
+    return value
+
+def peek_columns(rows):
+    """Columns of the first row, and the rows with that row put back in front"""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return [], iter(())
+    return list(first.keys()), chain([first], rows)
+
+def get_export_stem(filename, default="export"):
+    """Stem of a caller-supplied export name; the folder, a unique suffix and
+    the extension are always added server side"""
+    if not filename:
+        return default
+    if os.path.basename(filename) != filename or "\\" in filename or filename.startswith("."):
+        frappe.throw("Invalid export file name")
+    return re.sub(r"[^\w.-]+", "_", os.path.splitext(filename)[0]) or default
+
+def get_export_path(file_name):
+    """Path of a new file in private/files, created empty so an existing file is never overwritten"""
+    if os.path.basename(file_name) != file_name or file_name.startswith("."):
+        frappe.throw("Invalid export file name")
+    
+    folder = frappe.get_site_path("private", "files")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, file_name)
+    open(path, "x").close()
+    return path
+
+def open_text(path, compress=False):
+    """Text stream onto the export file, gzip-compressed as it is written when asked"""
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def write_csv(path, columns, rows, compress=False):
+    count = 0
+    with open_text(path, compress) as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([format_value(row.get(column)) for column in columns])
+            count += 1
+    return count
+
+def write_jsonl(path, columns, rows, compress=False):
+    count = 0
+    with open_text(path, compress) as f:
+        for row in rows:
+            f.write(json.dumps({column: format_value(row.get(column)) for column in columns}, default=str))
+            f.write("\n")
+            count += 1
+    return count
+
+def write_xlsx(path, columns, rows, sheet_name="Data"):
+    """One sheet written row by row; constant_memory flushes each row to disk as it goes"""
+    if not xlsxwriter:
+        frappe.throw("xlsxwriter library not available")
+    
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name)
+        header_format = get_header_format(workbook)
+        worksheet.write_row(0, 0, columns, header_format)
+        
+        count = 0
+        for count, row in enumerate(rows, 1):
+            worksheet.write_row(count, 0, [format_value(row.get(column)) for column in columns])
+    finally:
+        workbook.close()
+    return count
+
+def get_header_format(workbook):
+    return workbook.add_format({
+        'bold': True,
+        'bg_color': '#4F81BD',
+        'font_color': 'white',
+        'border': 1
+    })
+
+def register_export_file(file_name, path):
+    """File document for an export already on disk; the content is never read back"""
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "file_size": os.path.getsize(path),
+        "is_private": 1
+    })
+    file_doc.insert(ignore_permissions=True)
+    return file_doc
+
+def write_export(file_name, columns, rows, format_type="csv", compress=False):
+    """Stream rows into a private file as CSV, JSON lines or XLSX.
+    
+    XLSX is a zip archive already, so compress only applies to CSV and JSON lines.
+    """
+    file_format = EXPORT_FORMATS.get((format_type or "").lower())
+    if not file_format:
+        return {"success": False, "message": f"Unsupported format: {format_type}"}
+    
+    if os.path.splitext(file_name)[1].lower() != f".{file_format}":
+        file_name = f"{file_name}.{file_format}"
+    compress = bool(cint(compress)) and file_format != "xlsx"
+    if compress:
+        file_name += ".gz"
+    
+    # Only a file created here is ever removed again
+    path = get_export_path(file_name)
+    try:
+        if file_format == "csv":
+            count = write_csv(path, columns, rows, compress)
+        elif file_format == "jsonl":
+            count = write_jsonl(path, columns, rows, compress)
+        else:
+            count = write_xlsx(path, columns, rows)
+        file_doc = register_export_file(file_name, path)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    
+    return {
+        "success": True,
+        "file_url": file_doc.file_url,
+        "filename": file_name,
+        "records_exported": count,
+        "format": file_format
+    }
+
+def export_rows(rows, format_type="csv", filename=None, base_name="export", compress=False):
+    """Export dict rows, a list or any iterable, with the keys of the first row as columns"""
+    columns, rows = peek_columns(rows)
+    if not columns:
+        return {"success": False, "message": "No data to export"}
+    
+    file_format = EXPORT_FORMATS.get((format_type or "").lower(), format_type)
+    file_name = get_unique_filename(get_export_stem(filename, base_name), file_format)
+    return write_export(file_name, columns, rows, format_type, compress)
+
+def export_attendance(start_date, end_date, format_type="csv", compress=1, filters=None, user=None):
+    """Background job: raw attendance of a date range into a private file"""
+    start_date, end_date = getdate(start_date), getdate(end_date)
+    try:
+        result = write_export(
+            get_unique_filename(f"attendance_{start_date}_{end_date}", EXPORT_FORMATS.get(format_type, format_type)),
+            ATTENDANCE_EXPORT_FIELDS,
+            iter_attendance_rows(start_date, end_date, frappe.parse_json(filters) if filters else None),
+            format_type,
+            compress
+        )
+        frappe.db.commit()
+    except Exception as e:
+        frappe.log_error(f"Attendance export error: {str(e)}")
+        result = {"success": False, "message": str(e)}
+    
+    if user:
+        frappe.publish_realtime("attendance_export_ready", result, user=user)
+    return result
+
+@frappe.whitelist()
+def start_attendance_export(start_date, end_date, format_type="csv", compress=1, department=None, employee_id=None):
+    """Queue a raw attendance export; the file is announced on attendance_export_ready"""
+    try:
+        frappe.only_for(("System Manager", "HR Manager"))
+        
+        if getdate(start_date) > getdate(end_date):
+            return {"success": False, "message": "Start date must be before end date"}
+        if (format_type or "").lower() not in EXPORT_FORMATS:
+            return {"success": False, "message": f"Unsupported format: {format_type}"}
+        
+        filters = {}
+        if department:
+            filters["department"] = department
+        if employee_id:
+            filters["employee_id"] = employee_id
+        
+        frappe.enqueue(
+            "hrms_biometric.bio_facerecognition.api.streaming_export.export_attendance",
+            queue="long",
+            timeout=3600,
+            start_date=str(getdate(start_date)),
+            end_date=str(getdate(end_date)),
+            format_type=format_type.lower(),
+            compress=cint(compress),
+            filters=filters,
+            user=frappe.session.user
+        )
+        return {"success": True, "message": "Attendance export queued"}
+    
+    except frappe.PermissionError:
+        raise
+    except Exception as e:
+        frappe.log_error(f"Attendance export error: {str(e)}")
+        return {"success": False, "message": str(e)}
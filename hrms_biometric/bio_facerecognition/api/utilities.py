@@ -16,23 +16,19 @@ import base64
 # DATE AND TIME HELPERS
 # ================================
 
-def get_working_days_in_period(start_date, end_date, include_weekends=False):
-    """Get number of working days in a period"""
+def get_working_days_in_period(start_date, end_date, include_weekends=False, company=None):
+    """Get working days in a period, skipping the company's holidays"""
     try:
         if isinstance(start_date, str):
             start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
         if isinstance(end_date, str):
             end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
         
-        working_days = []
-        current_date = start_date
+        if include_weekends:
+            return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
         
-        while current_date <= end_date:
-            if include_weekends or current_date.weekday() < 5:  # Monday = 0, Sunday = 6
-                working_days.append(current_date)
-            current_date += timedelta(days=1)
-        
-        return working_days
+        from .working_calendar import get_working_days
+        return get_working_days(start_date, end_date, company)
         
     except Exception as e:
         frappe.log_error(f"Working days calculation error: {str(e)}")
@@ -130,48 +126,9 @@ def convert_timezone(dt, from_tz="UTC", to_tz="Asia/Kolkata"):
 def export_to_csv_helper(data, filename=None):
     """Export data to CSV format"""
     try:
-        if not data:
-            return {"success": False, "message": "No data to export"}
-        
-        output = io.StringIO()
-        
-        # Get field names from first record
-        fieldnames = list(data[0].keys()) if data else []
-        
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for row in data:
-            # Convert datetime objects to strings
-            formatted_row = {}
-            for key, value in row.items():
-                if isinstance(value, datetime):
-                    formatted_row[key] = value.strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    formatted_row[key] = value
-            writer.writerow(formatted_row)
-        
-        csv_content = output.getvalue()
-        output.close()
-        
-        # Save as file
-        if not filename:
-            filename = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        file_doc = frappe.get_doc({
-            "doctype": "File",
-            "file_name": filename,
-            "content": csv_content,
-            "is_private": 1
-        })
-        file_doc.insert(ignore_permissions=True)
-        
-        return {
-            "success": True,
-            "file_url": file_doc.file_url,
-            "filename": filename,
-            "records_exported": len(data)
-        }
+        # Rows go straight to disk, so data may be any iterable of dicts
+        from .streaming_export import export_rows
+        return export_rows(data, "csv", filename)
         
     except Exception as e:
         return {"success": False, "message": str(e)}
@@ -285,14 +242,14 @@ def optimize_database_query(doctype, filters, fields, limit=None):
 def cache_expensive_operation(key, operation, timeout=3600):
     """Cache expensive operations"""
     try:
-        # Try to get from cache first
+        # Try to get from cache first; results are wrapped so empty ones count as hits
         cached_result = frappe.cache().get_value(key)
-        if cached_result:
-            return json.loads(cached_result)
+        if cached_result is not None:
+            return cached_result["result"]
         
         # Execute operation and cache result
         result = operation()
-        frappe.cache().set_value(key, json.dumps(result, default=str), timeout)
+        frappe.cache().set_value(key, {"result": result}, expires_in_sec=timeout)
         
         return result
         
@@ -579,6 +536,6 @@ def get_unique_filename(base_name, extension):
     """Generate unique filename to avoid conflicts"""
     try:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-        return f"{base_name}_{timestamp}.{extension}"
+        return f"{base_name}_{timestamp}_{frappe.generate_hash(length=6)}.{extension}"
     except:
         return f"{base_name}.{extension}"
\ No newline at end of file
@@ -0,0 +1,100 @@
+# hrms_biometric/bio_facerecognition/api/working_calendar.py
+
+import frappe
+import numpy as np
+from datetime import timedelta
+from frappe.utils import getdate
+
+from .analytics_cache import RESULT_KEY_PREFIX
+
+# (company, start, end) -> weekmask and holidays, cleared when a Holiday List or Company changes
+WORKING_CALENDAR_KEY = "working_calendar"
+
+# Without a Holiday List, Monday to Friday are working days
+DEFAULT_WEEKMASK = "1111100"
+# A Holiday List carries its weekly offs as holidays, so every weekday counts
+HOLIDAY_LIST_WEEKMASK = "1111111"
+
+def get_default_company():
+    return frappe.defaults.get_user_default("Company") or frappe.defaults.get_global_default("company")
+
+def get_holiday_list(company=None):
+    company = company or get_default_company()
+    if not company or not frappe.db.table_exists("Company"):
+        return None
+    return frappe.get_cached_value("Company", company, "default_holiday_list")
+
+def get_calendar(start_date, end_date, company=None):
+    """Weekmask and holiday dates of the company's Holiday List over the range"""
+    start_date, end_date = getdate(start_date), getdate(end_date)
+    company = company or get_default_company() or ""
+    
+    def build():
+        holiday_list = get_holiday_list(company)
+        if not holiday_list or not frappe.db.table_exists("Holiday"):
+            return {"holiday_list": None, "weekmask": DEFAULT_WEEKMASK, "holidays": []}
+        
+        holidays = frappe.get_all(
+            "Holiday",
+            filters={"parent": holiday_list, "holiday_date": ["between", [start_date, end_date]]},
+            pluck="holiday_date"
+        )
+        return {
+            "holiday_list": holiday_list,
+            "weekmask": HOLIDAY_LIST_WEEKMASK,
+            "holidays": sorted({str(holiday) for holiday in holidays})
+        }
+    
+    return frappe.cache().hget(WORKING_CALENDAR_KEY, f"{company}|{start_date}|{end_date}", generator=build)
+
+def get_busdaycalendar(start_date, end_date, company=None):
+    calendar = get_calendar(start_date, end_date, company)
+    return np.busdaycalendar(
+        weekmask=calendar["weekmask"],
+        holidays=np.array(calendar["holidays"], dtype="datetime64[D]")
+    )
+
+def get_day_range(start_date, end_date):
+    """Start and exclusive end as numpy days, the end clamped so an empty range counts zero"""
+    start = np.datetime64(getdate(start_date), "D")
+    end = np.datetime64(getdate(end_date) + timedelta(days=1), "D")
+    return start, max(start, end)
+
+def count_working_days(start_date, end_date, company=None):
+    """Working days from start_date to end_date inclusive"""
+    start, end = get_day_range(start_date, end_date)
+    return int(np.busday_count(start, end, busdaycal=get_busdaycalendar(start_date, end_date, company)))
+
+def get_working_days(start_date, end_date, company=None):
+    """Working dates from start_date to end_date inclusive"""
+    start, end = get_day_range(start_date, end_date)
+    days = np.arange(start, end, dtype="datetime64[D]")
+    working = np.is_busday(days, busdaycal=get_busdaycalendar(start_date, end_date, company))
+    return days[working].tolist()
+
+def count_calendar_days(start_date, end_date):
+    return max(0, (getdate(end_date) - getdate(start_date)).days + 1)
+
+def get_employee_companies(employee_ids):
+    if not employee_ids or not frappe.db.table_exists("Employee"):
+        return {}
+    return dict(frappe.get_all(
+        "Employee",
+        filters={"name": ["in", list(employee_ids)]},
+        fields=["name", "company"],
+        as_list=True
+    ))
+
+def get_employee_working_days(employee_ids, start_date, end_date):
+    """Working days in the range per employee, counted once per company"""
+    companies = get_employee_companies(employee_ids)
+    counts = {}
+    for company in set(companies.get(employee_id) for employee_id in employee_ids):
+        counts[company] = count_working_days(start_date, end_date, company)
+    return {employee_id: counts[companies.get(employee_id)] for employee_id in employee_ids}
+
+def clear_working_calendar_cache(doc=None, method=None):
+    """doc_event: Holiday List and Company changes invalidate every cached calendar,
+    and the cached analytics whose attendance rates were computed from them"""
+    frappe.cache().delete_value(WORKING_CALENDAR_KEY)
+    frappe.cache().delete_keys(RESULT_KEY_PREFIX)
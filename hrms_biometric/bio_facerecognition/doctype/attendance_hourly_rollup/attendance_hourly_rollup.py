@@ -0,0 +1,18 @@
+# Copyright (c) 2026, BluePhoenix and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class AttendanceHourlyRollup(Document):
+	pass
+
+
+def on_doctype_update():
+	# One row per cell, so rollup upserts can rely on ON DUPLICATE KEY
+	frappe.db.add_unique(
+		"Attendance Hourly Rollup",
+		["attendance_date", "department", "kiosk_location", "hour"],
+		constraint_name="unique_rollup_cell"
+	)
@@ -26,395 +26,45 @@ frappe.ui.form.on('Attendance Kiosk', {
     }
 });
 
-function getAttendanceKioskHTML() {
-    return '<!DOCTYPE html>' +
-        '<html>' +
-        '<head>' +
-            '<title>Attendance Kiosk</title>' +
-            '<meta charset="utf-8">' +
-            '<meta name="viewport" content="width=device-width, initial-scale=1">' +
-            '<meta name="csrf-token" content="">' +
-            '<style>' +
-                '.kiosk-container {' +
-                    'display: flex;' +
-                    'flex-direction: column;' +
-                    'align-items: center;' +
-                    'padding: 30px;' +
-                    'background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);' +
-                    'min-height: 100vh;' +
-                    'font-family: Arial, sans-serif;' +
-                    'color: white;' +
-                '}' +
-                '.kiosk-header {' +
-                    'text-align: center;' +
-                    'margin-bottom: 40px;' +
-                '}' +
-                '.kiosk-header h1 {' +
-                    'font-size: 2.5em;' +
-                    'margin-bottom: 10px;' +
-                    'text-shadow: 2px 2px 4px rgba(0,0,0,0.3);' +
-                '}' +
-                '.kiosk-main {' +
-                    'display: flex;' +
-                    'gap: 40px;' +
-                    'max-width: 1200px;' +
-                    'width: 100%;' +
-                '}' +
-                '.camera-section {' +
-                    'flex: 2;' +
-                    'background: rgba(255,255,255,0.1);' +
-                    'border-radius: 20px;' +
-                    'padding: 30px;' +
-                '}' +
-                '#kiosk-video {' +
-                    'width: 100%;' +
-                    'height: 400px;' +
-                    'object-fit: cover;' +
-                    'border-radius: 15px;' +
-                    'background: #000;' +
-                '}' +
-                '.status-display {' +
-                    'background: rgba(255,255,255,0.2);' +
-                    'border-radius: 10px;' +
-                    'padding: 20px;' +
-                    'text-align: center;' +
-                    'margin: 20px 0;' +
-                '}' +
-                '.employee-display {' +
-                    'background: rgba(76, 175, 80, 0.2);' +
-                    'border-radius: 10px;' +
-                    'padding: 20px;' +
-                    'text-align: center;' +
-                    'display: none;' +
-                    'margin-bottom: 20px;' +
-                '}' +
-                '.employee-display.show { display: block; }' +
-                '.control-buttons {' +
-                    'display: flex;' +
-                    'gap: 15px;' +
-                    'justify-content: center;' +
-                    'flex-wrap: wrap;' +
-                '}' +
-                '.kiosk-btn {' +
-                    'padding: 15px 30px;' +
-                    'border: none;' +
-                    'border-radius: 25px;' +
-                    'font-size: 1.1em;' +
-                    'font-weight: 600;' +
-                    'cursor: pointer;' +
-                    'background: rgba(255,255,255,0.2);' +
-                    'color: white;' +
-                    'min-width: 150px;' +
-                '}' +
-                '.kiosk-btn.primary {' +
-                    'background: linear-gradient(45deg, #4CAF50, #45a049);' +
-                '}' +
-                '.info-section {' +
-                    'flex: 1;' +
-                    'display: flex;' +
-                    'flex-direction: column;' +
-                    'gap: 30px;' +
-                '}' +
-                '.clock-widget {' +
-                    'background: rgba(255,255,255,0.1);' +
-                    'border-radius: 20px;' +
-                    'padding: 30px;' +
-                    'text-align: center;' +
-                '}' +
-                '.digital-time {' +
-                    'font-size: 3em;' +
-                    'font-weight: bold;' +
-                    'margin-bottom: 10px;' +
-                '}' +
-                '@media (max-width: 768px) {' +
-                    '.kiosk-main { flex-direction: column; }' +
-                '}' +
-            '</style>' +
-        '</head>' +
-        '<body style="margin: 0; padding: 0;">' +
-            '<div class="kiosk-container">' +
-                '<div class="kiosk-header">' +
-                    '<h1>🏢 Employee Attendance System</h1>' +
-                    '<p>Position your face in front of the camera for automatic check-in/check-out</p>' +
-                '</div>' +
-                
-                '<div class="kiosk-main">' +
-                    '<div class="camera-section">' +
-                        '<video id="kiosk-video" autoplay muted playsinline></video>' +
-                        
-                        '<div id="status-display" class="status-display">' +
-                            '<div style="font-size: 2em; margin-bottom: 10px;">📷</div>' +
-                            '<div>Click "Start Camera" to begin</div>' +
-                        '</div>' +
-                        
-                        '<div id="employee-display" class="employee-display">' +
-                            '<h3 id="emp-name">Employee Name</h3>' +
-                            '<div style="margin-top: 10px;">' +
-                                '<div><strong>ID:</strong> <span id="emp-id">-</span></div>' +
-                                '<div><strong>Department:</strong> <span id="emp-dept">-</span></div>' +
-                                '<div><strong>Time:</strong> <span id="emp-time">-</span></div>' +
-                                '<div><strong>Status:</strong> <span id="emp-status">-</span></div>' +
-                            '</div>' +
-                        '</div>' +
-                        
-                        '<div class="control-buttons">' +
-                            '<button id="start-camera-btn" class="kiosk-btn primary">Start Camera</button>' +
-                            '<button id="stop-camera-btn" class="kiosk-btn" style="display: none;">Stop Camera</button>' +
-                            '<button id="test-recognition-btn" class="kiosk-btn">Test Recognition</button>' +
-                        '</div>' +
-                    '</div>' +
-                    
-                    '<div class="info-section">' +
-                        '<div class="clock-widget">' +
-                            '<div id="digital-time-display" class="digital-time">--:--:--</div>' +
-                            '<div id="digital-date-display">Loading...</div>' +
-                        '</div>' +
-                    '</div>' +
-                '</div>' +
-            '</div>' +
-            
-            '<script>' +
-                'var kioskData = {' +
-                    'stream: null,' +
-                    'canvas: null,' +
-                    'isProcessing: false,' +
-                    'lastRecognition: 0,' +
-                    'interval: null,' +
-                    'clockInterval: null' +
-                '};' +
-                
-                'function initKiosk() {' +
-                    'setTimeout(setupKiosk, 100);' +
-                '}' +
-                
-                'function setupKiosk() {' +
-                    'var video = document.getElementById("kiosk-video");' +
-                    'var startBtn = document.getElementById("start-camera-btn");' +
-                    'var stopBtn = document.getElementById("stop-camera-btn");' +
-                    'var testBtn = document.getElementById("test-recognition-btn");' +
-                    
-                    'if (!video || !startBtn) {' +
-                        'setTimeout(setupKiosk, 100);' +
-                        'return;' +
-                    '}' +
-                    
-                    'kioskData.canvas = document.createElement("canvas");' +
-                    
-                    'startBtn.addEventListener("click", startCamera);' +
-                    'stopBtn.addEventListener("click", stopCamera);' +
-                    'testBtn.addEventListener("click", testRecognition);' +
-                    
-                    'startClock();' +
-                '}' +
-                
-                'function startCamera() {' +
-                    'updateStatus("📷", "Starting camera...");' +
-                    
-                    'navigator.mediaDevices.getUserMedia({' +
-                        'video: { width: { ideal: 640 }, height: { ideal: 480 } }' +
-                    '}).then(function(stream) {' +
-                        'kioskData.stream = stream;' +
-                        'var video = document.getElementById("kiosk-video");' +
-                        'video.srcObject = stream;' +
-                        
-                        'video.onloadedmetadata = function() {' +
-                            'video.play();' +
-                            'kioskData.canvas.width = video.videoWidth;' +
-                            'kioskData.canvas.height = video.videoHeight;' +
-                            
-                            'updateStatus("✅", "Camera active");' +
-                            'document.getElementById("start-camera-btn").style.display = "none";' +
-                            'document.getElementById("stop-camera-btn").style.display = "inline-block";' +
-                            
-                            'startRecognition();' +
-                        '};' +
-                    '}).catch(function(error) {' +
-                        'updateStatus("❌", "Camera failed");' +
-                    '});' +
-                '}' +
-                
-                'function stopCamera() {' +
-                    'if (kioskData.stream) {' +
-                        'kioskData.stream.getTracks().forEach(function(track) {' +
-                            'track.stop();' +
-                        '});' +
-                        'kioskData.stream = null;' +
-                    '}' +
-                    'if (kioskData.interval) {' +
-                        'clearInterval(kioskData.interval);' +
-                    '}' +
-                    'var video = document.getElementById("kiosk-video");' +
-                    'if (video) video.srcObject = null;' +
-                    
-                    'updateStatus("📷", "Camera stopped");' +
-                    'document.getElementById("start-camera-btn").style.display = "inline-block";' +
-                    'document.getElementById("stop-camera-btn").style.display = "none";' +
-                    'hideEmployee();' +
-                '}' +
-                
-                'function startRecognition() {' +
-                    'kioskData.interval = setInterval(function() {' +
-                        'if (!kioskData.isProcessing && kioskData.stream) {' +
-                            'performRecognition();' +
-                        '}' +
-                    '}, 3000);' +
-                '}' +
-                
-                'function performRecognition() {' +
-                    'var currentTime = Date.now();' +
-                    'if (currentTime - kioskData.lastRecognition < 5000) return;' +
-                    
-                    'try {' +
-                        'kioskData.isProcessing = true;' +
-                        'kioskData.lastRecognition = currentTime;' +
-                        
-                        'var video = document.getElementById("kiosk-video");' +
-                        'if (!video || !kioskData.canvas) return;' +
-                        
-                        'var ctx = kioskData.canvas.getContext("2d");' +
-                        'ctx.drawImage(video, 0, 0, kioskData.canvas.width, kioskData.canvas.height);' +
-                        'var imageData = kioskData.canvas.toDataURL("image/jpeg", 0.8);' +
-                        
-                        'updateStatus("🔍", "Analyzing...");' +
-                        
-                        'var headers = { "Content-Type": "application/json" };' +
-                        'var metaToken = document.querySelector("meta[name=csrf-token]");' +
-                        'if (metaToken) {' +
-                            'headers["X-Frappe-CSRF-Token"] = metaToken.getAttribute("content");' +
-                        '}' +
-                        
-                        'fetch("/api/method/hrms_biometric.bio_facerecognition.api.enhanced_face_recognition.recognize_face_from_camera", {' +
-                            'method: "POST",' +
-                            'headers: headers,' +
-                            'body: JSON.stringify({' +
-                                'captured_image: imageData,' +
-                                'kiosk_name: "Standalone_Kiosk"' +
-                            '})' +
-                        '}).then(function(response) {' +
-                            'return response.json();' +
-                        '}).then(function(data) {' +
-                            'var result = data.message || data;' +
-                            'if (result.success) {' +
-                                'showEmployee(result);' +
-                                'updateStatus("✅", "Success");' +
-                                'setTimeout(function() {' +
-                                    'hideEmployee();' +
-                                    'updateStatus("🔍", "Ready");' +
-                                '}, 4000);' +
-                            '} else {' +
-                                'updateStatus("👤", "Try again");' +
-                            '}' +
-                        '}).catch(function() {' +
-                            'updateStatus("❌", "Failed");' +
-                        '}).finally(function() {' +
-                            'kioskData.isProcessing = false;' +
-                        '});' +
-                    '} catch (error) {' +
-                        'kioskData.isProcessing = false;' +
-                    '}' +
-                '}' +
-                
-                'function testRecognition() {' +
-                    'if (!kioskData.stream) {' +
-                        'updateStatus("⚠️", "Start camera first");' +
-                        'return;' +
-                    '}' +
-                    'updateStatus("🧪", "Testing...");' +
-                    'performRecognition();' +
-                '}' +
-                
-                'function updateStatus(icon, message) {' +
-                    'var status = document.getElementById("status-display");' +
-                    'if (status) {' +
-                        'status.innerHTML = ' +
-                            '"<div style=\\"font-size: 2em; margin-bottom: 10px;\\">" + icon + "</div>" +' +
-                            '"<div>" + message + "</div>";' +
-                    '}' +
-                '}' +
-                
-                'function showEmployee(result) {' +
-                    'var empDisplay = document.getElementById("employee-display");' +
-                    'if (empDisplay) empDisplay.classList.add("show");' +
-                    
-                    'var empName = document.getElementById("emp-name");' +
-                    'var empId = document.getElementById("emp-id");' +
-                    'var empTime = document.getElementById("emp-time");' +
-                    
-                    'if (empName) empName.textContent = result.employee.employee_name;' +
-                    'if (empId) empId.textContent = result.employee.employee_id;' +
-                    'if (empTime) empTime.textContent = new Date().toLocaleTimeString();' +
-                '}' +
-                
-                'function hideEmployee() {' +
-                    'var empDisplay = document.getElementById("employee-display");' +
-                    'if (empDisplay) empDisplay.classList.remove("show");' +
-                '}' +
-                
-                'function startClock() {' +
-                    'function updateTime() {' +
-                        'var now = new Date();' +
-                        'var timeDisplay = document.getElementById("digital-time-display");' +
-                        'var dateDisplay = document.getElementById("digital-date-display");' +
-                        
-                        'if (timeDisplay) {' +
-                            'var h = now.getHours().toString().padStart(2, "0");' +
-                            'var m = now.getMinutes().toString().padStart(2, "0");' +
-                            'var s = now.getSeconds().toString().padStart(2, "0");' +
-                            'timeDisplay.textContent = h + ":" + m + ":" + s;' +
-                        '}' +
-                        
-                        'if (dateDisplay) {' +
-                            'dateDisplay.textContent = now.toLocaleDateString();' +
-                        '}' +
-                    '}' +
-                    'updateTime();' +
-                    'kioskData.clockInterval = setInterval(updateTime, 1000);' +
-                '}' +
-                
-                'function cleanup() {' +
-                    'if (kioskData.stream) {' +
-                        'kioskData.stream.getTracks().forEach(function(track) {' +
-                            'track.stop();' +
-                        '});' +
-                    '}' +
-                    'if (kioskData.interval) clearInterval(kioskData.interval);' +
-                    'if (kioskData.clockInterval) clearInterval(kioskData.clockInterval);' +
-                '}' +
-                
-                'document.addEventListener("DOMContentLoaded", initKiosk);' +
-                'window.addEventListener("beforeunload", cleanup);' +
-            '</script>' +
-        '</body>' +
-        '</html>';
-}
-
 function launchKioskInterface(frm) {
+    if (frm.is_new()) {
+        frappe.show_alert({ message: 'Please save the kiosk first', indicator: 'orange' });
+        return;
+    }
+    
+    // Open the window now so popup blockers treat it as user initiated
     var kioskWindow = window.open('', '_blank', 'fullscreen=yes,scrollbars=no,menubar=no,toolbar=no');
     
-    if (kioskWindow) {
-        var htmlContent = getAttendanceKioskHTML();
-        
-        // Add CSRF token to the HTML
-        if (frappe.csrf_token) {
-            htmlContent = htmlContent.replace(
-                '<meta name="csrf-token" content="">',
-                '<meta name="csrf-token" content="' + frappe.csrf_token + '">'
-            );
-        }
-        
-        kioskWindow.document.write(htmlContent);
-        kioskWindow.document.close();
-        
-        frappe.show_alert({
-            message: 'Kiosk interface launched in new window',
-            indicator: 'green'
-        });
-    } else {
+    if (!kioskWindow) {
         frappe.show_alert({
             message: 'Could not open kiosk window. Please check popup settings.',
             indicator: 'red'
         });
+        return;
     }
+    
+    frappe.call({
+        method: 'hrms_biometric.bio_facerecognition.api.offline_sync.get_kiosk_credentials',
+        args: { kiosk: frm.doc.name },
+        callback: function(response) {
+            var credentials = response.message;
+            
+            // The offline-capable kiosk app reads its credentials from the URL
+            // fragment (never sent to the server) and stores them on the device
+            kioskWindow.location.href = '/assets/hrms_biometric/kiosk/index.html#' +
+                'kiosk=' + encodeURIComponent(credentials.kiosk) +
+                '&name=' + encodeURIComponent(credentials.kiosk_name) +
+                '&secret=' + encodeURIComponent(credentials.secret);
+            
+            frappe.show_alert({
+                message: 'Kiosk interface launched in new window',
+                indicator: 'green'
+            });
+        },
+        error: function() {
+            kioskWindow.close();
+        }
+    });
 }
 
 // Embedded Kiosk (Separate namespace to avoid conflicts)
@@ -490,9 +140,20 @@ function getEmbeddedKioskHTML() {
 function initializeEmbeddedKiosk() {
     var embeddedStream = null;
     var embeddedCanvas = null;
+    var embeddedSessionId = null;
+    var embeddedFrameCounter = 0;
     var isEmbeddedProcessing = false;
-    var embeddedInterval = null;
+    var embeddedTimer = null;
     var embeddedClockInterval = null;
+    var embeddedStreaming = false;
+    var embeddedFramesInFlight = 0;
+    var embeddedPausedUntil = 0;
+    var embeddedLastReplyAt = 0;
+    var EMBEDDED_STREAM_INTERVAL = 500;
+    var EMBEDDED_POLL_INTERVAL = 3000;
+    var EMBEDDED_FRAME_TIMEOUT = 10000;
+    // Frame size, JPEG quality and capture delay suggested by the server
+    var embeddedHints = { frame_width: null, jpeg_quality: 0.8, poll_delay_ms: null };
     
     setTimeout(function() {
         setupEmbeddedElements();
@@ -520,6 +181,8 @@ function initializeEmbeddedKiosk() {
     
     function startEmbeddedCamera() {
         updateEmbeddedStatus('📷', 'Starting camera...');
+        embeddedSessionId = Date.now().toString(36) + Math.random().toString(36).slice(2);
+        embeddedFrameCounter = 0;
         
         navigator.mediaDevices.getUserMedia({
             video: { width: { ideal: 640 }, height: { ideal: 480 }, facingMode: 'user' }
@@ -530,8 +193,7 @@ function initializeEmbeddedKiosk() {
             
             video.onloadedmetadata = function() {
                 video.play();
-                embeddedCanvas.width = video.videoWidth;
-                embeddedCanvas.height = video.videoHeight;
+                resizeEmbeddedCanvas();
                 
                 updateEmbeddedStatus('✅', 'Camera active - Position your face');
                 document.getElementById('embedded-start').style.display = 'none';
@@ -549,9 +211,8 @@ function initializeEmbeddedKiosk() {
             embeddedStream.getTracks().forEach(function(track) { track.stop(); });
             embeddedStream = null;
         }
-        if (embeddedInterval) {
-            clearInterval(embeddedInterval);
-        }
+        clearTimeout(embeddedTimer);
+        stopEmbeddedStream();
         
         var video = document.getElementById('embedded-video');
         if (video) video.srcObject = null;
@@ -563,11 +224,154 @@ function initializeEmbeddedKiosk() {
     }
     
     function startEmbeddedRecognition() {
-        embeddedInterval = setInterval(function() {
-            if (!isEmbeddedProcessing && embeddedStream) {
+        if (isEmbeddedSocketConnected()) {
+            startEmbeddedStream();
+        } else {
+            startEmbeddedPolling();
+        }
+    }
+    
+    // Fallback when there is no realtime connection
+    function startEmbeddedPolling() {
+        embeddedTimer = setTimeout(function() {
+            if (!embeddedStream) return;
+            if (!isEmbeddedProcessing) {
                 performEmbeddedRecognition();
             }
-        }, 3000);
+            startEmbeddedPolling();
+        }, embeddedHints.poll_delay_ms || EMBEDDED_POLL_INTERVAL);
+    }
+    
+    function scheduleEmbeddedFrame() {
+        embeddedTimer = setTimeout(function() {
+            if (!embeddedStream || !embeddedStreaming) return;
+            sendEmbeddedFrame();
+            if (embeddedStreaming) scheduleEmbeddedFrame();
+        }, getEmbeddedStreamDelay());
+    }
+    
+    function getEmbeddedStreamDelay() {
+        // Streaming keeps its short interval and only slows by the back-off above the idle poll delay
+        var backoff = (embeddedHints.poll_delay_ms || 0) - EMBEDDED_POLL_INTERVAL;
+        return Math.max(EMBEDDED_STREAM_INTERVAL, EMBEDDED_STREAM_INTERVAL + backoff);
+    }
+    
+    function applyEmbeddedHints(hints) {
+        if (!hints) return;
+        embeddedHints = {
+            frame_width: hints.frame_width || null,
+            jpeg_quality: hints.jpeg_quality || 0.8,
+            poll_delay_ms: hints.poll_delay_ms || null
+        };
+        resizeEmbeddedCanvas();
+    }
+    
+    function resizeEmbeddedCanvas() {
+        // Send frames no larger than the server needs for the faces at this kiosk
+        var video = document.getElementById('embedded-video');
+        if (!video || !video.videoWidth || !embeddedCanvas) return;
+        
+        var width = Math.min(video.videoWidth, embeddedHints.frame_width || video.videoWidth);
+        embeddedCanvas.width = width;
+        embeddedCanvas.height = Math.round(video.videoHeight * width / video.videoWidth);
+    }
+    
+    function isEmbeddedSocketConnected() {
+        return frappe.realtime && frappe.realtime.socket && frappe.realtime.socket.connected;
+    }
+    
+    function startEmbeddedStream() {
+        var socket = frappe.realtime.socket;
+        
+        // Streamed frames are recognised by background workers; make sure
+        // they are running before the first frame goes out
+        frappe.call({
+            method: 'hrms_biometric.bio_facerecognition.api.kiosk_stream.start_frame_workers',
+            callback: function() {
+                socket.emit('kiosk_stream_start', {
+                    kiosk_name: 'Embedded_Kiosk',
+                    session_id: embeddedSessionId
+                }, onEmbeddedStreamStarted);
+            },
+            error: function() {
+                startEmbeddedPolling();
+            }
+        });
+    }
+    
+    function onEmbeddedStreamStarted(response) {
+        var socket = frappe.realtime.socket;
+        
+        if (!response || !response.success) {
+            startEmbeddedPolling();
+            return;
+        }
+        
+        embeddedStreaming = true;
+        embeddedLastReplyAt = Date.now();
+        socket.on('kiosk_frame_result', onEmbeddedFrameResult);
+        socket.on('kiosk_frame_dropped', onEmbeddedFrameDropped);
+        scheduleEmbeddedFrame();
+    }
+    
+    function stopEmbeddedStream() {
+        if (!embeddedStreaming) return;
+        
+        embeddedStreaming = false;
+        embeddedFramesInFlight = 0;
+        frappe.realtime.socket.off('kiosk_frame_result', onEmbeddedFrameResult);
+        frappe.realtime.socket.off('kiosk_frame_dropped', onEmbeddedFrameDropped);
+        frappe.realtime.socket.emit('kiosk_stream_stop');
+    }
+    
+    function sendEmbeddedFrame() {
+        // The server keeps only the newest waiting frame, so one in flight and
+        // one waiting is all the kiosk needs to send
+        if (embeddedFramesInFlight && Date.now() - embeddedLastReplyAt > EMBEDDED_FRAME_TIMEOUT) {
+            // A frame that expired server side never gets an answer
+            embeddedFramesInFlight = 0;
+        }
+        if (!embeddedStream || !embeddedStreaming || embeddedFramesInFlight >= 2 || Date.now() < embeddedPausedUntil) {
+            return;
+        }
+        if (!isEmbeddedSocketConnected()) {
+            clearTimeout(embeddedTimer);
+            stopEmbeddedStream();
+            startEmbeddedPolling();
+            return;
+        }
+        
+        var video = document.getElementById('embedded-video');
+        if (!video || !embeddedCanvas) return;
+        
+        var ctx = embeddedCanvas.getContext('2d');
+        ctx.drawImage(video, 0, 0, embeddedCanvas.width, embeddedCanvas.height);
+        embeddedFramesInFlight++;
+        
+        embeddedCanvas.toBlob(function(blob) {
+            if (!blob) {
+                embeddedFramesInFlight--;
+                return;
+            }
+            blob.arrayBuffer().then(function(buffer) {
+                frappe.realtime.socket.emit('kiosk_frame', {
+                    frame_id: embeddedSessionId + '-' + (++embeddedFrameCounter),
+                    mime_type: 'image/jpeg'
+                }, buffer);
+            });
+        }, 'image/jpeg', embeddedHints.jpeg_quality);
+    }
+    
+    function onEmbeddedFrameResult(data) {
+        embeddedLastReplyAt = Date.now();
+        embeddedFramesInFlight = Math.max(0, embeddedFramesInFlight - 1);
+        handleEmbeddedResult(data.result);
+    }
+    
+    function onEmbeddedFrameDropped() {
+        // Superseded by a newer frame before the server got to it
+        embeddedLastReplyAt = Date.now();
+        embeddedFramesInFlight = Math.max(0, embeddedFramesInFlight - 1);
     }
     
     function performEmbeddedRecognition() {
@@ -579,7 +383,7 @@ function initializeEmbeddedKiosk() {
             
             var ctx = embeddedCanvas.getContext('2d');
             ctx.drawImage(video, 0, 0, embeddedCanvas.width, embeddedCanvas.height);
-            var imageData = embeddedCanvas.toDataURL('image/jpeg', 0.8);
+            var imageData = embeddedCanvas.toDataURL('image/jpeg', embeddedHints.jpeg_quality);
             
             updateEmbeddedStatus('🔍', 'Analyzing face...');
             
@@ -587,21 +391,12 @@ function initializeEmbeddedKiosk() {
                 method: 'hrms_biometric.bio_facerecognition.api.enhanced_face_recognition.recognize_face_from_camera',
                 args: {
                     captured_image: imageData,
-                    kiosk_name: 'Embedded_Kiosk'
+                    kiosk_name: 'Embedded_Kiosk',
+                    session_id: embeddedSessionId,
+                    frame_id: embeddedSessionId + '-' + (++embeddedFrameCounter)
                 },
                 callback: function(response) {
-                    var result = response.message;
-                    if (result && result.success) {
-                        showEmbeddedEmployee(result);
-                        updateEmbeddedStatus('✅', 'Attendance marked successfully');
-                        
-                        setTimeout(function() {
-                            hideEmbeddedEmployee();
-                            updateEmbeddedStatus('🔍', 'Ready for next employee');
-                        }, 4000);
-                    } else {
-                        updateEmbeddedStatus('👤', 'Position your face clearly');
-                    }
+                    handleEmbeddedResult(response.message);
                     isEmbeddedProcessing = false;
                 },
                 error: function(error) {
@@ -615,6 +410,23 @@ function initializeEmbeddedKiosk() {
         }
     }
     
+    function handleEmbeddedResult(result) {
+        applyEmbeddedHints(result && result.hints);
+        
+        if (result && result.success) {
+            showEmbeddedEmployee(result);
+            updateEmbeddedStatus('✅', 'Attendance marked successfully');
+            embeddedPausedUntil = Date.now() + 4000;
+            
+            setTimeout(function() {
+                hideEmbeddedEmployee();
+                updateEmbeddedStatus('🔍', 'Ready for next employee');
+            }, 4000);
+        } else if (Date.now() >= embeddedPausedUntil) {
+            updateEmbeddedStatus('👤', 'Position your face clearly');
+        }
+    }
+    
     function testEmbeddedRecognition() {
         if (!embeddedStream) {
             frappe.show_alert({ message: 'Please start the camera first', indicator: 'orange' });
@@ -675,7 +487,8 @@ function initializeEmbeddedKiosk() {
         if (embeddedStream) {
             embeddedStream.getTracks().forEach(function(track) { track.stop(); });
         }
-        if (embeddedInterval) clearInterval(embeddedInterval);
+        clearTimeout(embeddedTimer);
+        stopEmbeddedStream();
         if (embeddedClockInterval) clearInterval(embeddedClockInterval);
     }
     
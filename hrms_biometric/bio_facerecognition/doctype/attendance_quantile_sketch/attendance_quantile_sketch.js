@@ -0,0 +1,8 @@
+// Copyright (c) 2026, BluePhoenix and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Attendance Quantile Sketch", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,18 @@
+# Copyright (c) 2026, BluePhoenix and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class AttendanceQuantileSketch(Document):
+	pass
+
+
+def on_doctype_update():
+	# One sketch per cell and metric, so sketch writes can rely on INSERT IGNORE
+	frappe.db.add_unique(
+		"Attendance Quantile Sketch",
+		["attendance_date", "department", "kiosk_location", "metric"],
+		constraint_name="unique_sketch_cell"
+	)
@@ -1,8 +1,38 @@
 // Copyright (c) 2025, BluePhoenix and contributors
 // For license information, please see license.txt
 
-// frappe.ui.form.on("Attendance Report", {
-// 	refresh(frm) {
+frappe.ui.form.on('Attendance Report', {
+    refresh: function(frm) {
+        if (frm.is_new()) {
+            return;
+        }
 
-// 	},
-// });
+        if (frm.doc.status === 'Queued' || frm.doc.status === 'Running') {
+            frm.dashboard.show_progress(__('Generating report'), frm.doc.progress || 0);
+        } else {
+            frm.add_custom_button(__('Refresh Now'), function() {
+                frappe.call({
+                    method: 'hrms_biometric.bio_facerecognition.api.report_jobs.refresh_attendance_report',
+                    args: { report_id: frm.doc.name },
+                    callback: function() {
+                        frm.reload_doc();
+                    }
+                });
+            });
+        }
+    },
+
+    onload: function(frm) {
+        // Progress is pushed by the report job to the user who requested it
+        frappe.realtime.on('attendance_report_progress', function(data) {
+            if (data.report !== frm.doc.name) {
+                return;
+            }
+            if (data.status === 'Generated' || data.status === 'Failed') {
+                frm.reload_doc();
+            } else if (data.progress !== undefined) {
+                frm.dashboard.show_progress(__('Generating report'), data.progress);
+            }
+        });
+    }
+});
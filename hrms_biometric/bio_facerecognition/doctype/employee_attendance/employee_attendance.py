@@ -8,6 +8,8 @@ import frappe
 from frappe.model.document import Document
 from datetime import datetime
 
+from hrms_biometric.bio_facerecognition.api.attendance_metrics import set_punctuality_values
+
 class EmployeeAttendance(Document):
     def validate(self):
         # Auto-populate employee details
@@ -15,9 +17,28 @@ class EmployeeAttendance(Document):
             employee = frappe.get_doc("Employee Face Recognition", self.employee_id)
             self.employee_name = employee.employee_name
             self.department = employee.department
+        
+        set_punctuality_values(self)
     
     def before_submit(self):
         # Calculate total hours if both times are present
         if self.check_in_time and self.check_out_time:
             time_diff = self.check_out_time - self.check_in_time
-            self.total_hours = round(time_diff.total_seconds() / 3600, 2)
\ No newline at end of file
+            self.total_hours = round(time_diff.total_seconds() / 3600, 2)
+            set_punctuality_values(self)
+    
+    def before_update_after_submit(self):
+        # Check-outs are written onto the submitted check-in record
+        set_punctuality_values(self)
+
+
+def on_doctype_update():
+    # Analytics filter and group on the stored punctuality columns by date
+    frappe.db.add_index("Employee Attendance", ["attendance_date", "docstatus", "is_late"])
+    frappe.db.add_index("Employee Attendance", ["attendance_date", "docstatus", "check_in_hour"])
+    frappe.db.add_index("Employee Attendance", ["employee_id", "attendance_date", "overtime_hours"])
+    # Distinct employees per department and kiosk, which the hourly rollups cannot add up
+    frappe.db.add_index("Employee Attendance", ["attendance_date", "docstatus", "department", "employee_id"])
+    frappe.db.add_index("Employee Attendance", ["attendance_date", "docstatus", "kiosk_location", "employee_id"])
+    # Keyset pages of the analytics and payroll scans
+    frappe.db.add_index("Employee Attendance", ["attendance_date", "name"])
\ No newline at end of file
@@ -1,9 +1,152 @@
 # Copyright (c) 2025, BluePhoenix and Contributors
 # See license.txt
 
-# import frappe
+import datetime
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from hrms_biometric.bio_facerecognition.api import analytics_dashboard
+from hrms_biometric.bio_facerecognition.api.analytics_engine import compute_attendance_analytics
+from hrms_biometric.bio_facerecognition.api.attendance_rollup import ROW_FIELDS, apply_rollup_delta, get_delta
+
+# A range no real attendance falls in, so the fixture is all the queries see
+START_DATE = datetime.date(2001, 1, 1)
+END_DATE = datetime.date(2001, 1, 14)
+
+FIXTURE_FIELDS = [
+	"name", "creation", "modified", "owner", "modified_by", "docstatus",
+	"employee_id", "employee_name", "department", "kiosk_location", "attendance_date",
+	"check_in_time", "check_out_time", "attendance_type", "verification_status",
+	"confidence_score", "total_hours", "check_in_minute", "check_out_minute", "check_in_hour",
+	"is_late", "is_early_departure", "overtime_hours"
+]
+
+
+def make_fixture_rows():
+	"""Two weeks of punches, with NULL departments and kiosks, open sessions,
+	drafts, cancelled rows and overtime"""
+	employees = [
+		("TEST-EA-1", "Asha", "Sales", "Lobby"),
+		("TEST-EA-2", "Bram", "Sales", "Gate"),
+		("TEST-EA-3", "Chen", None, "Lobby"),
+		("TEST-EA-4", "Dana", "Plant", None),
+	]
+	rows = []
+	for day_offset in range(14):
+		attendance_date = START_DATE + datetime.timedelta(days=day_offset)
+		for index, (employee_id, employee_name, department, kiosk) in enumerate(employees):
+			if (day_offset + index) % 5 == 4:
+				continue
+
+			check_in_minute = 8 * 60 + 30 + (day_offset * 7 + index * 11) % 90
+			hours = [7.5, 8.25, 9.0, 10.5, 11.75][(day_offset + index) % 5]
+			open_session = (day_offset + index) % 7 == 3
+			check_out_minute = None if open_session else min(1439, check_in_minute + int(hours * 60))
+			check_in_time = datetime.datetime.combine(attendance_date, datetime.time(check_in_minute // 60, check_in_minute % 60))
+			creation = check_in_time + datetime.timedelta(minutes=index)
+
+			rows.append(frappe._dict(
+				name=f"TEST-EA-{day_offset:02d}-{index}",
+				creation=creation,
+				modified=creation,
+				owner="Administrator",
+				modified_by="Administrator",
+				docstatus=[1, 1, 1, 1, 1, 0, 2][(day_offset + index) % 7],
+				employee_id=employee_id,
+				employee_name=employee_name,
+				department=department,
+				kiosk_location=kiosk,
+				attendance_date=attendance_date,
+				check_in_time=check_in_time,
+				check_out_time=None if open_session else check_in_time + datetime.timedelta(minutes=int(hours * 60)),
+				attendance_type="Check In" if open_session else "Check Out",
+				verification_status=["Verified", "Verified", "Failed"][(day_offset + index) % 3],
+				confidence_score=[72.5, 81.25, 90.0, 95.75][(day_offset + index) % 4],
+				total_hours=None if open_session else hours,
+				check_in_minute=check_in_minute,
+				check_out_minute=check_out_minute,
+				check_in_hour=check_in_minute // 60,
+				is_late=int(check_in_minute > 9 * 60 + 30),
+				is_early_departure=int(check_out_minute is not None and check_out_minute < 17 * 60 + 30),
+				overtime_hours=0 if open_session else max(0, hours - 9)
+			))
+	return rows
+
+
+def normalize(value):
+	"""Round floats and stringify dates so the two paths compare field by field"""
+	if isinstance(value, dict):
+		return {key: normalize(item) for key, item in value.items()}
+	if isinstance(value, (list, tuple)):
+		return [normalize(item) for item in value]
+	if isinstance(value, float):
+		return round(value, 2)
+	if isinstance(value, (datetime.date, datetime.datetime)):
+		return str(value)
+	return value
+
+
+def by_key(rows, key):
+	return sorted(normalize(rows), key=lambda row: str(row[key]))
+
 
 class TestEmployeeAttendance(FrappeTestCase):
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		rows = make_fixture_rows()
+		frappe.db.bulk_insert(
+			"Employee Attendance",
+			fields=FIXTURE_FIELDS,
+			values=[[row[field] for field in FIXTURE_FIELDS] for row in rows]
+		)
+		submitted = [frappe._dict({field: row.get(field) for field in ROW_FIELDS}) for row in rows if row.docstatus == 1]
+		apply_rollup_delta(get_delta([], submitted))
+		cls.engine = compute_attendance_analytics(START_DATE, END_DATE, batch_size=7)
+
+	def test_engine_matches_sql_sections(self):
+		self.assertEqual(
+			normalize(self.engine["accuracy_metrics"]),
+			normalize(analytics_dashboard.get_recognition_accuracy_metrics(START_DATE, END_DATE))
+		)
+		self.assertEqual(
+			by_key(self.engine["employee_patterns"], "employee_id"),
+			by_key(analytics_dashboard.get_employee_attendance_patterns(START_DATE, END_DATE), "employee_id")
+		)
+		self.assertEqual(
+			by_key(self.engine["overtime_stats"], "employee_id"),
+			by_key(analytics_dashboard.get_overtime_analysis(START_DATE, END_DATE), "employee_id")
+		)
+
+	def test_engine_matches_rollup_sections(self):
+		self.assertEqual(
+			normalize(self.engine["daily_trends"]),
+			normalize(analytics_dashboard.get_daily_attendance_trends(START_DATE, END_DATE))
+		)
+		self.assertEqual(
+			normalize(self.engine["peak_hours"]),
+			normalize(analytics_dashboard.get_peak_hours_analysis(START_DATE, END_DATE))
+		)
+		self.assertEqual(
+			normalize(self.engine["punctuality_stats"]),
+			normalize(analytics_dashboard.get_punctuality_statistics(START_DATE, END_DATE))
+		)
+		self.assertEqual(
+			by_key(self.engine["department_stats"], "department"),
+			by_key(analytics_dashboard.get_department_attendance_stats(START_DATE, END_DATE), "department")
+		)
+
+		# The rollups keep usage by date only, not by creation time
+		def without_usage(rows):
+			return [{key: value for key, value in row.items() if key not in ("first_usage", "last_usage")} for row in rows]
+
+		self.assertEqual(
+			by_key(without_usage(self.engine["location_stats"]), "kiosk_location"),
+			by_key(without_usage(analytics_dashboard.get_location_attendance_stats(START_DATE, END_DATE)), "kiosk_location")
+		)
+
+	def test_dashboard_keeps_null_departments(self):
+		patterns = {row["employee_id"]: row for row in self.engine["employee_patterns"]}
+		self.assertIsNone(patterns["TEST-EA-3"]["department"])
+		self.assertIn("Unknown", [row["department"] for row in self.engine["department_stats"]])
@@ -0,0 +1,9 @@
+# Copyright (c) 2026, BluePhoenix and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestKioskHeartbeatLog(FrappeTestCase):
+	pass
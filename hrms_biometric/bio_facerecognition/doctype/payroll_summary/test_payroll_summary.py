@@ -1,9 +1,107 @@
 # Copyright (c) 2025, BluePhoenix and Contributors
 # See license.txt
 
-# import frappe
+import datetime
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from hrms_biometric.bio_facerecognition.api.payroll_engine import compute_payroll
+from hrms_biometric.bio_facerecognition.api.payroll_integration import calculate_working_hours, get_employee_hourly_rate
+
+# A month no real attendance falls in, so the fixture is all the queries see
+START_DATE = datetime.date(2001, 2, 1)
+END_DATE = datetime.date(2001, 2, 28)
+
+FIXTURE_FIELDS = [
+	"name", "creation", "modified", "owner", "modified_by", "docstatus",
+	"employee_id", "employee_name", "department", "attendance_date",
+	"check_in_time", "check_out_time", "attendance_type", "total_hours"
+]
+
+EMPLOYEES = [
+	frappe._dict(employee_id="TEST-PS-1", employee_name="Asha", department="Sales"),
+	frappe._dict(employee_id="TEST-PS-2", employee_name="Bram", department=None),
+	frappe._dict(employee_id="TEST-PS-3", employee_name="Chen", department="Plant"),
+	# No attendance in the month
+	frappe._dict(employee_id="TEST-PS-4", employee_name="Dana", department="Plant"),
+]
+
+
+def make_fixture_rows():
+	"""A month of punches around the 09:00 and 18:00 boundaries, with open
+	sessions, drafts, cancelled rows, overtime and an employee nobody pays"""
+	rows = []
+	for day_offset in range(28):
+		attendance_date = START_DATE + datetime.timedelta(days=day_offset)
+		for index, employee_id in enumerate(["TEST-PS-1", "TEST-PS-2", "TEST-PS-3", "TEST-PS-X"]):
+			if (day_offset + index) % 6 == 5:
+				continue
+
+			# Seconds and microseconds either side of 09:00:00 and 18:00:00
+			check_in_time = datetime.datetime.combine(attendance_date, datetime.time(8, 58)) + datetime.timedelta(
+				seconds=(day_offset * 37 + index * 53) % 240, microseconds=(day_offset + index) % 3
+			)
+			hours = [8.5, 9.0, 9.02, 10.25, 11.75, 6.4][(day_offset + index) % 6]
+			open_session = (day_offset + index) % 7 == 3
+			check_out_time = None if open_session else check_in_time + datetime.timedelta(hours=hours)
+
+			rows.append([
+				f"TEST-PS-{day_offset:02d}-{index}", check_in_time, check_in_time, "Administrator", "Administrator",
+				[1, 1, 1, 1, 0, 1, 2, 1][(day_offset + index) % 8],
+				employee_id, employee_id, None, attendance_date,
+				check_in_time, check_out_time,
+				"Check In" if open_session else "Check Out",
+				None if open_session else round((check_out_time - check_in_time).total_seconds() / 3600, 2)
+			])
+	return rows
+
+
+def reference_payroll(employees, month, year):
+	"""generate_payroll_data's former per-employee loop"""
+	payroll_data = []
+	for employee in employees:
+		summary = calculate_working_hours(employee.employee_id, START_DATE, END_DATE)["summary"]
+		hourly_rate = get_employee_hourly_rate(employee.employee_id)
+		overtime_rate = hourly_rate * 1.5
+
+		basic_pay = summary["total_hours"] * hourly_rate
+		overtime_pay = summary["overtime_hours"] * overtime_rate
+		late_deduction = summary["late_days"] * (hourly_rate * 0.5)
+		gross_pay = basic_pay + overtime_pay - late_deduction
+
+		payroll_data.append({
+			"employee_id": employee.employee_id,
+			"employee_name": employee.employee_name,
+			"department": employee.department,
+			"month": month,
+			"year": year,
+			"working_hours": summary["total_hours"],
+			"overtime_hours": summary["overtime_hours"],
+			"late_days": summary["late_days"],
+			"working_days": summary["working_days"],
+			"attendance_percentage": summary["attendance_percentage"],
+			"hourly_rate": hourly_rate,
+			"basic_pay": round(basic_pay, 2),
+			"overtime_pay": round(overtime_pay, 2),
+			"late_deduction": round(late_deduction, 2),
+			"gross_pay": round(gross_pay, 2)
+		})
+	return payroll_data
+
 
 class TestPayrollSummary(FrappeTestCase):
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		frappe.db.bulk_insert("Employee Attendance", fields=FIXTURE_FIELDS, values=make_fixture_rows())
+
+	def test_compute_payroll_matches_per_employee_loop(self):
+		self.assertEqual(
+			compute_payroll(EMPLOYEES, 2, 2001, START_DATE, END_DATE),
+			reference_payroll(EMPLOYEES, 2, 2001)
+		)
+
+	def test_compute_payroll_without_employees(self):
+		# Attendance exists in the month, but there is nobody to pay
+		self.assertEqual(compute_payroll([], 2, 2001, START_DATE, END_DATE), [])
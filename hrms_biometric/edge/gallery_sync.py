@@ -0,0 +1,173 @@
+# hrms_biometric/edge/gallery_sync.py
+#
+# Keep a local copy of the face encoding gallery on an edge node (kiosk PC or
+# site server) in sync with the central site over a slow link. Needs only
+# numpy; authenticates with an API key of a user with the HR Manager role:
+#
+#   python -m hrms_biometric.edge.gallery_sync sync --url https://hr.example.com \
+#       --api-key <key> --api-secret <secret> --path /var/lib/hrms/gallery.npz
+#   python -m hrms_biometric.edge.gallery_sync verify --path /var/lib/hrms/gallery.npz
+#
+# The first sync downloads a full snapshot; later syncs pull only the delta
+# since the local version and verify the result against the server checksum.
+# Versions are int64 microseconds since 1970 of the latest gallery change.
+# The snapshot/delta format and checksum are shared with the server
+# (bio_facerecognition/api/gallery_snapshot.py), so this module must not
+# import frappe.
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+ENCODING_SIZE = 128
+API_PATH = "/api/method/hrms_biometric.bio_facerecognition.api.gallery_snapshot."
+
+def empty_gallery():
+    return {
+        "version": 0,
+        "employee_ids": np.array([], dtype=str),
+        "employee_names": np.array([], dtype=str),
+        "encodings": np.zeros((0, ENCODING_SIZE), dtype=np.float32),
+        "owners": np.zeros(0, dtype=np.int32),
+    }
+
+def gallery_checksum(gallery):
+    """SHA-256 over employees in id order and their encodings, independent of row order"""
+    digest = hashlib.sha256()
+    for index in np.argsort(gallery["employee_ids"], kind="stable"):
+        digest.update(str(gallery["employee_ids"][index]).encode("utf-8") + b"\0")
+        digest.update(np.ascontiguousarray(gallery["encodings"][gallery["owners"] == index], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+def pack(arrays):
+    """Compressed npz bytes"""
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+def unpack(content):
+    with np.load(io.BytesIO(content), allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+def load_gallery(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = unpack(f.read())
+    data["version"] = int(data["version"])
+    return data
+
+def save_gallery(path, gallery):
+    """Write atomically, so a kiosk reading the file never sees half a gallery"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(pack({
+            "version": np.int64(gallery["version"]),
+            "checksum": np.array(gallery_checksum(gallery)),
+            "employee_ids": gallery["employee_ids"],
+            "employee_names": gallery["employee_names"],
+            "encodings": gallery["encodings"],
+            "owners": gallery["owners"],
+        }))
+    os.replace(temporary_path, path)
+
+def apply_delta(gallery, delta):
+    """Drop removed and changed employees, then append the changed ones"""
+    if int(delta["base_version"]) != int(gallery["version"]):
+        raise ValueError("Delta is based on version {0}, local gallery is {1}".format(
+            int(delta["base_version"]), int(gallery["version"])))
+    
+    replaced = set(delta["removed"].tolist()) | set(delta["employee_ids"].tolist())
+    keep = np.array([employee_id not in replaced for employee_id in gallery["employee_ids"].tolist()], dtype=bool)
+    
+    # Renumber surviving owners to their new positions
+    new_index = np.cumsum(keep) - 1
+    row_keep = keep[gallery["owners"]] if len(gallery["owners"]) else np.zeros(0, dtype=bool)
+    owners = new_index[gallery["owners"][row_keep]].astype(np.int32)
+    kept_count = int(keep.sum())
+    
+    return {
+        "version": int(delta["version"]),
+        "employee_ids": np.concatenate([gallery["employee_ids"][keep], delta["employee_ids"]]),
+        "employee_names": np.concatenate([gallery["employee_names"][keep], delta["employee_names"]]),
+        "encodings": np.concatenate([gallery["encodings"][row_keep], delta["encodings"]]).astype(np.float32),
+        "owners": np.concatenate([owners, delta["owners"].astype(np.int32) + kept_count]),
+    }
+
+def fetch(url, api_key, api_secret, method, **params):
+    request = urllib.request.Request(
+        url.rstrip("/") + API_PATH + method + ("?" + urllib.parse.urlencode(params) if params else ""),
+        headers={"Authorization": "token {0}:{1}".format(api_key, api_secret)}
+    )
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return response.read()
+
+def sync(url, api_key, api_secret, path):
+    """Bring the local gallery up to the server version, returns the new version"""
+    gallery = load_gallery(path)
+    
+    if gallery is None:
+        content = fetch(url, api_key, api_secret, "download_gallery_snapshot")
+        gallery = unpack(content)
+        gallery["version"] = int(gallery["version"])
+        expected = str(gallery["checksum"])
+    else:
+        content = fetch(url, api_key, api_secret, "download_gallery_delta", since_version=gallery["version"])
+        delta = unpack(content)
+        if int(delta["version"]) == gallery["version"]:
+            return gallery["version"], 0
+        gallery = apply_delta(gallery, delta)
+        expected = str(delta["checksum"])
+    
+    if gallery_checksum(gallery) != expected:
+        raise ValueError("Gallery checksum mismatch after sync; delete the local file to resync")
+    
+    save_gallery(path, gallery)
+    return gallery["version"], len(content)
+
+def verify(path):
+    gallery = load_gallery(path)
+    if gallery is None:
+        raise ValueError("No gallery at {0}".format(path))
+    return gallery_checksum(gallery) == str(gallery["checksum"]), gallery
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync the face encoding gallery to an edge node")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    sync_parser = subparsers.add_parser("sync", help="Download a snapshot or the changes since the local version")
+    sync_parser.add_argument("--url", required=True)
+    sync_parser.add_argument("--api-key", required=True)
+    sync_parser.add_argument("--api-secret", required=True)
+    sync_parser.add_argument("--path", required=True)
+    
+    verify_parser = subparsers.add_parser("verify", help="Check the local gallery against its checksum")
+    verify_parser.add_argument("--path", required=True)
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.command == "sync":
+            version, transferred = sync(args.url, args.api_key, args.api_secret, args.path)
+            print("✅ Gallery at version {0} ({1} bytes transferred)".format(version, transferred))
+        else:
+            ok, gallery = verify(args.path)
+            print("{0} Gallery version {1}: {2} employees, {3} encodings".format(
+                "✅" if ok else "❌", gallery["version"], len(gallery["employee_ids"]), len(gallery["encodings"])))
+            return 0 if ok else 1
+    except Exception as e:
+        print("❌ {0}".format(e))
+        return 1
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,11 +23,85 @@ doc_events = {
     "Employee Face Recognition": {
         "after_insert": "hrms_biometric.bio_facerecognition.api.enhanced_face_recognition.process_face_encoding_on_save",
         "on_update": "hrms_biometric.bio_facerecognition.api.enhanced_face_recognition.process_face_encoding_on_save"
+    },
+    "Employee Attendance": {
+        "on_update": [
+            "hrms_biometric.bio_facerecognition.api.attendance_session_state.invalidate_session_state",
+            "hrms_biometric.bio_facerecognition.api.analytics_cache.on_attendance_change"
+        ],
+        "on_submit": [
+            "hrms_biometric.bio_facerecognition.api.attendance_rollup.update_rollup_on_attendance_change",
+            "hrms_biometric.bio_facerecognition.api.analytics_cache.on_attendance_change"
+        ],
+        "on_update_after_submit": [
+            "hrms_biometric.bio_facerecognition.api.attendance_session_state.invalidate_session_state",
+            "hrms_biometric.bio_facerecognition.api.attendance_rollup.update_rollup_on_attendance_change",
+            "hrms_biometric.bio_facerecognition.api.analytics_cache.on_attendance_change"
+        ],
+        "on_cancel": [
+            "hrms_biometric.bio_facerecognition.api.attendance_session_state.invalidate_session_state",
+            "hrms_biometric.bio_facerecognition.api.attendance_rollup.update_rollup_on_attendance_change",
+            "hrms_biometric.bio_facerecognition.api.analytics_cache.on_attendance_change"
+        ],
+        "on_trash": [
+            "hrms_biometric.bio_facerecognition.api.attendance_session_state.invalidate_session_state",
+            "hrms_biometric.bio_facerecognition.api.analytics_cache.on_attendance_change"
+        ]
+    },
+    "Attendance Kiosk": {
+        "on_update": "hrms_biometric.bio_facerecognition.api.attendance_metrics.on_kiosk_change",
+        "on_trash": "hrms_biometric.bio_facerecognition.api.attendance_metrics.on_kiosk_change"
+    },
+    "Shift Assignment": {
+        "on_submit": "hrms_biometric.bio_facerecognition.api.shift_calendar.on_shift_assignment_change",
+        "on_update_after_submit": "hrms_biometric.bio_facerecognition.api.shift_calendar.on_shift_assignment_change",
+        "on_cancel": "hrms_biometric.bio_facerecognition.api.shift_calendar.on_shift_assignment_change",
+        "on_trash": "hrms_biometric.bio_facerecognition.api.shift_calendar.on_shift_assignment_change"
+    },
+    "Employee": {
+        "on_update": "hrms_biometric.bio_facerecognition.api.shift_calendar.on_employee_change"
+    },
+    "Shift Type": {
+        "on_update": "hrms_biometric.bio_facerecognition.api.shift_calendar.on_shift_calendar_source_change"
+    },
+    "Face Recognition Settings": {
+        "on_update": "hrms_biometric.bio_facerecognition.api.shift_calendar.on_shift_calendar_source_change"
+    },
+    "Holiday List": {
+        "on_update": "hrms_biometric.bio_facerecognition.api.working_calendar.clear_working_calendar_cache",
+        "on_trash": "hrms_biometric.bio_facerecognition.api.working_calendar.clear_working_calendar_cache"
+    },
+    "Company": {
+        "on_update": "hrms_biometric.bio_facerecognition.api.working_calendar.clear_working_calendar_cache"
     }
 }
 
 # Scheduled Tasks - TEMPORARILY DISABLED until cv2 is installed
 scheduler_events = {
+    "cron": {
+        # Write buffered attendance captures to disk
+        "* * * * *": [
+            "hrms_biometric.bio_facerecognition.api.capture_storage.flush_capture_buffer",
+            # Safety net for queued punches whose drain job was skipped
+            "hrms_biometric.bio_facerecognition.api.attendance_queue.schedule_attendance_drain",
+            # Frame workers for kiosks streaming over the realtime socket
+            "hrms_biometric.bio_facerecognition.api.kiosk_stream.schedule_frame_workers"
+        ]
+    },
+    # Kiosk status history from the live Redis counters
+    "hourly": [
+        "hrms_biometric.bio_facerecognition.api.kiosk_status.flush_kiosk_status"
+    ],
+    # Expected shift per employee for the coming two weeks
+    "daily": [
+        "hrms_biometric.bio_facerecognition.api.shift_calendar.materialize_shift_calendar",
+        # Overlaps, missing check-outs and hours mismatches in recent attendance
+        "hrms_biometric.bio_facerecognition.api.attendance_integrity.nightly_attendance_integrity_scan",
+        # Attendance Reports marked Refresh Daily
+        "hrms_biometric.bio_facerecognition.api.report_jobs.refresh_scheduled_reports",
+        # Yesterday's attendance into the columnar history store
+        "hrms_biometric.bio_facerecognition.api.attendance_history.sync_attendance_history"
+    ],
     # Commented out until dependencies are installed
     # "daily": [
     #     "hrms_biometric.bio_facerecognition.api.enhanced_face_recognition.cleanup_old_attendance_images"
@@ -0,0 +1,19 @@
+# hrms_biometric/patches/v0_0/backfill_attendance_hourly_rollup.py
+
+import frappe
+
+from hrms_biometric.bio_facerecognition.api.attendance_rollup import rebuild_rollups
+
+
+def execute():
+    """Build the hourly attendance rollups from the existing attendance history"""
+    try:
+        print("📊 Building attendance hourly rollups via patch...")
+        
+        rebuild_rollups()
+        
+        print("✅ Attendance hourly rollups built via patch")
+        
+    except Exception as e:
+        frappe.log_error(f"Attendance rollup backfill patch error: {str(e)}")
+        print(f"❌ Attendance rollup backfill patch failed: {str(e)}")
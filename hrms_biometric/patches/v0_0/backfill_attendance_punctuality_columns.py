@@ -0,0 +1,23 @@
+# hrms_biometric/patches/v0_0/backfill_attendance_punctuality_columns.py
+
+import frappe
+
+from hrms_biometric.bio_facerecognition.api.attendance_metrics import backfill_punctuality_values
+from hrms_biometric.bio_facerecognition.api.attendance_rollup import rebuild_rollups
+
+
+def execute():
+    """Fill the stored punctuality columns of existing attendance and rebuild the rollups from them"""
+    try:
+        print("⏱️ Backfilling attendance punctuality columns via patch...")
+        
+        backfill_punctuality_values()
+        
+        # The hourly rollups read lateness, early departure and overtime from these columns
+        rebuild_rollups()
+        
+        print("✅ Attendance punctuality columns backfilled via patch")
+        
+    except Exception as e:
+        frappe.log_error(f"Attendance punctuality backfill patch error: {str(e)}")
+        print(f"❌ Attendance punctuality backfill patch failed: {str(e)}")
@@ -0,0 +1,19 @@
+# hrms_biometric/patches/v0_0/backfill_attendance_quantile_sketches.py
+
+import frappe
+
+from hrms_biometric.bio_facerecognition.api.attendance_sketch import rebuild_sketches
+
+
+def execute():
+    """Build the attendance quantile sketches from the existing attendance history"""
+    try:
+        print("📊 Building attendance quantile sketches via patch...")
+        
+        rebuild_sketches()
+        
+        print("✅ Attendance quantile sketches built via patch")
+        
+    except Exception as e:
+        frappe.log_error(f"Attendance sketch backfill patch error: {str(e)}")
+        print(f"❌ Attendance sketch backfill patch failed: {str(e)}")
@@ -0,0 +1,476 @@
+// Attendance kiosk app (served from /assets/hrms_biometric/kiosk/)
+//
+// Works offline: when the server cannot be reached, captures are signed with the
+// kiosk secret, stored in IndexedDB with their capture time and uploaded later
+// through offline_sync.ingest_kiosk_events. The kiosk is provisioned by opening
+// this page from the Attendance Kiosk form (#kiosk=..&name=..&secret=..); the
+// secret is imported as a non-extractable key and the fragment is removed.
+// WebCrypto needs a secure context, so serve the site over HTTPS.
+
+(function() {
+    var INGEST_URL = '/api/method/hrms_biometric.bio_facerecognition.api.offline_sync.ingest_kiosk_events';
+    var HEARTBEAT_URL = '/api/method/hrms_biometric.bio_facerecognition.api.offline_sync.kiosk_heartbeat';
+    var HEARTBEAT_INTERVAL = 60000;
+    var DB_NAME = 'hrms_biometric_kiosk';
+    var CAPTURE_INTERVAL = 3000;
+    var SUCCESS_COOLDOWN = 5000;
+    var SYNC_INTERVAL = 15000;
+    var SYNC_BATCH_SIZE = 20;
+    var REQUEST_TIMEOUT = 8000;
+    var MAX_BUFFERED_EVENTS = 2000;
+    // Mean grey-level change of a 32x24 thumbnail that counts as someone new
+    // in front of the camera; offline, unchanged scenes are not buffered
+    var SCENE_CHANGE_THRESHOLD = 12;
+
+    var kiosk = {
+        id: null,
+        name: null,
+        key: null,
+        db: null,
+        stream: null,
+        canvas: document.createElement('canvas'),
+        thumb: document.createElement('canvas'),
+        lastThumb: null,
+        sessionId: null,
+        frameCounter: 0,
+        lastSuccess: 0,
+        processing: false,
+        syncing: false,
+        captureTimer: null,
+        // Updated from the hints in every server response
+        hints: { frame_width: null, jpeg_quality: 0.8, poll_delay_ms: CAPTURE_INTERVAL }
+    };
+
+    // ---- IndexedDB ----
+
+    function openDatabase() {
+        return new Promise(function(resolve, reject) {
+            var request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = function() {
+                var db = request.result;
+                db.createObjectStore('config');
+                db.createObjectStore('events', { keyPath: 'frame_id' }).createIndex('captured_at', 'captured_at');
+            };
+            request.onsuccess = function() { resolve(request.result); };
+            request.onerror = function() { reject(request.error); };
+        });
+    }
+
+    function storeRequest(storeName, mode, action) {
+        return new Promise(function(resolve, reject) {
+            var transaction = kiosk.db.transaction(storeName, mode);
+            var request = action(transaction.objectStore(storeName));
+            transaction.oncomplete = function() { resolve(request && request.result); };
+            transaction.onerror = function() { reject(transaction.error); };
+        });
+    }
+
+    function getOldestEvents(limit) {
+        return new Promise(function(resolve, reject) {
+            var events = [];
+            var transaction = kiosk.db.transaction('events', 'readonly');
+            var cursor = transaction.objectStore('events').index('captured_at').openCursor();
+            cursor.onsuccess = function() {
+                var current = cursor.result;
+                if (current && events.length < limit) {
+                    events.push(current.value);
+                    current.continue();
+                }
+            };
+            transaction.oncomplete = function() { resolve(events); };
+            transaction.onerror = function() { reject(transaction.error); };
+        });
+    }
+
+    // ---- Provisioning and signing ----
+
+    function loadCredentials() {
+        var params = new URLSearchParams(window.location.hash.slice(1));
+
+        if (params.get('kiosk') && params.get('secret')) {
+            return importSecret(params.get('secret')).then(function(key) {
+                var config = { id: params.get('kiosk'), name: params.get('name') || params.get('kiosk'), key: key };
+                history.replaceState(null, '', window.location.pathname);
+                return storeRequest('config', 'readwrite', function(store) {
+                    return store.put(config, 'kiosk');
+                }).then(function() { return config; });
+            });
+        }
+
+        return storeRequest('config', 'readonly', function(store) {
+            return store.get('kiosk');
+        });
+    }
+
+    function importSecret(secret) {
+        return crypto.subtle.importKey(
+            'raw', new TextEncoder().encode(secret), { name: 'HMAC', hash: 'SHA-256' }, false, ['sign']
+        );
+    }
+
+    function toHex(buffer) {
+        return Array.prototype.map.call(new Uint8Array(buffer), function(byte) {
+            return byte.toString(16).padStart(2, '0');
+        }).join('');
+    }
+
+    function signEvent(event) {
+        var encoder = new TextEncoder();
+        return crypto.subtle.digest('SHA-256', encoder.encode(event.image)).then(function(imageHash) {
+            var message = [kiosk.id, event.frame_id, event.captured_at, toHex(imageHash)].join('|');
+            return crypto.subtle.sign('HMAC', kiosk.key, encoder.encode(message));
+        }).then(function(signature) {
+            event.signature = toHex(signature);
+            return event;
+        });
+    }
+
+    // ---- Upload ----
+
+    function postEvents(events) {
+        var controller = new AbortController();
+        var timeout = setTimeout(function() { controller.abort(); }, REQUEST_TIMEOUT);
+
+        // Kiosk requests are authenticated by their signature, not a login session
+        return fetch(INGEST_URL, {
+            method: 'POST',
+            credentials: 'omit',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ kiosk: kiosk.id, events: events }),
+            signal: controller.signal
+        }).then(function(response) {
+            if (!response.ok) throw new Error('HTTP ' + response.status);
+            return response.json();
+        }).then(function(data) {
+            var result = data.message || data;
+            if (!result.success) throw new Error(result.message || 'Upload failed');
+            if (result.hints) applyHints(result.hints);
+            return result.results;
+        }).finally(function() {
+            clearTimeout(timeout);
+        });
+    }
+
+    function sendHeartbeat() {
+        if (!navigator.onLine) return Promise.resolve();
+
+        return storeRequest('events', 'readonly', function(store) {
+            return store.count();
+        }).then(function(pendingEvents) {
+            // Signed like an event, with the status JSON in place of the image
+            return signEvent({
+                frame_id: 'heartbeat',
+                captured_at: new Date().toISOString(),
+                image: JSON.stringify({
+                    pending_events: pendingEvents,
+                    camera_active: !!kiosk.stream,
+                    user_agent: navigator.userAgent
+                })
+            });
+        }).then(function(event) {
+            return fetch(HEARTBEAT_URL, {
+                method: 'POST',
+                credentials: 'omit',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    kiosk: kiosk.id,
+                    sent_at: event.captured_at,
+                    status: event.image,
+                    signature: event.signature
+                })
+            });
+        }).catch(function() {
+            // Missed heartbeats are how the server notices the kiosk is offline
+        });
+    }
+
+    function bufferEvent(event) {
+        return storeRequest('events', 'readonly', function(store) {
+            return store.count();
+        }).then(function(count) {
+            if (count >= MAX_BUFFERED_EVENTS) {
+                updateStatus('⚠️', 'Offline storage full');
+                return;
+            }
+            return storeRequest('events', 'readwrite', function(store) {
+                return store.put(event);
+            }).then(function() {
+                updateStatus('💾', 'Saved offline, will sync later');
+                updatePending();
+            });
+        });
+    }
+
+    function syncBufferedEvents() {
+        if (kiosk.syncing || !navigator.onLine) return Promise.resolve();
+        kiosk.syncing = true;
+
+        function syncBatch() {
+            return getOldestEvents(SYNC_BATCH_SIZE).then(function(events) {
+                if (!events.length) return;
+
+                return postEvents(events).then(function(results) {
+                    // Anything the server answered definitively is done; errors stay buffered
+                    var done = results.filter(function(result) {
+                        return result.status !== 'error';
+                    });
+                    return storeRequest('events', 'readwrite', function(store) {
+                        done.forEach(function(result) { store.delete(result.frame_id); });
+                    }).then(function() {
+                        if (done.length && events.length === SYNC_BATCH_SIZE) return syncBatch();
+                    });
+                });
+            });
+        }
+
+        return syncBatch().catch(function() {
+            // Still unreachable; try again on the next interval
+        }).finally(function() {
+            kiosk.syncing = false;
+            updatePending();
+        });
+    }
+
+    // ---- Capture ----
+
+    function startCamera() {
+        updateStatus('📷', 'Starting camera...');
+        kiosk.sessionId = Date.now().toString(36) + Math.random().toString(36).slice(2);
+        kiosk.frameCounter = 0;
+
+        navigator.mediaDevices.getUserMedia({
+            video: { width: { ideal: 640 }, height: { ideal: 480 } }
+        }).then(function(stream) {
+            kiosk.stream = stream;
+            var video = document.getElementById('kiosk-video');
+            video.srcObject = stream;
+
+            video.onloadedmetadata = function() {
+                video.play();
+                resizeCanvas();
+                kiosk.thumb.width = 32;
+                kiosk.thumb.height = 24;
+
+                updateStatus('✅', 'Camera active');
+                document.getElementById('start-camera-btn').style.display = 'none';
+                document.getElementById('stop-camera-btn').style.display = 'inline-block';
+                scheduleCapture();
+            };
+        }).catch(function() {
+            updateStatus('❌', 'Camera failed');
+        });
+    }
+
+    function stopCamera() {
+        if (kiosk.stream) {
+            kiosk.stream.getTracks().forEach(function(track) { track.stop(); });
+            kiosk.stream = null;
+        }
+        clearTimeout(kiosk.captureTimer);
+
+        var video = document.getElementById('kiosk-video');
+        if (video) video.srcObject = null;
+
+        updateStatus('📷', 'Camera stopped');
+        document.getElementById('start-camera-btn').style.display = 'inline-block';
+        document.getElementById('stop-camera-btn').style.display = 'none';
+        hideEmployee();
+    }
+
+    function applyHints(hints) {
+        kiosk.hints = {
+            frame_width: hints.frame_width || null,
+            jpeg_quality: hints.jpeg_quality || 0.8,
+            poll_delay_ms: hints.poll_delay_ms || CAPTURE_INTERVAL
+        };
+        resizeCanvas();
+    }
+
+    function resizeCanvas() {
+        // Send frames no larger than the server needs for the faces at this kiosk
+        var video = document.getElementById('kiosk-video');
+        if (!video || !video.videoWidth) return;
+
+        var width = Math.min(video.videoWidth, kiosk.hints.frame_width || video.videoWidth);
+        kiosk.canvas.width = width;
+        kiosk.canvas.height = Math.round(video.videoHeight * width / video.videoWidth);
+    }
+
+    function scheduleCapture() {
+        // Online, the server sets the pace; offline, captures are only buffered
+        var delay = navigator.onLine ? kiosk.hints.poll_delay_ms : CAPTURE_INTERVAL;
+
+        kiosk.captureTimer = setTimeout(function() {
+            if (!kiosk.stream) return;
+            if (kiosk.processing || Date.now() - kiosk.lastSuccess < SUCCESS_COOLDOWN) {
+                scheduleCapture();
+                return;
+            }
+            captureFrame().finally(scheduleCapture);
+        }, delay);
+    }
+
+    function sceneChanged() {
+        var ctx = kiosk.thumb.getContext('2d');
+        ctx.drawImage(kiosk.canvas, 0, 0, kiosk.thumb.width, kiosk.thumb.height);
+        var pixels = ctx.getImageData(0, 0, kiosk.thumb.width, kiosk.thumb.height).data;
+        var grey = new Uint8Array(pixels.length / 4);
+        for (var i = 0; i < grey.length; i++) {
+            grey[i] = (pixels[i * 4] * 299 + pixels[i * 4 + 1] * 587 + pixels[i * 4 + 2] * 114) / 1000;
+        }
+
+        var previous = kiosk.lastThumb;
+        kiosk.lastThumb = grey;
+        if (!previous) return true;
+
+        var difference = 0;
+        for (var j = 0; j < grey.length; j++) {
+            difference += Math.abs(grey[j] - previous[j]);
+        }
+        return difference / grey.length > SCENE_CHANGE_THRESHOLD;
+    }
+
+    function captureFrame() {
+        kiosk.processing = true;
+
+        var video = document.getElementById('kiosk-video');
+        kiosk.canvas.getContext('2d').drawImage(video, 0, 0, kiosk.canvas.width, kiosk.canvas.height);
+        var changed = sceneChanged();
+
+        if (!navigator.onLine && !changed) {
+            kiosk.processing = false;
+            return Promise.resolve();
+        }
+
+        var event = {
+            frame_id: kiosk.sessionId + '-' + (++kiosk.frameCounter),
+            captured_at: new Date().toISOString(),
+            image: kiosk.canvas.toDataURL('image/jpeg', kiosk.hints.jpeg_quality)
+        };
+
+        return signEvent(event).then(function(signedEvent) {
+            if (!navigator.onLine) {
+                return bufferEvent(signedEvent);
+            }
+
+            updateStatus('🔍', 'Analyzing...');
+            return postEvents([signedEvent]).then(function(results) {
+                var result = results[0] || {};
+                if (result.status === 'error') return bufferEvent(signedEvent);
+                showResult(result);
+            }, function() {
+                // Server unreachable: keep the punch with its original capture time
+                if (changed) return bufferEvent(signedEvent);
+                updateStatus('📡', 'Server unreachable');
+            });
+        }).catch(function() {
+            updateStatus('❌', 'Failed');
+        }).finally(function() {
+            kiosk.processing = false;
+        });
+    }
+
+    // ---- Display ----
+
+    function showResult(result) {
+        if (result.status === 'recorded' || result.status === 'queued') {
+            kiosk.lastSuccess = Date.now();
+            showEmployee(result);
+            updateStatus('✅', 'Welcome ' + result.employee_name + '!');
+            setTimeout(function() {
+                hideEmployee();
+                updateStatus('🔍', 'Ready');
+            }, 4000);
+        } else if (result.status === 'duplicate' && result.employee_name) {
+            updateStatus('✅', 'Already recorded');
+        } else {
+            updateStatus('👤', 'Try again');
+        }
+    }
+
+    function showEmployee(result) {
+        document.getElementById('employee-display').classList.add('show');
+        document.getElementById('emp-name').textContent = result.employee_name;
+        document.getElementById('emp-id').textContent = result.employee_id;
+        document.getElementById('emp-time').textContent = new Date().toLocaleTimeString();
+        document.getElementById('emp-status').textContent = (result.attendance && result.attendance.type) || '-';
+    }
+
+    function hideEmployee() {
+        document.getElementById('employee-display').classList.remove('show');
+    }
+
+    function updateStatus(icon, message) {
+        document.getElementById('status-display').innerHTML =
+            '<div class="status-icon">' + icon + '</div><div>' + message + '</div>';
+    }
+
+    function updatePending() {
+        storeRequest('events', 'readonly', function(store) {
+            return store.count();
+        }).then(function(count) {
+            document.getElementById('pending-display').textContent = count
+                ? count + ' punch' + (count === 1 ? '' : 'es') + ' waiting to sync'
+                : 'No punches waiting to sync';
+        });
+    }
+
+    function updateNetwork() {
+        var online = navigator.onLine;
+        document.getElementById('network-display').textContent = online ? 'Online' : 'Offline - punches are saved on this device';
+        document.getElementById('sync-widget').classList.toggle('offline', !online);
+        if (online) syncBufferedEvents();
+    }
+
+    function startClock() {
+        function updateTime() {
+            var now = new Date();
+            document.getElementById('digital-time-display').textContent = now.toLocaleTimeString([], { hour12: false });
+            document.getElementById('digital-date-display').textContent = now.toLocaleDateString();
+        }
+        updateTime();
+        setInterval(updateTime, 1000);
+    }
+
+    // ---- Start-up ----
+
+    function init() {
+        startClock();
+
+        if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.register('sw.js');
+        }
+
+        openDatabase().then(function(db) {
+            kiosk.db = db;
+            return loadCredentials();
+        }).then(function(config) {
+            if (!config) {
+                updateStatus('⚠️', 'Open this kiosk from its Attendance Kiosk record to set it up');
+                document.getElementById('start-camera-btn').disabled = true;
+                return;
+            }
+
+            kiosk.id = config.id;
+            kiosk.name = config.name;
+            kiosk.key = config.key;
+            document.getElementById('kiosk-name-display').textContent = kiosk.name;
+
+            document.getElementById('start-camera-btn').addEventListener('click', startCamera);
+            document.getElementById('stop-camera-btn').addEventListener('click', stopCamera);
+            document.getElementById('sync-now-btn').addEventListener('click', syncBufferedEvents);
+            window.addEventListener('online', updateNetwork);
+            window.addEventListener('offline', updateNetwork);
+            setInterval(syncBufferedEvents, SYNC_INTERVAL);
+            setInterval(sendHeartbeat, HEARTBEAT_INTERVAL);
+            sendHeartbeat();
+
+            updateNetwork();
+            updatePending();
+        }).catch(function() {
+            updateStatus('❌', 'Kiosk storage unavailable');
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', init);
+})();
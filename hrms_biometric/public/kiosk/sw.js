@@ -0,0 +1,56 @@
+// Service worker for the attendance kiosk app: keeps the page shell available
+// offline. API calls always go to the network; the page buffers punches itself.
+
+var CACHE_NAME = 'hrms-biometric-kiosk-v3';
+var SHELL_FILES = ['index.html', 'kiosk.js', 'manifest.json'];
+
+self.addEventListener('install', function(event) {
+    event.waitUntil(
+        caches.open(CACHE_NAME).then(function(cache) {
+            return cache.addAll(SHELL_FILES);
+        }).then(function() {
+            return self.skipWaiting();
+        })
+    );
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(
+        caches.keys().then(function(names) {
+            return Promise.all(names.filter(function(name) {
+                return name.indexOf('hrms-biometric-kiosk-') === 0 && name !== CACHE_NAME;
+            }).map(function(name) {
+                return caches.delete(name);
+            }));
+        }).then(function() {
+            return self.clients.claim();
+        })
+    );
+});
+
+self.addEventListener('fetch', function(event) {
+    var request = event.request;
+    if (request.method !== 'GET' || request.url.indexOf(self.registration.scope) !== 0) {
+        return;
+    }
+
+    // Serve the shell from cache and refresh it in the background
+    event.respondWith(
+        caches.open(CACHE_NAME).then(function(cache) {
+            return cache.match(request, { ignoreSearch: true }).then(function(cached) {
+                var network = fetch(request).then(function(response) {
+                    if (response.ok) {
+                        cache.put(request, response.clone());
+                    }
+                    return response;
+                });
+
+                if (cached) {
+                    network.catch(function() {});
+                    return cached;
+                }
+                return network;
+            });
+        })
+    );
+});
@@ -0,0 +1,138 @@
+// Realtime handlers loaded by Frappe's socket.io server for every connection.
+//
+// Kiosks stream camera frames as binary over their socket instead of polling
+// with a JSON request per frame. The socket server never recognises a frame
+// itself: it parks the raw bytes in Redis and a background worker
+// (api/kiosk_stream.py) picks them up, so a frame is never re-encoded or sent
+// through a second HTTP request. Only the newest frame per stream is kept, so
+// a kiosk that sends faster than the workers can process never builds up a
+// backlog: stale frames are dropped, not queued.
+
+const crypto = require("crypto");
+const { get_redis_subscriber } = require("../../../frappe/node_utils");
+
+const MAX_FRAME_BYTES = 2 * 1024 * 1024;
+// Workers drop frames that waited too long themselves (see MAX_FRAME_AGE_MS in
+// api/kiosk_stream.py); this only keeps an abandoned frame from lingering
+const FRAME_TTL_MS = 30000;
+// Workers keep running while frames arrived within this window
+const ACTIVE_STREAM_TTL_SECONDS = 120;
+
+// Key layout shared with api/kiosk_stream.py
+const KEY_PREFIX = "kiosk_frames";
+
+let redis_connection = null;
+
+function kiosk_stream_handlers(realtime, socket) {
+    let stream = null;
+    const site = socket.nsp.name.slice(1);
+
+    socket.on("kiosk_stream_start", (options, ack) => {
+        if (!socket.user || socket.user === "Guest") {
+            return reply(ack, { success: false, message: "Login required" });
+        }
+
+        options = options || {};
+        stream = {
+            stream_id: crypto.randomUUID(),
+            kiosk_name: options.kiosk_name || "Unknown",
+            session_id: options.session_id || null,
+        };
+        socket.join(get_room(stream.stream_id));
+        reply(ack, { success: true });
+    });
+
+    socket.on("kiosk_frame", (meta, frame) => {
+        if (!stream || !frame) return;
+
+        const bytes = Buffer.isBuffer(frame) ? frame : Buffer.from(frame);
+        if (bytes.length > MAX_FRAME_BYTES) {
+            socket.emit("kiosk_frame_result", {
+                frame_id: meta && meta.frame_id,
+                result: { success: false, message: "Frame too large" },
+            });
+            return;
+        }
+
+        park_frame(site, socket, stream, (meta && meta.frame_id) || null, bytes).catch(() => {
+            socket.emit("kiosk_frame_result", {
+                frame_id: meta && meta.frame_id,
+                result: { success: false, message: "Recognition failed" },
+            });
+        });
+    });
+
+    socket.on("kiosk_stream_stop", () => {
+        stop_stream(site, socket, stream);
+        stream = null;
+    });
+
+    socket.on("disconnect", () => {
+        stop_stream(site, socket, stream);
+        stream = null;
+    });
+}
+
+async function park_frame(site, socket, stream, frame_id, bytes) {
+    const client = await get_redis();
+    const frame_key = get_key(site, "frame", stream.stream_id);
+    const meta = JSON.stringify({
+        user: socket.user,
+        kiosk_name: stream.kiosk_name,
+        session_id: stream.session_id,
+        frame_id: frame_id,
+        received_at: Date.now(),
+    });
+
+    // Replacing the waiting frame and reading the one it replaces happen in
+    // one transaction, so a worker can never take a frame we report as dropped
+    const [superseded] = await client
+        .multi()
+        .hGet(frame_key, "frame_id")
+        .hSet(frame_key, { frame_id: frame_id || "", meta: meta, image: bytes })
+        .pExpire(frame_key, FRAME_TTL_MS)
+        .set(get_key(site, "active"), "1", { EX: ACTIVE_STREAM_TTL_SECONDS })
+        .exec();
+
+    if (superseded !== null && superseded !== undefined) {
+        // The stream is already on the ready list with the frame we just replaced
+        socket.emit("kiosk_frame_dropped", { frame_id: superseded || null });
+        return;
+    }
+    await client.rPush(get_key(site, "ready"), stream.stream_id);
+}
+
+function stop_stream(site, socket, stream) {
+    if (!stream) return;
+
+    socket.leave(get_room(stream.stream_id));
+    get_redis()
+        .then((client) => client.del(get_key(site, "frame", stream.stream_id)))
+        .catch(() => {});
+}
+
+function get_redis() {
+    // One client for every socket; a failed connect is retried on the next frame
+    if (!redis_connection) {
+        const client = get_redis_subscriber("redis_cache");
+        redis_connection = client.connect().then(() => client);
+        redis_connection.catch(() => {
+            redis_connection = null;
+        });
+    }
+    return redis_connection;
+}
+
+function get_key(site, ...parts) {
+    return [KEY_PREFIX, site, ...parts].join("|");
+}
+
+function get_room(stream_id) {
+    return "kiosk_stream:" + stream_id;
+}
+
+function reply(ack, message) {
+    if (typeof ack === "function") ack(message);
+}
+
+module.exports = kiosk_stream_handlers;
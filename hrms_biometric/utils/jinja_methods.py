@@ -12,6 +12,8 @@ from frappe import _
 from frappe.utils import formatdate, format_time, get_time_str, now_datetime
 from datetime import datetime
 
+from hrms_biometric.bio_facerecognition.api.kiosk_status import get_kiosk_live_status
+
 
 def get_biometric_status(employee_id=None):
     """
@@ -204,13 +206,15 @@ def get_kiosk_status(kiosk_id=None):
         if kiosk_id:
             # Get specific kiosk status
             kiosk = frappe.get_doc("Attendance Kiosk", kiosk_id)
+            label = kiosk.kiosk_name or kiosk.name
             return {
                 "kiosk_id": kiosk_id,
                 "kiosk_name": kiosk.kiosk_name,
                 "location": kiosk.location,
                 "is_active": kiosk.is_active,
                 "timezone": kiosk.timezone,
-                "last_updated": kiosk.modified
+                "last_updated": kiosk.modified,
+                **get_kiosk_live_status([label])[label]
             }
         else:
             # Get all kiosks status
@@ -220,6 +224,10 @@ def get_kiosk_status(kiosk_id=None):
                 order_by="kiosk_name"
             )
             
+            live_status = get_kiosk_live_status([kiosk.kiosk_name or kiosk.name for kiosk in kiosks])
+            for kiosk in kiosks:
+                kiosk.update(live_status[kiosk.kiosk_name or kiosk.name])
+            
             return {
                 "total_kiosks": len(kiosks),
                 "active_kiosks": len([k for k in kiosks if k.is_active]),